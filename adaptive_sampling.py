@@ -0,0 +1,204 @@
+import logging
+from typing import Callable, NamedTuple, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Muestras iniciales uniformes (detectan la forma general de la curva)
+INITIAL_SAMPLES = 65
+# Niveles de subdivisión: cada intervalo puede dividirse hasta 2**MAX_DEPTH veces
+MAX_DEPTH = 10
+# Error admitido en el punto medio, como fracción del rango vertical visible
+TOLERANCE = 0.002
+# Límite de evaluaciones aunque queden intervalos por refinar
+MAX_EVALUATIONS = 20000
+
+
+class SampledCurve(NamedTuple):
+    """Puntos de una curva listos para ax.plot (con NaN en los cortes entre ramas)"""
+    x: np.ndarray
+    y: np.ndarray
+    evaluations: int
+    # Límites verticales sugeridos (calculados sobre la malla uniforme inicial)
+    y_limits: Tuple[float, float]
+
+
+def _evaluate(func: Callable, x: np.ndarray) -> np.ndarray:
+    """Evalúa func sobre un array; los valores complejos o no finitos pasan a NaN"""
+    with np.errstate(all='ignore'):
+        y = np.asarray(func(x))
+        if np.iscomplexobj(y):
+            y = np.where(np.abs(y.imag) < 1e-12, y.real, np.nan)
+        y = np.broadcast_to(y.astype(float), np.shape(x)).copy()
+    y[~np.isfinite(y)] = np.nan
+    return y
+
+
+def robust_limits(y: np.ndarray, padding: float = 0.1) -> Tuple[float, float]:
+    """
+    Límites verticales que ignoran los picos junto a los polos.
+
+    Usa los percentiles 2-98 de los valores finitos, así tan(x) no queda aplastada
+    por los millones que vale al lado de una asíntota.
+    """
+    finite = y[np.isfinite(y)]
+    if len(finite) == 0:
+        return -1.0, 1.0
+
+    low, high = np.percentile(finite, [2, 98])
+    if high - low < 1e-12:
+        low, high = finite.min(), finite.max()
+    if high - low < 1e-12:
+        return float(low) - 1.0, float(high) + 1.0
+    margin = padding * (high - low)
+    return float(low - margin), float(high + margin)
+
+
+def sample_function(func: Callable[[np.ndarray], np.ndarray], x_min: float, x_max: float,
+                    tolerance: float = TOLERANCE, max_depth: int = MAX_DEPTH,
+                    max_evaluations: int = MAX_EVALUATIONS) -> SampledCurve:
+    """
+    Muestrea una función de forma adaptativa para graficarla.
+
+    Parte de INITIAL_SAMPLES puntos y, nivel a nivel, evalúa el punto medio de los
+    intervalos pendientes: si se aleja de la recta entre sus extremos más de
+    tolerance (relativa al rango vertical visible) o uno de los extremos no es
+    finito, el intervalo se divide en dos. Las rectas quedan con pocos puntos y
+    las zonas curvas o cerca de un polo se refinan hasta max_depth niveles.
+
+    Un intervalo que al llegar al último nivel sigue saltando y cuyo punto medio
+    no cae estrictamente entre sus extremos (polo o salto) es una discontinuidad:
+    se corta la línea con un NaN en lugar de unir las ramas con una vertical.
+
+    Args:
+        func: Función vectorizada (acepta y devuelve arrays de numpy)
+
+    Returns:
+        SampledCurve: x, y (con NaN en los cortes) y número de evaluaciones
+    """
+    x = np.linspace(x_min, x_max, INITIAL_SAMPLES)
+    y = _evaluate(func, x)
+    evaluations = len(x)
+
+    # Los puntos refinados se acumulan junto a los polos; el rango se mide antes
+    low, high = robust_limits(y, padding=0)
+    threshold = tolerance * max(high - low, 1e-9)
+    y_limits = robust_limits(y)
+
+    # Intervalos (entre x[i] y x[i+1]) que hay que refinar en el siguiente nivel
+    pending = np.ones(len(x) - 1, dtype=bool)
+
+    for _depth in range(max_depth):
+        index = np.nonzero(pending)[0]
+        if len(index) == 0 or evaluations + len(index) > max_evaluations:
+            break
+
+        mid_x = (x[index] + x[index + 1]) / 2
+        mid_y = _evaluate(func, mid_x)
+        evaluations += len(index)
+
+        y0, y1 = y[index], y[index + 1]
+        finite = np.isfinite(y0) & np.isfinite(y1) & np.isfinite(mid_y)
+        with np.errstate(invalid='ignore'):
+            error = np.abs(mid_y - (y0 + y1) / 2)
+        # Todos los extremos NaN: fuera del dominio, no hay nada que refinar
+        undefined = np.isnan(y0) & np.isnan(y1) & np.isnan(mid_y)
+        refine = np.where(finite, error > threshold, ~undefined)
+
+        # Insertar los puntos medios; cada intervalo evaluado se convierte en dos
+        x = np.insert(x, index + 1, mid_x)
+        y = np.insert(y, index + 1, mid_y)
+        pending = np.repeat(pending, np.where(pending, 2, 1))
+        pending[pending.nonzero()[0]] = np.repeat(refine, 2)
+
+    breaks = _find_breaks(func, x, y, np.nonzero(pending)[0], threshold)
+    evaluations += int(pending.sum())
+    if len(breaks):
+        x = np.insert(x, breaks + 1, np.nan)
+        y = np.insert(y, breaks + 1, np.nan)
+
+    return SampledCurve(x, y, evaluations, y_limits)
+
+
+def _find_breaks(func: Callable, x: np.ndarray, y: np.ndarray, index: np.ndarray,
+                 threshold: float) -> np.ndarray:
+    """Intervalos sin resolver que contienen un polo o un salto"""
+    if len(index) == 0:
+        return index
+
+    mid_y = _evaluate(func, (x[index] + x[index + 1]) / 2)
+    y0, y1 = y[index], y[index + 1]
+    with np.errstate(invalid='ignore'):
+        jump = np.abs(y1 - y0)
+        # En una rama continua y empinada el punto medio queda entre los extremos;
+        # junto a un polo se sale por arriba o por abajo, y en un salto cae en uno de los lados
+        outside = (mid_y < np.fmin(y0, y1)) | (mid_y > np.fmax(y0, y1))
+        one_side = np.fmin(np.abs(mid_y - y0), np.abs(mid_y - y1)) < 0.01 * jump
+        return index[(jump > threshold) & (outside | one_side)]
+
+
+class IncrementalSampler:
+    """
+    Curva muestreada de una función que se amplía al desplazar o acercar la vista.
+
+    Al desplazar solo se muestrean los tramos de x que quedan al descubierto; al
+    acercar mucho, solo la ventana visible se vuelve a muestrear (con un margen) para
+    recuperar resolución. Lo ya calculado se conserva mientras siga sirviendo.
+    """
+
+    # Puntos mínimos dentro de la vista antes de volver a muestrearla
+    MIN_VISIBLE_POINTS = 60
+    # Si la curva guardada abarca más de este múltiplo de la vista, se recorta
+    MAX_SPAN_FACTOR = 8
+
+    def __init__(self, func: Callable[[np.ndarray], np.ndarray], x_min: float, x_max: float):
+        self.func = func
+        curve = sample_function(func, x_min, x_max)
+        self.x, self.y = curve.x, curve.y
+        self.x_range = (x_min, x_max)
+        self.y_limits = curve.y_limits
+        self.evaluations = curve.evaluations
+
+    def cover(self, x_min: float, x_max: float) -> bool:
+        """
+        Asegura que la curva cubre [x_min, x_max] con resolución suficiente
+
+        Returns:
+            bool: True si la curva cambió
+        """
+        low, high = self.x_range
+        width = x_max - x_min
+
+        visible = np.count_nonzero((self.x >= x_min) & (self.x <= x_max))
+        too_coarse = visible < self.MIN_VISIBLE_POINTS and x_min >= low and x_max <= high
+        too_wide = (max(high, x_max) - min(low, x_min)) > self.MAX_SPAN_FACTOR * width
+
+        if too_coarse or too_wide:
+            # Vista nueva con media ventana de margen a cada lado para los próximos desplazamientos
+            self._resample(x_min - width / 2, x_max + width / 2)
+            return True
+
+        changed = False
+        if x_min < low:
+            left = sample_function(self.func, x_min, low)
+            self.x = np.concatenate([left.x[:-1], self.x])
+            self.y = np.concatenate([left.y[:-1], self.y])
+            self.evaluations += left.evaluations
+            low, changed = x_min, True
+
+        if x_max > high:
+            right = sample_function(self.func, high, x_max)
+            self.x = np.concatenate([self.x, right.x[1:]])
+            self.y = np.concatenate([self.y, right.y[1:]])
+            self.evaluations += right.evaluations
+            high, changed = x_max, True
+
+        self.x_range = (low, high)
+        return changed
+
+    def _resample(self, x_min: float, x_max: float):
+        curve = sample_function(self.func, x_min, x_max)
+        self.x, self.y = curve.x, curve.y
+        self.x_range = (x_min, x_max)
+        self.evaluations += curve.evaluations
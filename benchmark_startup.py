@@ -0,0 +1,95 @@
+"""
+Benchmark de arranque: tiempo de importación de la ventana principal.
+
+Lanza un intérprete nuevo con -X importtime, suma lo que cuesta importar el
+módulo indicado y lista los módulos más caros. Falla (código de salida 1) si
+se supera el presupuesto de tiempo o si se importa alguno de los módulos
+pesados que deben quedar para después de mostrar la ventana.
+
+Uso:
+    python benchmark_startup.py [--module main_window] [--budget-ms 400] [--runs 3]
+"""
+import argparse
+import os
+import re
+import subprocess
+import sys
+from pathlib import Path
+
+from lazy_imports import HEAVY_MODULES
+
+# import time: self [us] | cumulative | nombre (sangrado según la profundidad)
+_IMPORTTIME_RE = re.compile(r'^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s+)(\S+)$')
+
+# Paquetes que no deben aparecer al importar la ventana (ni siquiera en parte)
+FORBIDDEN_PACKAGES = sorted({name.split('.')[0] for name in HEAVY_MODULES})
+
+
+def measure_imports(module: str):
+    """
+    Importa module en un proceso limpio
+
+    Returns:
+        Tuple[float, dict]: (segundos totales, {módulo: microsegundos propios})
+    """
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=Path(__file__).parent, capture_output=True, text=True,
+        env={**os.environ, "PYTHONDONTWRITEBYTECODE": "1"}
+    )
+    if result.returncode != 0:
+        error = result.stderr.strip().splitlines()[-1] if result.stderr.strip() else "error desconocido"
+        raise RuntimeError(f"No se pudo importar {module}: {error}")
+
+    self_times = {}
+    total_us = 0
+    for line in result.stderr.splitlines():
+        match = _IMPORTTIME_RE.match(line)
+        if not match:
+            continue
+        self_us, cumulative_us, indent, name = match.groups()
+        self_times[name] = int(self_us)
+        # Los módulos de primer nivel (sangrado de un espacio) suman el total
+        if len(indent) == 1:
+            total_us += int(cumulative_us)
+    return total_us / 1e6, self_times
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark del tiempo de importación al arrancar")
+    parser.add_argument("--module", default="main_window", help="Módulo que se importa al arrancar")
+    parser.add_argument("--budget-ms", type=float, default=400, help="Tiempo máximo admitido (mejor ejecución)")
+    parser.add_argument("--runs", type=int, default=3, help="Ejecuciones (se toma la mejor)")
+    parser.add_argument("--top", type=int, default=10, help="Módulos más caros que se muestran")
+    args = parser.parse_args()
+
+    try:
+        runs = [measure_imports(args.module) for _ in range(max(1, args.runs))]
+    except RuntimeError as e:
+        print(e)
+        return 1
+
+    best_total, self_times = min(runs, key=lambda run: run[0])
+    print(f"import {args.module}: {best_total * 1000:7.1f} ms (mejor de {len(runs)})")
+
+    print(f"\nMódulos más caros (tiempo propio):")
+    for name, self_us in sorted(self_times.items(), key=lambda item: item[1], reverse=True)[:args.top]:
+        print(f"  {self_us / 1000:7.1f} ms  {name}")
+
+    failed = False
+    loaded = [name for name in FORBIDDEN_PACKAGES if name in self_times]
+    if loaded:
+        print(f"\n✗ Módulos pesados importados al arrancar: {', '.join(loaded)}")
+        failed = True
+
+    if best_total * 1000 > args.budget_ms:
+        print(f"\n✗ Supera el presupuesto de {args.budget_ms:.0f} ms")
+        failed = True
+
+    if not failed:
+        print(f"\n✓ Dentro del presupuesto de {args.budget_ms:.0f} ms y sin módulos pesados")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,103 @@
+"""
+Benchmark de renderizado de MathVisualizer.
+
+Compara renders por segundo del camino antiguo (plt.subplots + plt.close en cada
+petición) frente al pool de figuras reutilizables.
+
+Uso:
+    python benchmark_visualizer.py [--renders 30]
+"""
+import argparse
+import io
+import time
+
+import matplotlib
+matplotlib.use('Agg')
+import matplotlib.pyplot as plt
+
+from math_visualizer import MathVisualizer
+
+# Operaciones de ejemplo que recorren los paneles aritméticos
+SAMPLE_OPERATIONS = [
+    ([7.0, 6.0], '+'),
+    ([9.0, 4.0], '-'),
+    ([6.0, 8.0], '*'),
+    ([12.0, 3.0], '/'),
+]
+
+
+class _BenchConfig:
+    """Configuración mínima para no leer ni escribir config.json"""
+
+    def get(self, key, default=None):
+        # Dibujar en este proceso: se mide el pool, no el servicio de renderizado
+        if key == "visualization.render_processes":
+            return 0
+        return default
+
+    def get_ui_colors(self):
+        return {}
+
+
+def _draw_arithmetic(visualizer, axes, numbers, operation):
+    (ax1, ax2), (ax3, ax4) = axes
+    visualizer._draw_visual_objects(ax1, numbers, operation)
+    visualizer._draw_step_by_step(ax2, numbers, operation)
+    visualizer._draw_number_line(ax3, numbers, operation)
+    visualizer._draw_result_display(ax4, numbers, operation)
+
+
+def render_with_pyplot(visualizer, numbers, operation) -> bytes:
+    """Camino anterior: figura nueva de pyplot en cada petición"""
+    fig, axes = plt.subplots(2, 2, figsize=visualizer.fig_size)
+    fig.patch.set_facecolor(visualizer.colors['background'])
+    _draw_arithmetic(visualizer, axes, numbers, operation)
+    plt.tight_layout()
+    buffer = io.BytesIO()
+    fig.savefig(buffer, format='png', dpi=visualizer.dpi, bbox_inches='tight',
+                facecolor=visualizer.colors['background'], edgecolor='none')
+    plt.close(fig)
+    return buffer.getvalue()
+
+
+def render_with_pool(visualizer, numbers, operation) -> bytes:
+    """Camino actual: figura prestada del pool"""
+    with visualizer.figure_pool.figure() as (fig, axes):
+        _draw_arithmetic(visualizer, axes, numbers, operation)
+        fig.tight_layout()
+        buffer = io.BytesIO()
+        fig.savefig(buffer, format='png', dpi=visualizer.dpi, bbox_inches='tight',
+                    facecolor=visualizer.colors['background'], edgecolor='none')
+        return buffer.getvalue()
+
+
+def measure(render, visualizer, renders: int) -> float:
+    """Devuelve renders por segundo"""
+    # Calentamiento (cachés de fuentes, primera figura del pool)
+    render(visualizer, *SAMPLE_OPERATIONS[0])
+
+    start = time.perf_counter()
+    for i in range(renders):
+        numbers, operation = SAMPLE_OPERATIONS[i % len(SAMPLE_OPERATIONS)]
+        render(visualizer, numbers, operation)
+    elapsed = time.perf_counter() - start
+    return renders / elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark del pool de figuras de MathVisualizer")
+    parser.add_argument("--renders", type=int, default=30, help="Número de renders por modo")
+    args = parser.parse_args()
+
+    visualizer = MathVisualizer(_BenchConfig())
+
+    before = measure(render_with_pyplot, visualizer, args.renders)
+    after = measure(render_with_pool, visualizer, args.renders)
+
+    print(f"pyplot por petición: {before:6.2f} renders/s")
+    print(f"pool de figuras:     {after:6.2f} renders/s")
+    print(f"mejora:              {after / before:6.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -2,6 +2,7 @@ import tkinter as tk
 from tkinter import scrolledtext, messagebox, filedialog
 import logging
 import threading
+import queue
 import re
 import datetime
 from config_manager import ConfigManager
@@ -12,12 +13,22 @@ logger = logging.getLogger(__name__)
 class ChatFrame(tk.Frame):
     """Frame para el chat con el VTuber - Versión mejorada con soporte multiidioma"""
     
-    def __init__(self, parent, message_callback, config_manager):
+    # Tamaño máximo de la cola de fragmentos y periodo de vaciado (ms)
+    STREAM_QUEUE_SIZE = 256
+    STREAM_POLL_MS = 50
+    
+    def __init__(self, parent, message_callback, config_manager, stream_callback=None):
         self.config_manager = config_manager
         self.message_callback = message_callback
+        self.stream_callback = stream_callback
         self.processing = False
         self.language_manager = get_language_manager(config_manager)
         
+        # Estado del streaming: la cola está acotada y se vacía desde el hilo de Tk
+        self.stream_queue = queue.Queue(maxsize=self.STREAM_QUEUE_SIZE)
+        self.stream_id = 0
+        self.cancel_event = threading.Event()
+        
         # Obtener colores de configuración
         self.update_colors()
         
@@ -244,28 +255,11 @@ class ChatFrame(tk.Frame):
     def add_message(self, sender, message, color=None):
         """Agrega un mensaje al chat"""
         try:
-            timestamp = datetime.datetime.now().strftime("%H:%M")
-            
             # Habilitar edición
             self.chat_display.config(state=tk.NORMAL)
             
-            # Agregar separador si no es el primer mensaje
-            if self.chat_display.index('end-1c') != '1.0':
-                self.chat_display.insert(tk.END, "\n")
-            
-            # Agregar timestamp
-            self.chat_display.insert(tk.END, f"[{timestamp}] ", 'timestamp')
-            
-            # Traducir nombre del sender
-            translated_sender = self.translate_sender(sender)
-            
-            # Agregar sender
-            if sender == "Usuario" or sender == "User":
-                self.chat_display.insert(tk.END, f"{translated_sender}: ", 'user')
-            elif sender == "MathVTuber":
-                self.chat_display.insert(tk.END, f"{translated_sender}: ", 'assistant')
-            else:
-                self.chat_display.insert(tk.END, f"{translated_sender}: ", 'system')
+            # Agregar timestamp y sender
+            self._insert_message_header(sender)
             
             # Procesar mensaje con formato
             self.insert_formatted_message(message, sender)
@@ -283,6 +277,28 @@ class ChatFrame(tk.Frame):
         except Exception as e:
             logger.error(f"Error agregando mensaje: {e}")
     
+    def _insert_message_header(self, sender):
+        """Inserta separador, timestamp y nombre del sender (el widget debe estar editable)"""
+        timestamp = datetime.datetime.now().strftime("%H:%M")
+        
+        # Agregar separador si no es el primer mensaje
+        if self.chat_display.index('end-1c') != '1.0':
+            self.chat_display.insert(tk.END, "\n")
+        
+        # Agregar timestamp
+        self.chat_display.insert(tk.END, f"[{timestamp}] ", 'timestamp')
+        
+        # Traducir nombre del sender
+        translated_sender = self.translate_sender(sender)
+        
+        # Agregar sender
+        if sender == "Usuario" or sender == "User":
+            self.chat_display.insert(tk.END, f"{translated_sender}: ", 'user')
+        elif sender == "MathVTuber":
+            self.chat_display.insert(tk.END, f"{translated_sender}: ", 'assistant')
+        else:
+            self.chat_display.insert(tk.END, f"{translated_sender}: ", 'system')
+    
     def translate_sender(self, sender):
         """Traduce el nombre del sender"""
         translations = {
@@ -368,8 +384,13 @@ class ChatFrame(tk.Frame):
         # Deshabilitar entrada mientras se procesa
         self.set_processing(True)
         
-        # Procesar en hilo separado
-        threading.Thread(target=self._process_message, args=(message,), daemon=True).start()
+        # Procesar en hilo separado (con streaming de tokens si está disponible)
+        if self.stream_callback and self.config_manager.get("ai.stream_responses", True):
+            self._begin_stream()
+            threading.Thread(target=self._process_message_stream,
+                             args=(message, self.stream_id), daemon=True).start()
+        else:
+            threading.Thread(target=self._process_message, args=(message,), daemon=True).start()
     
     def set_processing(self, processing):
         """Establece el estado de procesamiento"""
@@ -389,6 +410,9 @@ class ChatFrame(tk.Frame):
     
     def stop_processing(self):
         """Detiene el procesamiento actual"""
+        # Cancelar la generación en curso e ignorar lo que quede en la cola
+        self.cancel_event.set()
+        self.stream_id += 1
         self.set_processing(False)
         self.add_message(_("chat.system", "Sistema"), 
                         _("messages.processing_stopped", "Procesamiento detenido por el usuario"), 
@@ -421,6 +445,111 @@ class ChatFrame(tk.Frame):
             # Reactivar controles
             self.set_processing(False)
     
+    def _begin_stream(self):
+        """Prepara el chat para recibir una respuesta en streaming"""
+        self.stream_id += 1
+        self.cancel_event = threading.Event()
+        
+        # Descartar restos de un stream anterior
+        while True:
+            try:
+                self.stream_queue.get_nowait()
+            except queue.Empty:
+                break
+        
+        self.chat_display.config(state=tk.NORMAL)
+        self._insert_message_header("MathVTuber")
+        self.chat_display.mark_set("stream_start", "end-1c")
+        self.chat_display.mark_gravity("stream_start", tk.LEFT)
+        self.chat_display.config(state=tk.DISABLED)
+        
+        self.after(self.STREAM_POLL_MS, self._drain_stream_queue, self.stream_id)
+    
+    def _make_token_sink(self, stream_id):
+        """
+        Crea la función que encola texto parcial desde el hilo de generación sin bloquearlo
+        nunca: si la cola está llena, el texto se acumula y sale junto con el siguiente token.
+        """
+        pending = []
+        
+        def push_token(text):
+            pending.append(text)
+            try:
+                self.stream_queue.put_nowait(("token", stream_id, ''.join(pending)))
+                pending.clear()
+            except queue.Full:
+                pass
+        
+        return push_token
+    
+    def _process_message_stream(self, message, stream_id):
+        """Procesa un mensaje en hilo separado enviando los tokens al chat"""
+        cancel_event = self.cancel_event
+        try:
+            response = self.stream_callback(message, self._make_token_sink(stream_id), cancel_event)
+        except Exception as e:
+            logger.error(f"Error procesando mensaje: {str(e)}")
+            response = _("errors.general", "Ha ocurrido un error") + f": {str(e)}"
+        
+        # El mensaje final no puede perderse: aquí sí se espera a que haya espacio
+        while stream_id == self.stream_id:
+            try:
+                self.stream_queue.put(("done", stream_id, response), timeout=0.5)
+                break
+            except queue.Full:
+                continue
+    
+    def _drain_stream_queue(self, stream_id):
+        """Vacía la cola de streaming desde el hilo de Tk (un tick de after)"""
+        if stream_id != self.stream_id:
+            return
+        
+        chunks = []
+        final_response = None
+        try:
+            while True:
+                kind, owner, payload = self.stream_queue.get_nowait()
+                if owner != stream_id:
+                    continue
+                if kind == "done":
+                    final_response = payload
+                    break
+                chunks.append(payload)
+        except queue.Empty:
+            pass
+        
+        try:
+            if chunks:
+                self.chat_display.config(state=tk.NORMAL)
+                self.chat_display.insert(tk.END, ''.join(chunks), 'assistant')
+                self.chat_display.config(state=tk.DISABLED)
+                if self.auto_scroll:
+                    self.chat_display.see(tk.END)
+            
+            if final_response is not None:
+                self._finish_stream(final_response)
+                return
+        except Exception as e:
+            logger.error(f"Error mostrando texto en streaming: {e}")
+        
+        self.after(self.STREAM_POLL_MS, self._drain_stream_queue, stream_id)
+    
+    def _finish_stream(self, response):
+        """Reemplaza el texto crudo del stream por la respuesta final con formato"""
+        try:
+            self.chat_display.config(state=tk.NORMAL)
+            self.chat_display.delete("stream_start", "end-1c")
+            self.insert_formatted_message(response, "MathVTuber")
+            self.chat_display.insert(tk.END, "\n")
+            self.chat_display.config(state=tk.DISABLED)
+            
+            if self.auto_scroll:
+                self.chat_display.see(tk.END)
+        except Exception as e:
+            logger.error(f"Error mostrando respuesta: {e}")
+        finally:
+            self.set_processing(False)
+    
     def previous_message(self, event):
         """Navega al mensaje anterior en el historial"""
         if self.message_history and self.history_index > 0:
@@ -19,6 +19,8 @@ class ConfigManager:
         self.default_config = {
             "paths": {
                 "mistral_model": "",
+                "model_index": "cache/model_index.json",
+                "inference_tuning": "cache/inference_tuning.json",
                 "vtuber_assets": "assets",
                 "temp_dir": "temp",
                 "logs_dir": "logs"
@@ -52,20 +54,48 @@ class ConfigManager:
                 "timeout": 120,
                 "temperature": 0.7,
                 "max_tokens": 512,
-                "model_type": "auto"
+                "model_type": "auto",
+                "stream_responses": True,
+                "n_batch": 512,
+                "auto_tune": False,
+                "auto_tune_budget": 120
             },
             "visualization": {
                 "enabled": True,
                 "plot_style": "dark_background",
                 "figure_size": [10, 6],
                 "line_color": "#00a896",
-                "save_plots": True
+                "save_plots": True,
+                "render_processes": 1,
+                "render_timeout": 30,
+                "export_dpi": 200
             },
             "performance": {
                 "lazy_loading": True,
                 "cache_responses": True,
                 "max_cache_size": 100,
-                "async_processing": True
+                "async_processing": True,
+                "prompt_prefix_cache": True,
+                "prompt_cache_dir": "cache/prompt_states",
+                "symbolic_cache_size": 128,
+                "solver_process": True,
+                "solver_timeout": 10,
+                "warm_imports": True,
+                "model_page_in": True
+            },
+            "metrics": {
+                "enabled": True,
+                "log_breakdown": True,
+                "export_path": "logs/metrics.prom"
+            },
+            "server": {
+                "url": "",
+                "host": "127.0.0.1",
+                "port": 8765,
+                "max_queue": 8,
+                "max_clients": 16,
+                "max_question_chars": 2000,
+                "request_timeout": 300
             }
         }
         
@@ -135,7 +165,7 @@ class ConfigManager:
             if 'ai' in config:
                 ai_config = config['ai']
                 ai_config['context_size'] = max(256, min(ai_config.get('context_size', 512), 4096))
-                ai_config['num_threads'] = max(1, min(ai_config.get('num_threads', 4), 16))
+                ai_config['num_threads'] = max(1, min(ai_config.get('num_threads', 4), os.cpu_count() or 16))
                 ai_config['timeout'] = max(30, min(ai_config.get('timeout', 120), 300))
                 ai_config['temperature'] = max(0.1, min(ai_config.get('temperature', 0.7), 2.0))
             
@@ -232,34 +262,17 @@ class ConfigManager:
                 logger.error(f"Error estableciendo configuración '{key_path}': {e}")
 
     def get_mistral_model_path(self) -> str:
-        """Obtiene ruta del modelo Mistral con búsqueda automática"""
-        base_path = self.get("paths.mistral_model", "")
-        
-        if not base_path:
-            # Buscar en ubicaciones comunes
-            search_paths = [
-                Path("models"),
-                Path("ia"),
-                Path.cwd() / "models",
-                Path.cwd() / "ia"
-            ]
-            
-            for search_path in search_paths:
-                if search_path.exists():
-                    for file_path in search_path.glob("*.gguf"):
-                        logger.info(f"Modelo encontrado automáticamente: {file_path}")
-                        self.set("paths.mistral_model", str(file_path.parent))
-                        return str(file_path)
-            
-            return ""
+        """
+        Obtiene ruta del modelo con búsqueda automática
         
-        # Buscar archivos .gguf en la ruta especificada
-        base_path = Path(base_path)
-        if base_path.exists():
-            for file_path in base_path.glob("*.gguf"):
-                return str(file_path)
+        paths.mistral_model puede ser un archivo o una carpeta; si está vacío se
+        buscan las carpetas habituales (models, ia, assets/models). Entre varios
+        modelos se elige el mejor que cabe en memoria según sus cabeceras GGUF
+        (ver model_registry). La búsqueda no modifica la configuración.
+        """
+        from model_registry import get_model_registry
         
-        return ""
+        return get_model_registry(self).select(self.get("paths.mistral_model", ""))
 
     def get_vtuber_assets_path(self) -> str:
         """Obtiene ruta de assets VTuber"""
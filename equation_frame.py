@@ -1,17 +1,26 @@
 import tkinter as tk
 from tkinter import ttk, messagebox
 import matplotlib.pyplot as plt
+from matplotlib.figure import Figure
 from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
 import numpy as np
 import sympy as sp
 import logging
+import threading
 from config_manager import ConfigManager
+from symbolic_cache import get_symbolic_cache
+from solver_service import get_solver_service
+from adaptive_sampling import IncrementalSampler
 
 logger = logging.getLogger(__name__)
 
 class EquationFrame(tk.Frame):
     """Frame para visualización y resolución de ecuaciones matemáticas"""
     
+    # Vista inicial del gráfico y factor de zoom por paso de la rueda
+    DEFAULT_X_RANGE = (-10, 10)
+    ZOOM_STEP = 1.25
+    
     def __init__(self, parent, config_manager: ConfigManager):
         super().__init__(parent)
         self.config_manager = config_manager
@@ -21,8 +30,21 @@ class EquationFrame(tk.Frame):
         self.current_equation = ""
         self.solution = None
         self.figure = None
+        self.ax = None
         self.canvas = None
         
+        # Curva mostrada y estado del arrastre (pan)
+        self.sampler = None
+        self.plot_line = None
+        self.drag_start = None
+        
+        # Soluciones, derivadas y funciones numpy ya calculadas
+        self.symbolic_cache = get_symbolic_cache(config_manager)
+        self.solver_service = get_solver_service(config_manager)
+        
+        # Solo se muestra el resultado de la última ecuación pedida
+        self.solve_generation = 0
+        
         # Configurar colores
         self.update_colors()
         
@@ -151,8 +173,9 @@ class EquationFrame(tk.Frame):
             # Limpiar gráfico anterior
             self.clear_plot()
             
-            # Procesar ecuación
+            # Procesar ecuación (descarta las soluciones pendientes de la anterior)
             self.current_equation = equation_text
+            self.solve_generation += 1
             
             # Intentar resolver como ecuación
             if '=' in equation_text:
@@ -166,30 +189,58 @@ class EquationFrame(tk.Frame):
             self.show_result(f"Error: {str(e)}")
     
     def solve_algebraic_equation(self, equation_text):
-        """Resuelve una ecuación algebraica"""
+        """Resuelve una ecuación algebraica (sympy trabaja fuera del hilo de Tk)"""
         try:
             # Dividir por el signo igual
             left, right = equation_text.split('=', 1)
             
-            # Crear símbolos
-            x = sp.Symbol('x')
-            y = sp.Symbol('y')
-            
             # Convertir a expresiones de sympy
-            left_expr = sp.sympify(left.strip())
-            right_expr = sp.sympify(right.strip())
+            left_expr = self.symbolic_cache.parse(left)
+            right_expr = self.symbolic_cache.parse(right)
             
-            # Crear ecuación
-            equation = sp.Eq(left_expr, right_expr)
+            # Resolver lado izquierdo - lado derecho = 0
+            func_expr = left_expr - right_expr
             
-            # Resolver ecuación
-            solutions = sp.solve(equation, x)
+            generation = self.solve_generation
+            result = self.symbolic_cache.cached_solutions(func_expr)
+            if result is not None:
+                self.show_solutions(generation, equation_text, func_expr, result)
+                return
+            
+            # Mientras tanto se muestra la gráfica sin marcar soluciones
+            self.show_result(f"Ecuación: {equation_text}\n\nResolviendo...")
+            self.plot_sympy_function(func_expr)
+            
+            def solve_worker():
+                result = self.solver_service.solve(func_expr)
+                if result is None:
+                    # Llegó otra ecuación mientras tanto
+                    return
+                self.symbolic_cache.store_solutions(func_expr, result)
+                self.after(0, lambda: self.show_solutions(generation, equation_text, func_expr, result))
+            
+            threading.Thread(target=solve_worker, daemon=True).start()
+                
+        except Exception as e:
+            logger.error(f"Error resolviendo ecuación algebraica: {e}")
+            self.show_result(f"Error resolviendo ecuación: {str(e)}")
+    
+    def show_solutions(self, generation, equation_text, func_expr, result):
+        """Muestra las soluciones (SolveResult) si siguen correspondiendo a la última ecuación"""
+        if generation != self.solve_generation:
+            return
+        
+        try:
+            solutions = result.solutions
             
             # Mostrar resultados
             result_text = f"Ecuación: {equation_text}\n\n"
             
             if solutions:
-                result_text += "Soluciones:\n"
+                if result.approximate:
+                    result_text += "Soluciones (aproximación numérica):\n"
+                else:
+                    result_text += "Soluciones:\n"
                 for i, sol in enumerate(solutions, 1):
                     if sol.is_real:
                         result_text += f"x_{i} = {sol} ≈ {float(sol.evalf()):.6f}\n"
@@ -203,13 +254,12 @@ class EquationFrame(tk.Frame):
             # Intentar graficar la función
             try:
                 # Graficar lado izquierdo - lado derecho = 0
-                func_expr = left_expr - right_expr
                 self.plot_sympy_function(func_expr, solutions)
             except:
                 pass
                 
         except Exception as e:
-            logger.error(f"Error resolviendo ecuación algebraica: {e}")
+            logger.error(f"Error mostrando soluciones: {e}")
             self.show_result(f"Error resolviendo ecuación: {str(e)}")
     
     def plot_function(self, function_text):
@@ -219,14 +269,14 @@ class EquationFrame(tk.Frame):
             x = sp.Symbol('x')
             
             # Convertir a expresión de sympy
-            expr = sp.sympify(function_text)
+            expr = self.symbolic_cache.parse(function_text)
             
             # Mostrar información de la función
             result_text = f"Función: f(x) = {function_text}\n\n"
             
             # Calcular derivada
             try:
-                derivative = sp.diff(expr, x)
+                derivative = self.symbolic_cache.derivative(expr, x)
                 result_text += f"Derivada: f'(x) = {derivative}\n"
             except:
                 pass
@@ -254,17 +304,18 @@ class EquationFrame(tk.Frame):
             self.show_result(f"Error graficando función: {str(e)}")
     
     def plot_sympy_function(self, expr, solutions=None):
-        """Grafica una expresión de sympy"""
+        """Grafica una expresión de sympy en el canvas persistente (se puede desplazar y hacer zoom)"""
         try:
-            # Limpiar gráfico anterior
-            self.clear_plot()
-            
-            # Crear figura
-            self.figure = plt.Figure(figsize=(6, 4), facecolor='#2c0a0a')
-            ax = self.figure.add_subplot(111)
-            ax.set_facecolor('#1a1a1a')
+            self.ensure_canvas()
+            ax = self.ax
+            ax.clear()
+            ax.set_axis_on()
+            self.plot_line = None
+            self.sampler = None
             
             # Configurar colores
+            ax.set_facecolor('#1a1a1a')
+            self.figure.set_facecolor('#2c0a0a')
             ax.tick_params(colors=self.text_color)
             ax.xaxis.label.set_color(self.text_color)
             ax.yaxis.label.set_color(self.text_color)
@@ -273,33 +324,29 @@ class EquationFrame(tk.Frame):
             ax.spines['left'].set_color(self.text_color)
             ax.spines['right'].set_color(self.text_color)
             
-            # Crear función numpy
-            x_sym = sp.Symbol('x')
-            func_lambdified = sp.lambdify(x_sym, expr, 'numpy')
-            
-            # Generar puntos para graficar
-            x_vals = np.linspace(-10, 10, 1000)
+            # Función numpy (lambdify se hace una sola vez por expresión)
+            func_lambdified = self.symbolic_cache.function(expr)
             
             try:
-                y_vals = func_lambdified(x_vals)
+                # Puntos adaptativos: pocos en las rectas, más en curvas y polos (con NaN en los cortes)
+                sampler = IncrementalSampler(func_lambdified, *self.DEFAULT_X_RANGE)
+                logger.debug(f"Gráfica de {expr}: {sampler.evaluations} evaluaciones")
                 
-                # Filtrar valores infinitos o NaN
-                mask = np.isfinite(y_vals)
-                x_vals = x_vals[mask]
-                y_vals = y_vals[mask]
-                
-                if len(x_vals) > 0:
+                if np.isfinite(sampler.y).any():
+                    self.sampler = sampler
+                    
                     # Graficar función
-                    ax.plot(x_vals, y_vals, color='#00a896', linewidth=2, label=f'f(x) = {expr}')
+                    self.plot_line, = ax.plot(sampler.x, sampler.y, color='#00a896', linewidth=2,
+                                              label=f'f(x) = {expr}')
                     
-                    # Marcar soluciones si existen
+                    # Marcar soluciones si existen (todas: al desplazar la vista aparecen las de fuera)
                     if solutions:
                         for sol in solutions:
                             if sol.is_real:
                                 x_sol = float(sol.evalf())
-                                if -10 <= x_sol <= 10:
-                                    y_sol = func_lambdified(x_sol)
-                                    ax.plot(x_sol, y_sol, 'ro', markersize=8, label=f'x = {x_sol:.3f}')
+                                y_sol = func_lambdified(x_sol)
+                                label = f'x = {x_sol:.3f}' if self.DEFAULT_X_RANGE[0] <= x_sol <= self.DEFAULT_X_RANGE[1] else None
+                                ax.plot(x_sol, y_sol, 'ro', markersize=8, label=label)
                     
                     # Configurar ejes
                     ax.axhline(y=0, color='white', linestyle='-', alpha=0.3)
@@ -308,15 +355,12 @@ class EquationFrame(tk.Frame):
                     ax.set_xlabel('x')
                     ax.set_ylabel('f(x)')
                     
-                    # Ajustar límites del gráfico
-                    if len(y_vals) > 0:
-                        y_min, y_max = np.min(y_vals), np.max(y_vals)
-                        y_range = y_max - y_min
-                        if y_range > 0:
-                            ax.set_ylim(y_min - 0.1 * y_range, y_max + 0.1 * y_range)
+                    # Ajustar límites del gráfico (sin dejar que un polo aplaste la curva)
+                    ax.set_xlim(*self.DEFAULT_X_RANGE)
+                    ax.set_ylim(*sampler.y_limits)
                     
                     # Leyenda
-                    ax.legend()
+                    ax.legend(loc='upper right')
                     
                 else:
                     ax.text(0.5, 0.5, 'No se pueden graficar valores válidos', 
@@ -328,14 +372,82 @@ class EquationFrame(tk.Frame):
                        transform=ax.transAxes, ha='center', va='center',
                        color=self.text_color)
             
-            # Crear canvas y mostrar
-            self.canvas = FigureCanvasTkAgg(self.figure, self.plot_frame)
-            self.canvas.draw()
-            self.canvas.get_tk_widget().pack(fill=tk.BOTH, expand=True)
+            self.canvas.draw_idle()
             
         except Exception as e:
             logger.error(f"Error creando gráfico: {e}")
     
+    def ensure_canvas(self):
+        """Crea la figura y el canvas una sola vez; después solo se reutilizan"""
+        if self.canvas is not None:
+            return
+        
+        self.figure = Figure(figsize=(6, 4), facecolor='#2c0a0a')
+        self.ax = self.figure.add_subplot(111)
+        self.canvas = FigureCanvasTkAgg(self.figure, self.plot_frame)
+        self.canvas.get_tk_widget().pack(fill=tk.BOTH, expand=True)
+        
+        # Rueda: zoom centrado en el cursor; arrastrar: desplazar; doble clic: vista inicial
+        self.canvas.mpl_connect('scroll_event', self.on_plot_scroll)
+        self.canvas.mpl_connect('button_press_event', self.on_plot_press)
+        self.canvas.mpl_connect('motion_notify_event', self.on_plot_drag)
+        self.canvas.mpl_connect('button_release_event', self.on_plot_release)
+    
+    def on_plot_scroll(self, event):
+        """Acerca o aleja la vista alrededor del cursor"""
+        if self.sampler is None or event.inaxes is not self.ax:
+            return
+        
+        factor = 1 / self.ZOOM_STEP if event.button == 'up' else self.ZOOM_STEP
+        x_min, x_max = self.ax.get_xlim()
+        y_min, y_max = self.ax.get_ylim()
+        self.set_plot_view(
+            (event.xdata - (event.xdata - x_min) * factor, event.xdata + (x_max - event.xdata) * factor),
+            (event.ydata - (event.ydata - y_min) * factor, event.ydata + (y_max - event.ydata) * factor)
+        )
+    
+    def on_plot_press(self, event):
+        if self.sampler is None or event.inaxes is not self.ax or event.button != 1:
+            return
+        
+        if event.dblclick:
+            self.drag_start = None
+            self.set_plot_view(self.DEFAULT_X_RANGE, self.sampler.y_limits)
+            return
+        
+        self.drag_start = (event.x, event.y, self.ax.get_xlim(), self.ax.get_ylim())
+    
+    def on_plot_drag(self, event):
+        """Desplaza la vista siguiendo al ratón (en píxeles, válido aunque salga de los ejes)"""
+        if self.drag_start is None:
+            return
+        
+        start_x, start_y, (x_min, x_max), (y_min, y_max) = self.drag_start
+        bbox = self.ax.bbox
+        dx = (event.x - start_x) * (x_max - x_min) / bbox.width
+        dy = (event.y - start_y) * (y_max - y_min) / bbox.height
+        self.set_plot_view((x_min - dx, x_max - dx), (y_min - dy, y_max - dy))
+    
+    def on_plot_release(self, event):
+        self.drag_start = None
+    
+    def set_plot_view(self, x_range, y_range):
+        """
+        Cambia la vista del gráfico: muestrea solo los tramos de x nuevos y
+        actualiza la línea existente con set_data, sin recrear figura ni widget
+        """
+        try:
+            if self.sampler.cover(*x_range):
+                self.plot_line.set_data(self.sampler.x, self.sampler.y)
+            
+            self.ax.set_xlim(*x_range)
+            self.ax.set_ylim(*y_range)
+            # draw_idle agrupa los eventos de arrastre en un solo redibujado por ciclo de Tk
+            self.canvas.draw_idle()
+            
+        except Exception as e:
+            logger.error(f"Error actualizando vista del gráfico: {e}")
+    
     def show_result(self, text):
         """Muestra resultado en el área de texto"""
         self.results_text.config(state=tk.NORMAL)
@@ -344,13 +456,14 @@ class EquationFrame(tk.Frame):
         self.results_text.config(state=tk.DISABLED)
     
     def clear_plot(self):
-        """Limpia el gráfico actual"""
+        """Limpia el gráfico actual (el canvas se conserva para la siguiente gráfica)"""
+        self.sampler = None
+        self.plot_line = None
+        self.drag_start = None
         if self.canvas:
-            self.canvas.get_tk_widget().destroy()
-            self.canvas = None
-        if self.figure:
-            plt.close(self.figure)
-            self.figure = None
+            self.ax.clear()
+            self.ax.set_axis_off()
+            self.canvas.draw_idle()
     
     def set_equation(self, equation):
         """Establece una ecuación desde fuera del frame"""
@@ -367,7 +480,7 @@ class EquationFrame(tk.Frame):
             self.equation_entry.configure(bg='#333333', fg=self.text_color)
             self.results_text.configure(bg='#1a1a1a', fg=self.text_color)
             
-            # Redibujar gráfico si existe
+            # Redibujar gráfico si existe (el trabajo simbólico sale de la caché)
             if self.current_equation:
                 self.solve_equation()
                 
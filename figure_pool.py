@@ -0,0 +1,149 @@
+import queue
+import logging
+import threading
+from contextlib import contextmanager
+from typing import Iterator, Optional, Tuple
+
+from matplotlib import rcParams
+from matplotlib.figure import Figure
+from matplotlib.transforms import Bbox
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.ticker import AutoLocator, ScalarFormatter
+
+logger = logging.getLogger(__name__)
+
+
+def reset_axes(ax, facecolor: str):
+    """
+    Devuelve unos ejes a su estado inicial sin reconstruirlos.
+
+    ax.clear() vuelve a crear ejes, ticks y textos y cuesta más que el propio dibujo de
+    estos paneles; aquí solo se quitan los artistas añadidos y se restauran las
+    propiedades que modifican los métodos _draw_* del visualizador.
+    """
+    for artists in (ax.texts, ax.patches, ax.lines, ax.collections, ax.images, ax.artists, ax.tables):
+        for artist in list(artists):
+            artist.remove()
+    # Contenedores de bar()/hist()/errorbar(): sus artistas ya se quitaron arriba
+    del ax.containers[:]
+    # El ciclo de colores vuelve a C0, como en unos ejes nuevos
+    ax.set_prop_cycle(None)
+
+    legend = ax.get_legend()
+    if legend is not None:
+        legend.remove()
+
+    ax.set_title('')
+    ax.set_xlabel('')
+    ax.set_ylabel('')
+    ax.set_facecolor(facecolor)
+    ax.set_aspect('auto')
+    ax.set_axis_on()
+    ax.grid(False)
+
+    for axis in (ax.xaxis, ax.yaxis):
+        axis.set_major_locator(AutoLocator())
+        axis.set_major_formatter(ScalarFormatter())
+
+    ax.tick_params(colors=rcParams['xtick.color'])
+    for spine in ax.spines.values():
+        spine.set_visible(True)
+        spine.set_color(rcParams['axes.edgecolor'])
+
+    # Límites como en unos ejes nuevos: sin datos y vista (0, 1); relim() sin artistas dejaría (-0.06, 0.06)
+    ax.dataLim.set_points(Bbox.null().get_points())
+    ax.ignore_existing_data_limits = True
+    ax.set_xlim(0, 1)
+    ax.set_ylim(0, 1)
+    ax.set_autoscale_on(True)
+
+
+class FigurePool:
+    """
+    Pool de figuras prediseñadas (API orientada a objetos: Figure + FigureCanvasAgg).
+
+    Las figuras no pasan por pyplot, así que no comparten estado global y cada una
+    puede usarse desde cualquier hilo mientras esté prestada.
+    """
+
+    def __init__(self, nrows: int = 2, ncols: int = 2, figsize=(10, 8), dpi: int = 100,
+                 facecolor: str = '#2c0a0a', max_size: int = 4):
+        self.nrows = nrows
+        self.ncols = ncols
+        self.figsize = tuple(figsize)
+        self.dpi = dpi
+        self.facecolor = facecolor
+        self.max_size = max_size
+
+        # LIFO: la figura devuelta más recientemente tiene sus cachés de texto calientes
+        self._free = queue.LifoQueue()
+        self._lock = threading.Lock()
+        self.created = 0
+
+    @contextmanager
+    def figure(self, dpi: Optional[float] = None) -> Iterator[Tuple[Figure, object]]:
+        """
+        Presta una figura limpia con su matriz de ejes y la devuelve al terminar
+
+        Args:
+            dpi: DPI para este uso (al devolverla se restaura el del pool)
+        """
+        fig, axes = self.acquire()
+        if dpi:
+            fig.set_dpi(dpi)
+        try:
+            yield fig, axes
+        finally:
+            self.release(fig, axes)
+
+    def acquire(self):
+        """Obtiene una figura libre o construye una nueva"""
+        try:
+            return self._free.get_nowait()
+        except queue.Empty:
+            return self._build()
+
+    def release(self, fig, axes):
+        """Limpia la figura y la guarda para el siguiente uso"""
+        try:
+            self._reset(fig, axes)
+        except Exception as e:
+            logger.error(f"Error limpiando figura del pool, se descarta: {e}")
+            return
+
+        if self._free.qsize() < self.max_size:
+            self._free.put((fig, axes))
+
+    def prewarm(self, count: int = 1):
+        """Construye figuras por adelantado"""
+        for _ in range(max(0, count - self._free.qsize())):
+            self._free.put(self._build())
+
+    def _build(self):
+        """Crea una figura nueva con su canvas Agg y sus ejes"""
+        fig = Figure(figsize=self.figsize, dpi=self.dpi, facecolor=self.facecolor)
+        FigureCanvasAgg(fig)
+        axes = fig.subplots(self.nrows, self.ncols, squeeze=False)
+        for ax in axes.flat:
+            ax.set_facecolor(self.facecolor)
+        # Márgenes originales: tight_layout() los cambia y _reset los restaura
+        params = fig.subplotpars
+        fig.pool_subplotpars = dict(left=params.left, right=params.right, bottom=params.bottom,
+                                    top=params.top, wspace=params.wspace, hspace=params.hspace)
+
+        with self._lock:
+            self.created += 1
+        logger.debug(f"Figura creada para el pool (total: {self.created})")
+        return fig, axes
+
+    def _reset(self, fig, axes):
+        """Restaura figura y ejes al estado inicial"""
+        for text in list(fig.texts):
+            text.remove()
+        fig.patch.set_facecolor(self.facecolor)
+        fig.set_size_inches(self.figsize, forward=False)
+        fig.set_dpi(self.dpi)
+        fig.subplots_adjust(**fig.pool_subplotpars)
+
+        for ax in axes.flat:
+            reset_axes(ax, self.facecolor)
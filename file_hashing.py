@@ -0,0 +1,50 @@
+import os
+import hashlib
+import logging
+import threading
+from typing import Dict, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Tamaño de las muestras leídas al inicio y al final del archivo
+SAMPLE_SIZE = 1024 * 1024
+
+_fingerprint_cache: Dict[Tuple[str, int, int], str] = {}
+_fingerprint_lock = threading.Lock()
+
+
+def file_fingerprint(path: str, sample_size: int = SAMPLE_SIZE) -> str:
+    """
+    Calcula una huella SHA-256 de un archivo grande (modelos GGUF) sin leerlo entero:
+    combina el tamaño con el primer y el último bloque de sample_size bytes.
+    El resultado se memoriza por (ruta, tamaño, mtime) durante la sesión.
+    """
+    path = os.path.abspath(path)
+    stat = os.stat(path)
+    key = (path, stat.st_size, stat.st_mtime_ns)
+
+    with _fingerprint_lock:
+        cached = _fingerprint_cache.get(key)
+    if cached:
+        return cached
+
+    digest = hashlib.sha256()
+    digest.update(str(stat.st_size).encode('ascii'))
+
+    with open(path, 'rb') as f:
+        digest.update(f.read(sample_size))
+        if stat.st_size > sample_size:
+            f.seek(max(sample_size, stat.st_size - sample_size))
+            digest.update(f.read(sample_size))
+
+    fingerprint = digest.hexdigest()
+    with _fingerprint_lock:
+        _fingerprint_cache[key] = fingerprint
+
+    logger.debug(f"Huella calculada para {os.path.basename(path)}: {fingerprint[:16]}")
+    return fingerprint
+
+
+def text_hash(text: str) -> str:
+    """Hash SHA-256 de un texto (UTF-8)"""
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
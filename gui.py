@@ -6,6 +6,7 @@ from io import BytesIO
 from PIL import Image, ImageTk
 import os
 import logging
+from safe_expr import safe_eval
 
 # Configurar logging correctamente
 logging.basicConfig(
@@ -60,7 +61,7 @@ class MathVTuberSimple:
                         
                         # Evaluar de forma segura
                         if all(c in '0123456789+-*/(). ' for c in expr_clean):
-                            result = eval(expr_clean)
+                            result = safe_eval(expr_clean)
                             formula = f"{expr} = {result}"
                             
                             response = f"**Resolviendo: {expr}**\n\nResultado: {result}"
@@ -0,0 +1,257 @@
+"""
+Modo por lotes sin interfaz: responde un archivo de preguntas sin abrir Tk.
+
+Lee preguntas en JSONL (una por línea), las pasa por el mismo MathVTuber que usa
+la ventana y guarda en el directorio de salida:
+
+    responses.jsonl      una línea por pregunta (id, pregunta, respuesta, fórmula, imagen, tiempo)
+    images/<n>_<id>.png  visualización de cada respuesta (si la hay; n es la posición en la entrada)
+    metrics.json         métricas de latencia de la ejecución (p50/p95/p99 por etapa)
+
+Cada línea de entrada es un objeto con la pregunta en "question", "input", "text",
+"body" o "title" y, opcionalmente, un identificador en "id" o "request_id"; también
+se admiten líneas con una cadena JSON. Las líneas vacías se ignoran.
+
+El modelo genera una respuesta cada vez; con --concurrency N, mientras genera la
+siguiente, hasta N-1 respuestas anteriores se dibujan y guardan en paralelo.
+
+Uso:
+    python headless.py preguntas.jsonl --output salida [--concurrency 2] [--model ruta.gguf]
+"""
+import argparse
+import json
+import logging
+import re
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from config_manager import ConfigManager
+from metrics import get_metrics, shutdown_metrics
+
+logger = logging.getLogger(__name__)
+
+# Campos donde puede venir la pregunta y su identificador, por orden de preferencia
+QUESTION_FIELDS = ("question", "input", "text", "body", "title")
+ID_FIELDS = ("id", "request_id")
+
+
+def load_questions(path: Path) -> List[Tuple[str, str]]:
+    """
+    Lee las preguntas de un archivo JSONL
+
+    Returns:
+        List[Tuple[str, str]]: (identificador, pregunta) en el orden del archivo
+    """
+    questions = []
+    with open(path, 'r', encoding='utf-8') as f:
+        for line_number, line in enumerate(f, 1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                item = json.loads(line)
+            except json.JSONDecodeError as e:
+                raise ValueError(f"Línea {line_number}: JSON no válido ({e})")
+
+            if isinstance(item, str):
+                question, question_id = item, None
+            elif isinstance(item, dict):
+                question = next((item[k] for k in QUESTION_FIELDS if isinstance(item.get(k), str)), None)
+                question_id = next((str(item[k]) for k in ID_FIELDS if item.get(k) is not None), None)
+            else:
+                question, question_id = None, None
+
+            if not question or not question.strip():
+                raise ValueError(f"Línea {line_number}: no hay pregunta")
+            questions.append((question_id or f"q{line_number:05d}", question.strip()))
+    return questions
+
+
+def _safe_filename(question_id: str) -> str:
+    return re.sub(r'[^\w.-]', '_', question_id)[:100] or "pregunta"
+
+
+class BatchRunner:
+    """Responde preguntas con un MathVTuber y guarda los resultados en un directorio"""
+
+    def __init__(self, math_vtuber, output_dir: Path, concurrency: int = 1, images: bool = True):
+        self.math_vtuber = math_vtuber
+        self.output_dir = output_dir
+        self.concurrency = max(1, concurrency)
+        self.images = images
+
+        # El modelo no admite generaciones concurrentes (igual que en la ventana principal)
+        self.generation_lock = threading.Lock()
+        self.write_lock = threading.Lock()
+
+    def answer(self, index: int, question_id: str, question: str) -> Dict[str, Any]:
+        """
+        Genera la respuesta, la visualización y el PNG de una pregunta
+
+        El PNG lleva delante la posición en la entrada: dos ids repetidos (o que
+        quedan iguales al limpiarlos) no se sobrescriben la imagen.
+        """
+        start = time.perf_counter()
+        record = {"id": question_id, "question": question}
+        try:
+            with get_metrics().request("batch"):
+                with self.generation_lock:
+                    response, formula = self.math_vtuber.generate_text(question)
+                record.update(response=response, formula=formula, image=None)
+
+                if self.images:
+                    image = self.math_vtuber.visualizer.render_image(question, response, formula)
+                    if image is not None:
+                        relative_path = Path("images") / f"{index:05d}_{_safe_filename(question_id)}.png"
+                        (self.output_dir / relative_path).write_bytes(image.to_png())
+                        record["image"] = relative_path.as_posix()
+
+        except Exception as e:
+            logger.error(f"Error respondiendo {question_id}: {e}")
+            record["error"] = str(e)
+
+        record["seconds"] = round(time.perf_counter() - start, 3)
+        return record
+
+    def run(self, questions: List[Tuple[str, str]]) -> int:
+        """
+        Responde todas las preguntas
+
+        Los resultados se añaden a responses.jsonl a medida que terminan (campo
+        "index" con la posición en la entrada), así una ejecución interrumpida
+        conserva lo ya generado.
+
+        Returns:
+            int: Número de preguntas con error
+        """
+        (self.output_dir / "images").mkdir(parents=True, exist_ok=True)
+        errors = 0
+
+        with open(self.output_dir / "responses.jsonl", 'w', encoding='utf-8') as output, \
+                ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix="batch") as executor:
+            futures = {executor.submit(self.answer, index, question_id, question): index
+                       for index, (question_id, question) in enumerate(questions)}
+
+            for done, future in enumerate(as_completed(futures), 1):
+                record = dict(future.result(), index=futures[future])
+                if "error" in record:
+                    errors += 1
+                with self.write_lock:
+                    output.write(json.dumps(record, ensure_ascii=False) + "\n")
+                    output.flush()
+
+                status = "✗" if "error" in record else "✓"
+                print(f"[{done}/{len(questions)}] {status} {record['id']} ({record['seconds']:.2f}s)")
+
+        return errors
+
+
+def print_summary(total_seconds: float, count: int):
+    """Muestra los percentiles de latencia de la ejecución"""
+    metrics = get_metrics().snapshot()
+    print(f"\n{count} preguntas en {total_seconds:.1f}s ({count / max(total_seconds, 1e-9):.2f} preguntas/s)")
+
+    families = [("Petición", metrics.get("mathvtuber_request_seconds")),
+                ("Etapa", metrics.get("mathvtuber_stage_seconds"))]
+    for title, family in families:
+        for series in (family or {}).get("series", []):
+            if not series["count"]:
+                continue
+            label = series["labels"].get("stage") or series["labels"].get("kind", "")
+            print(f"  {title} {label:<22} p50 {series['p50'] * 1000:8.1f} ms   "
+                  f"p95 {series['p95'] * 1000:8.1f} ms   p99 {series['p99'] * 1000:8.1f} ms   (n={series['count']})")
+
+    rates = metrics.get("mathvtuber_tokens_per_second")
+    if rates and rates["series"] and rates["series"][0]["count"]:
+        print(f"  Generación: p50 {rates['series'][0]['p50']:.1f} tokens/s")
+
+
+def _override(config_manager: ConfigManager, key_path: str, value: Any):
+    """Cambia una opción solo para esta ejecución (ConfigManager.set la guardaría en disco)"""
+    config = config_manager.config
+    keys = key_path.split('.')
+    for key in keys[:-1]:
+        config = config.setdefault(key, {})
+    config[keys[-1]] = value
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Responde un archivo de preguntas JSONL sin interfaz gráfica")
+    parser.add_argument("input", type=Path, help="Archivo JSONL con las preguntas")
+    parser.add_argument("--output", "-o", type=Path, default=Path("batch_output"), help="Directorio de salida")
+    parser.add_argument("--concurrency", "-j", type=int, default=1,
+                        help="Preguntas en curso a la vez (el modelo genera de una en una)")
+    parser.add_argument("--render-processes", type=int, default=None,
+                        help="Procesos de renderizado (por defecto, visualization.render_processes)")
+    parser.add_argument("--model", default=None, help="Ruta del modelo (por defecto, la de la configuración)")
+    parser.add_argument("--config", default="config.json", help="Archivo de configuración")
+    parser.add_argument("--no-images", action="store_true", help="No generar visualizaciones")
+    parser.add_argument("--limit", type=int, default=None, help="Responder solo las primeras N preguntas")
+    parser.add_argument("--verbose", "-v", action="store_true", help="Mostrar el registro completo")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(
+        level=logging.INFO if args.verbose else logging.WARNING,
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+    )
+
+    try:
+        questions = load_questions(args.input)
+    except (OSError, ValueError) as e:
+        print(f"No se pudieron leer las preguntas: {e}")
+        return 2
+    if args.limit is not None:
+        questions = questions[:args.limit]
+    if not questions:
+        print("No hay preguntas que responder")
+        return 0
+
+    config_manager = ConfigManager(args.config)
+    # Una línea de registro por pregunta solo con --verbose; los percentiles van a metrics.json
+    _override(config_manager, "metrics.log_breakdown", args.verbose)
+    # Las métricas van a metrics.json dentro de --output; nada se escribe fuera de él
+    _override(config_manager, "metrics.export_path", "")
+    if args.render_processes is not None:
+        _override(config_manager, "visualization.render_processes", args.render_processes)
+    get_metrics(config_manager)
+
+    model_path = args.model or config_manager.get_mistral_model_path()
+    if not model_path or not Path(model_path).exists():
+        print(f"Archivo de modelo no encontrado: {model_path}")
+        return 2
+
+    # setup importa matplotlib y el visualizador: solo después de validar la entrada
+    from setup import MathVTuber
+    from render_service import shutdown_render_service
+
+    args.output.mkdir(parents=True, exist_ok=True)
+    try:
+        print(f"Cargando modelo {model_path}...")
+        math_vtuber = MathVTuber(model_path, config_manager)
+
+        start = time.perf_counter()
+        runner = BatchRunner(math_vtuber, args.output, args.concurrency, images=not args.no_images)
+        errors = runner.run(questions)
+        total_seconds = time.perf_counter() - start
+
+        print_summary(total_seconds, len(questions))
+        get_metrics().export(str(args.output / "metrics.json"))
+        print(f"\nResultados en {args.output}" + (f" ({errors} con error)" if errors else ""))
+        return 1 if errors else 0
+
+    except Exception as e:
+        logger.error(f"Error en el modo por lotes: {e}")
+        print(f"Error: {e}")
+        return 1
+
+    finally:
+        shutdown_render_service()
+        shutdown_metrics(config_manager)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,108 @@
+import json
+import logging
+import threading
+import urllib.error
+import urllib.request
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from language_manager import _
+from rendered_image import RenderedImage
+
+logger = logging.getLogger(__name__)
+
+
+class RemoteMathVTuber:
+    """
+    Cliente del servidor de inferencia con la misma interfaz que MathVTuber.
+
+    La ventana principal lo usa en lugar de cargar el modelo cuando server.url está
+    configurado: varias ventanas (o la ventana y las fuentes de OBS) comparten así
+    un único modelo cargado en inference_server.py.
+    """
+
+    def __init__(self, url: str, timeout: float = 300.0):
+        self.url = url.rstrip("/")
+        self.timeout = timeout
+        self.model_type = "remote"
+
+    def _post(self, path: str, data: Dict[str, Any], timeout: Optional[float] = None):
+        request = urllib.request.Request(
+            self.url + path,
+            data=json.dumps(data).encode('utf-8'),
+            headers={"Content-Type": "application/json"},
+            method="POST"
+        )
+        return urllib.request.urlopen(request, timeout=timeout or self.timeout)
+
+    def health(self) -> Dict[str, Any]:
+        """Estado del servidor (lanza una excepción si no responde)"""
+        with urllib.request.urlopen(self.url + "/health", timeout=5) as response:
+            return json.loads(response.read().decode('utf-8'))
+
+    def _fetch_image(self, image_url: Optional[str]) -> Any:
+        if not image_url:
+            return ""
+        try:
+            with urllib.request.urlopen(self.url + image_url, timeout=30) as response:
+                return RenderedImage(png=response.read())
+        except Exception as e:
+            logger.error(f"Error descargando visualización del servidor: {e}")
+            return ""
+
+    def generate_response(self, user_input: str) -> Tuple[str, str, Any]:
+        """Genera una respuesta en el servidor (bloquea hasta que termina)"""
+        try:
+            with self._post("/v1/generate", {"question": user_input}) as response:
+                result = json.loads(response.read().decode('utf-8'))
+            return result.get("response", ""), result.get("formula", ""), self._fetch_image(result.get("image_url"))
+
+        except Exception as e:
+            logger.error(f"Error generando respuesta en el servidor: {e}")
+            return _("errors.response_generation", "Error al generar respuesta") + f": {_describe_error(e)}", "", ""
+
+    def generate_response_stream(self, user_input: str, on_token: Callable[[str], None],
+                                 cancel_event: Optional[threading.Event] = None) -> Tuple[str, str, Any]:
+        """
+        Genera una respuesta en el servidor recibiendo los tokens por Server-Sent Events
+
+        Cancelar cierra la conexión; el servidor lo detecta y deja de generar.
+        """
+        pieces = []
+        try:
+            with self._post("/v1/generate", {"question": user_input, "stream": True}) as response:
+                for raw_line in response:
+                    if cancel_event is not None and cancel_event.is_set():
+                        logger.info("Generación cancelada por el usuario")
+                        return ''.join(pieces), "", ""
+
+                    line = raw_line.decode('utf-8').strip()
+                    if not line.startswith("data:"):
+                        continue
+                    event = json.loads(line[len("data:"):])
+
+                    if event.get("type") == "token":
+                        pieces.append(event["text"])
+                        on_token(event["text"])
+                    elif event.get("type") == "done":
+                        return (event.get("response", ''.join(pieces)), event.get("formula", ""),
+                                self._fetch_image(event.get("image_url")))
+                    elif event.get("type") == "error":
+                        raise RuntimeError(event.get("message", "error del servidor"))
+
+            raise ConnectionError("El servidor cerró la conexión antes de terminar")
+
+        except Exception as e:
+            logger.error(f"Error generando respuesta en el servidor (streaming): {e}")
+            if pieces:
+                return ''.join(pieces), "", ""
+            return _("errors.response_generation", "Error al generar respuesta") + f": {_describe_error(e)}", "", ""
+
+
+def _describe_error(error: Exception) -> str:
+    """Mensaje legible de un error HTTP (el servidor envía el motivo en JSON)"""
+    if isinstance(error, urllib.error.HTTPError):
+        try:
+            return json.loads(error.read().decode('utf-8')).get("message", str(error))
+        except Exception:
+            return str(error)
+    return str(error)
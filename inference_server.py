@@ -0,0 +1,648 @@
+"""
+Servidor local de inferencia: un único modelo cargado para varios clientes.
+
+Expone MathVTuber por HTTP y WebSocket (solo biblioteca estándar, asyncio):
+
+    GET  /health                  estado, tipo de modelo y longitud de la cola
+    GET  /metrics                 métricas en texto de Prometheus
+    POST /v1/generate             {"question": "...", "stream": false}
+                                  stream=true devuelve text/event-stream (token, done, error)
+    POST /v1/visualize            {"question", "response", "formula"} -> image/png
+    GET  /v1/images/<id>.png      visualización de una respuesta reciente
+    GET  /v1/ws                   WebSocket: {"type": "generate", "question": ...} y
+                                  {"type": "cancel"}; responde queued, token, done, error
+
+El modelo genera de una en una: las peticiones esperan en una cola acotada y, si
+está llena, se rechazan de inmediato (HTTP 503 con Retry-After) en lugar de
+acumular esperas sin límite. Un cliente que se desconecta cancela su petición.
+
+Uso:
+    python inference_server.py [--host 127.0.0.1] [--port 8765] [--model ruta.gguf]
+"""
+import argparse
+import asyncio
+import base64
+import hashlib
+import json
+import logging
+import math
+import os
+import struct
+import sys
+import threading
+import time
+import uuid
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Optional, Tuple
+from urllib.parse import urlsplit
+
+from config_manager import ConfigManager
+from metrics import get_metrics, shutdown_metrics, METRIC_PREFIX
+
+logger = logging.getLogger(__name__)
+
+# Identificador fijo del protocolo WebSocket (RFC 6455)
+WS_GUID = "258EAFA5-E914-47DA-95CA-C5AB0DC85B11"
+WS_OP_CONTINUATION, WS_OP_TEXT, WS_OP_BINARY = 0x0, 0x1, 0x2
+WS_OP_CLOSE, WS_OP_PING, WS_OP_PONG = 0x8, 0x9, 0xA
+
+# Límites de lo que se acepta de un cliente
+MAX_HEADER_LINES = 100
+MAX_BODY_BYTES = 64 * 1024
+# Visualizaciones recientes que se pueden descargar por su id
+MAX_STORED_IMAGES = 32
+# Espera máxima al evento final tras un "cancel" por WebSocket (el modelo para en el siguiente token)
+CANCEL_WAIT_SECONDS = 5.0
+
+HTTP_STATUS = {
+    200: "OK", 204: "No Content", 400: "Bad Request", 404: "Not Found",
+    405: "Method Not Allowed", 409: "Conflict", 413: "Payload Too Large",
+    500: "Internal Server Error", 503: "Service Unavailable",
+}
+
+
+class Rejected(Exception):
+    """La petición no se admite (cola llena, pregunta demasiado larga...)"""
+
+    def __init__(self, status: int, reason: str, message: str, retry_after: Optional[int] = None):
+        super().__init__(message)
+        self.status = status
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class Job:
+    """Una pregunta en la cola; sus eventos (token, done, error) llegan por una asyncio.Queue"""
+
+    def __init__(self, question: str):
+        self.id = uuid.uuid4().hex[:12]
+        self.question = question
+        self.events: asyncio.Queue = asyncio.Queue()
+        # Lo comprueba el hilo del modelo entre token y token
+        self.cancel_event = threading.Event()
+        # Peticiones por delante al entrar en la cola (la que se está generando incluida)
+        self.position = 0
+        # Lo asigna el servidor: quita el trabajo de la cola si aún no ha empezado
+        self.on_cancel = None
+
+    def cancel(self):
+        self.cancel_event.set()
+        if self.on_cancel is not None:
+            self.on_cancel(self)
+
+
+class HttpRequest:
+    def __init__(self, method: str, path: str, headers: Dict[str, str], body: bytes):
+        self.method = method
+        self.path = path
+        self.headers = headers
+        self.body = body
+
+    def json(self) -> Dict[str, Any]:
+        try:
+            data = json.loads(self.body.decode('utf-8') or "{}")
+        except (UnicodeDecodeError, json.JSONDecodeError) as e:
+            raise Rejected(400, "bad_request", f"JSON no válido: {e}")
+        if not isinstance(data, dict):
+            raise Rejected(400, "bad_request", "Se esperaba un objeto JSON")
+        return data
+
+
+class InferenceServer:
+    """
+    Servidor asyncio que comparte un MathVTuber entre clientes HTTP y WebSocket.
+
+    Un único trabajador saca las peticiones de la cola y las ejecuta en el hilo
+    del modelo (llama-cpp no admite generaciones concurrentes); los tokens pasan
+    al bucle de eventos con call_soon_threadsafe y de ahí a cada cliente.
+    """
+
+    def __init__(self, math_vtuber, host: str = "127.0.0.1", port: int = 8765,
+                 max_queue: int = 8, max_clients: int = 16, max_question_chars: int = 2000,
+                 request_timeout: float = 300.0):
+        self.math_vtuber = math_vtuber
+        self.host = host
+        self.port = port
+        self.max_queue = max(1, max_queue)
+        self.max_clients = max(1, max_clients)
+        self.max_question_chars = max_question_chars
+        self.request_timeout = request_timeout
+
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+        # Trabajos esperando al modelo (los cancelados salen en el acto y dejan su plaza)
+        self.waiting: "deque[Job]" = deque()
+        self.job_available: Optional[asyncio.Event] = None
+        self.active: Optional[Job] = None
+        self.clients = 0
+        self.images: "OrderedDict[str, bytes]" = OrderedDict()
+
+        # Duración media de las últimas peticiones (para Retry-After)
+        self.average_seconds = 10.0
+
+        # El modelo en un hilo propio; las visualizaciones sueltas en otro pool
+        self.model_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="model")
+        self.render_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="render")
+
+    # ------------------------------------------------------------------
+    # Cola y trabajador del modelo
+    # ------------------------------------------------------------------
+
+    def submit(self, question: Any) -> Job:
+        """Admite una pregunta en la cola o lanza Rejected"""
+        if not isinstance(question, str) or not question.strip():
+            raise Rejected(400, "bad_request", "Falta la pregunta")
+        if len(question) > self.max_question_chars:
+            raise Rejected(413, "too_long", f"La pregunta supera {self.max_question_chars} caracteres")
+
+        ahead = len(self.waiting) + (1 if self.active else 0)
+        if len(self.waiting) >= self.max_queue:
+            retry_after = max(1, math.ceil(self.average_seconds * ahead))
+            raise Rejected(503, "queue_full", "Servidor ocupado, inténtalo más tarde", retry_after)
+
+        job = Job(question.strip())
+        job.position = ahead
+        job.on_cancel = self._cancel_waiting
+        self.waiting.append(job)
+        self.job_available.set()
+
+        self._update_queue_gauge()
+        return job
+
+    def _cancel_waiting(self, job: Job):
+        """Un trabajo cancelado antes de empezar sale de la cola y termina sin pasar por el modelo"""
+        try:
+            self.waiting.remove(job)
+        except ValueError:
+            # Ya lo tomó el trabajador (o ya terminó): el hilo del modelo ve cancel_event
+            return
+        self._update_queue_gauge()
+        job.events.put_nowait(("done", {"id": job.id, "response": "", "formula": "", "cancelled": True}))
+
+    async def _worker(self):
+        while True:
+            while not self.waiting:
+                self.job_available.clear()
+                await self.job_available.wait()
+            job = self.waiting.popleft()
+            self._update_queue_gauge()
+
+            self.active = job
+            start = time.perf_counter()
+            future = self.loop.run_in_executor(self.model_executor, self._generate, job)
+            try:
+                result = await asyncio.wait_for(asyncio.shield(future), self.request_timeout)
+            except asyncio.TimeoutError:
+                # El hilo del modelo para en el siguiente token
+                job.cancel()
+                logger.warning(f"Petición {job.id} cancelada tras {self.request_timeout}s")
+                await asyncio.gather(future, return_exceptions=True)
+                job.events.put_nowait(("error", {"reason": "timeout", "message": "Tiempo de generación agotado"}))
+                continue
+            except Exception as e:
+                logger.error(f"Error generando respuesta {job.id}: {e}")
+                job.events.put_nowait(("error", {"reason": "internal", "message": str(e)}))
+                continue
+            finally:
+                self.active = None
+                elapsed = time.perf_counter() - start
+                self.average_seconds = 0.8 * self.average_seconds + 0.2 * elapsed
+
+            png = result.pop("png", None)
+            if png:
+                self._store_image(job.id, png)
+                result["image_url"] = f"/v1/images/{job.id}.png"
+            job.events.put_nowait(("done", result))
+
+    def _generate(self, job: Job) -> Dict[str, Any]:
+        """Se ejecuta en el hilo del modelo"""
+        def on_token(text: str):
+            self.loop.call_soon_threadsafe(job.events.put_nowait, ("token", {"text": text}))
+
+        response, formula, image = self.math_vtuber.generate_response_stream(
+            job.question, on_token, job.cancel_event)
+
+        png = image.to_png() if image and hasattr(image, 'to_png') else None
+        return {"id": job.id, "response": response, "formula": formula,
+                "cancelled": job.cancel_event.is_set(), "png": png}
+
+    def _store_image(self, image_id: str, png: bytes):
+        self.images[image_id] = png
+        while len(self.images) > MAX_STORED_IMAGES:
+            self.images.popitem(last=False)
+
+    def _update_queue_gauge(self):
+        get_metrics().gauge(f"{METRIC_PREFIX}_server_queue_depth", "Peticiones esperando al modelo").set(
+            len(self.waiting))
+
+    def _count_rejection(self, reason: str):
+        get_metrics().counter(f"{METRIC_PREFIX}_server_rejected_total", "Peticiones rechazadas",
+                              reason=reason).inc()
+
+    # ------------------------------------------------------------------
+    # HTTP
+    # ------------------------------------------------------------------
+
+    async def _read_request(self, reader: asyncio.StreamReader) -> Optional[HttpRequest]:
+        request_line = await reader.readline()
+        if not request_line:
+            return None
+        try:
+            method, target, _version = request_line.decode('latin-1').split()
+        except ValueError:
+            raise Rejected(400, "bad_request", "Línea de petición no válida")
+
+        headers = {}
+        for _ in range(MAX_HEADER_LINES):
+            line = await reader.readline()
+            if line in (b"\r\n", b"\n", b""):
+                break
+            name, _, value = line.decode('latin-1').partition(":")
+            headers[name.strip().lower()] = value.strip()
+        else:
+            raise Rejected(400, "bad_request", "Demasiadas cabeceras")
+
+        try:
+            length = int(headers.get("content-length", "0") or 0)
+        except ValueError:
+            raise Rejected(400, "bad_request", "Content-Length no válido")
+        if length < 0:
+            raise Rejected(400, "bad_request", "Content-Length no válido")
+        if length > MAX_BODY_BYTES:
+            raise Rejected(413, "too_large", "Cuerpo de la petición demasiado grande")
+        body = await reader.readexactly(length) if length else b""
+        return HttpRequest(method.upper(), urlsplit(target).path, headers, body)
+
+    async def _send(self, writer: asyncio.StreamWriter, status: int, body: bytes = b"",
+                    content_type: str = "application/json", extra_headers: Optional[Dict[str, str]] = None):
+        headers = {
+            "Content-Type": content_type,
+            "Content-Length": str(len(body)),
+            "Connection": "close",
+            # Las fuentes de navegador de OBS cargan páginas locales con otro origen
+            "Access-Control-Allow-Origin": "*",
+            "Access-Control-Allow-Headers": "Content-Type",
+            "Access-Control-Allow-Methods": "GET, POST, OPTIONS",
+        }
+        headers.update(extra_headers or {})
+        head = f"HTTP/1.1 {status} {HTTP_STATUS.get(status, '')}\r\n"
+        head += "".join(f"{name}: {value}\r\n" for name, value in headers.items()) + "\r\n"
+        writer.write(head.encode('latin-1') + body)
+        await writer.drain()
+
+    async def _send_json(self, writer, status: int, data: Dict[str, Any], extra_headers=None):
+        await self._send(writer, status, json.dumps(data, ensure_ascii=False).encode('utf-8'),
+                         extra_headers=extra_headers)
+
+    async def _send_rejection(self, writer, rejected: Rejected):
+        self._count_rejection(rejected.reason)
+        headers = {"Retry-After": str(rejected.retry_after)} if rejected.retry_after else None
+        await self._send_json(writer, rejected.status,
+                              {"error": rejected.reason, "message": str(rejected)}, headers)
+
+    async def _handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            try:
+                request = await self._read_request(reader)
+                if request is None:
+                    return
+                await self._route(request, reader, writer)
+            except Rejected as rejected:
+                await self._send_rejection(writer, rejected)
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        except Exception as e:
+            logger.error(f"Error atendiendo conexión: {e}")
+        finally:
+            try:
+                writer.close()
+                await writer.wait_closed()
+            except Exception:
+                pass
+
+    async def _route(self, request: HttpRequest, reader, writer):
+        path, method = request.path.rstrip("/") or "/", request.method
+
+        if method == "OPTIONS":
+            await self._send(writer, 204)
+        elif path == "/health" and method == "GET":
+            await self._send_json(writer, 200, {
+                "status": "ok",
+                "model_type": getattr(self.math_vtuber, 'model_type', 'unknown'),
+                "busy": self.active is not None,
+                "queued": len(self.waiting),
+                "max_queue": self.max_queue,
+                "clients": self.clients,
+            })
+        elif path == "/metrics" and method == "GET":
+            await self._send(writer, 200, get_metrics().to_prometheus().encode('utf-8'),
+                             "text/plain; version=0.0.4; charset=utf-8")
+        elif path == "/v1/generate" and method == "POST":
+            await self._handle_generate(request, reader, writer)
+        elif path == "/v1/visualize" and method == "POST":
+            await self._handle_visualize(request, writer)
+        elif path.startswith("/v1/images/") and method == "GET":
+            png = self.images.get(path[len("/v1/images/"):].removesuffix(".png"))
+            if png is None:
+                raise Rejected(404, "not_found", "Imagen no encontrada o expirada")
+            await self._send(writer, 200, png, "image/png")
+        elif path == "/v1/ws" and method == "GET":
+            await self._handle_websocket(request, reader, writer)
+        elif path in ("/health", "/metrics", "/v1/generate", "/v1/visualize", "/v1/ws"):
+            raise Rejected(405, "method_not_allowed", f"Método {method} no admitido en {path}")
+        else:
+            raise Rejected(404, "not_found", f"Ruta desconocida: {path}")
+
+    async def _handle_generate(self, request: HttpRequest, reader, writer):
+        data = request.json()
+        job = self.submit(data.get("question"))
+
+        if not data.get("stream"):
+            result = await self._wait_done(job, reader)
+            if result is None:
+                # El cliente se fue sin esperar la respuesta: se libera el modelo
+                job.cancel()
+                return
+            event, payload = result
+            await self._send_json(writer, 200 if event == "done" else 500, payload)
+            return
+
+        # Server-Sent Events: una línea "data:" por evento
+        writer.write(("HTTP/1.1 200 OK\r\n"
+                      "Content-Type: text/event-stream; charset=utf-8\r\n"
+                      "Cache-Control: no-cache\r\n"
+                      "Connection: close\r\n"
+                      "Access-Control-Allow-Origin: *\r\n\r\n").encode('latin-1'))
+
+        async def send_event(event: str, payload: Dict[str, Any]):
+            line = json.dumps(dict(payload, type=event), ensure_ascii=False)
+            writer.write(f"data: {line}\n\n".encode('utf-8'))
+            await writer.drain()
+
+        try:
+            await send_event("queued", {"id": job.id, "position": job.position})
+            await self._stream_job(job, send_event)
+        except (ConnectionError, asyncio.CancelledError):
+            # El cliente cerró la conexión: no tiene sentido seguir generando
+            job.cancel()
+            raise
+
+    async def _next_final_event(self, job: Job) -> Tuple[str, Dict[str, Any]]:
+        while True:
+            event, payload = await job.events.get()
+            if event in ("done", "error"):
+                return event, payload
+
+    async def _wait_done(self, job: Job, reader: asyncio.StreamReader) -> Optional[Tuple[str, Dict[str, Any]]]:
+        """Espera el final del trabajo; None si el cliente cierra la conexión antes"""
+        done_task = asyncio.ensure_future(self._next_final_event(job))
+        # Tras el cuerpo el cliente no envía nada más: EOF (o un error) es una desconexión
+        eof_task = asyncio.ensure_future(reader.read(1))
+        try:
+            finished, _pending = await asyncio.wait({done_task, eof_task}, return_when=asyncio.FIRST_COMPLETED)
+            if done_task in finished:
+                return done_task.result()
+            if eof_task.exception() is not None or eof_task.result() == b"":
+                return None
+            return await done_task
+        finally:
+            for task in (done_task, eof_task):
+                if not task.done():
+                    task.cancel()
+
+    async def _stream_job(self, job: Job, send_event):
+        while True:
+            event, payload = await job.events.get()
+            await send_event(event, payload)
+            if event in ("done", "error"):
+                return
+
+    async def _stream_to_websocket(self, job: Job, send_event):
+        try:
+            await self._stream_job(job, send_event)
+        except ConnectionError:
+            job.cancel()
+
+    async def _handle_visualize(self, request: HttpRequest, writer):
+        data = request.json()
+        question = data.get("question") or ""
+        if not isinstance(question, str) or len(question) > self.max_question_chars:
+            raise Rejected(400, "bad_request", "Pregunta no válida")
+        visualizer = getattr(self.math_vtuber, 'visualizer', None)
+        if visualizer is None:
+            raise Rejected(404, "not_found", "El servidor no tiene visualizador")
+
+        def render() -> Optional[bytes]:
+            image = visualizer.render_image(question, str(data.get("response") or ""),
+                                            str(data.get("formula") or ""))
+            return image.to_png() if image else None
+
+        png = await self.loop.run_in_executor(self.render_executor, render)
+        if not png:
+            await self._send(writer, 204)
+        else:
+            await self._send(writer, 200, png, "image/png")
+
+    # ------------------------------------------------------------------
+    # WebSocket
+    # ------------------------------------------------------------------
+
+    async def _handle_websocket(self, request: HttpRequest, reader, writer):
+        key = request.headers.get("sec-websocket-key")
+        if request.headers.get("upgrade", "").lower() != "websocket" or not key:
+            raise Rejected(400, "bad_request", "Se esperaba una conexión WebSocket")
+        if self.clients >= self.max_clients:
+            raise Rejected(503, "too_many_clients", "Demasiados clientes conectados", retry_after=5)
+
+        accept = base64.b64encode(hashlib.sha1((key + WS_GUID).encode('ascii')).digest()).decode('ascii')
+        writer.write(("HTTP/1.1 101 Switching Protocols\r\n"
+                      "Upgrade: websocket\r\n"
+                      "Connection: Upgrade\r\n"
+                      f"Sec-WebSocket-Accept: {accept}\r\n\r\n").encode('latin-1'))
+        await writer.drain()
+
+        self.clients += 1
+        send_lock = asyncio.Lock()
+        current: Dict[str, Any] = {"job": None, "task": None}
+
+        async def send_frame(opcode: int, payload: bytes):
+            async with send_lock:
+                writer.write(_ws_frame(opcode, payload))
+                await writer.drain()
+
+        async def send_event(event: str, payload: Dict[str, Any]):
+            await send_frame(WS_OP_TEXT, json.dumps(dict(payload, type=event), ensure_ascii=False).encode('utf-8'))
+
+        try:
+            while True:
+                opcode, payload = await _ws_read_message(reader)
+                if opcode == WS_OP_CLOSE:
+                    await send_frame(WS_OP_CLOSE, payload[:2])
+                    return
+                if opcode == WS_OP_PING:
+                    await send_frame(WS_OP_PONG, payload)
+                    continue
+                if opcode != WS_OP_TEXT:
+                    continue
+
+                try:
+                    message = json.loads(payload.decode('utf-8'))
+                    kind = message.get("type") if isinstance(message, dict) else None
+                except (UnicodeDecodeError, json.JSONDecodeError):
+                    kind, message = None, {}
+
+                if kind == "cancel":
+                    if current["job"] is not None:
+                        current["job"].cancel()
+                        # Esperar el evento final: la siguiente "generate" no debe encontrar la conexión ocupada
+                        task = current["task"]
+                        if task is not None and not task.done():
+                            await asyncio.wait({task}, timeout=CANCEL_WAIT_SECONDS)
+                elif kind == "generate":
+                    if current["task"] is not None and not current["task"].done():
+                        self._count_rejection("busy_connection")
+                        await send_event("error", {"reason": "busy_connection",
+                                                   "message": "Ya hay una petición en curso en esta conexión"})
+                        continue
+                    try:
+                        job = self.submit(message.get("question"))
+                    except Rejected as rejected:
+                        self._count_rejection(rejected.reason)
+                        await send_event("error", {"reason": rejected.reason, "message": str(rejected),
+                                                   "retry_after": rejected.retry_after})
+                        continue
+                    await send_event("queued", {"id": job.id, "position": job.position})
+                    current["job"] = job
+                    current["task"] = asyncio.create_task(self._stream_to_websocket(job, send_event))
+                    current["task"].add_done_callback(
+                        lambda _task, job=job: current.update(job=None, task=None) if current["job"] is job else None)
+                else:
+                    await send_event("error", {"reason": "bad_request", "message": "Mensaje no reconocido"})
+
+        except (ConnectionError, asyncio.IncompleteReadError, ValueError):
+            pass
+        finally:
+            self.clients -= 1
+            if current["job"] is not None:
+                current["job"].cancel()
+            if current["task"] is not None:
+                current["task"].cancel()
+
+    # ------------------------------------------------------------------
+
+    async def serve(self):
+        """Atiende clientes hasta que se cancele la tarea"""
+        self.loop = asyncio.get_running_loop()
+        self.job_available = asyncio.Event()
+        worker = asyncio.create_task(self._worker())
+
+        server = await asyncio.start_server(self._handle_connection, self.host, self.port)
+        logger.info(f"Servidor de inferencia escuchando en http://{self.host}:{self.port}")
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            worker.cancel()
+            if self.active is not None:
+                self.active.cancel()
+            self.model_executor.shutdown(wait=False, cancel_futures=True)
+            self.render_executor.shutdown(wait=False, cancel_futures=True)
+
+
+def _ws_frame(opcode: int, payload: bytes) -> bytes:
+    """Trama WebSocket del servidor (sin máscara, en un solo fragmento)"""
+    length = len(payload)
+    if length < 126:
+        header = struct.pack("!BB", 0x80 | opcode, length)
+    elif length < 1 << 16:
+        header = struct.pack("!BBH", 0x80 | opcode, 126, length)
+    else:
+        header = struct.pack("!BBQ", 0x80 | opcode, 127, length)
+    return header + payload
+
+
+async def _ws_read_frame(reader: asyncio.StreamReader) -> Tuple[bool, int, bytes]:
+    first, second = await reader.readexactly(2)
+    length = second & 0x7F
+    if length == 126:
+        (length,) = struct.unpack("!H", await reader.readexactly(2))
+    elif length == 127:
+        (length,) = struct.unpack("!Q", await reader.readexactly(8))
+    if length > MAX_BODY_BYTES:
+        raise ValueError("Mensaje WebSocket demasiado grande")
+
+    mask = await reader.readexactly(4) if second & 0x80 else None
+    payload = await reader.readexactly(length)
+    if mask:
+        payload = bytes(b ^ mask[i % 4] for i, b in enumerate(payload))
+    return bool(first & 0x80), first & 0x0F, payload
+
+
+async def _ws_read_message(reader: asyncio.StreamReader) -> Tuple[int, bytes]:
+    """Lee un mensaje completo (reúne los fragmentos; las tramas de control llegan sueltas)"""
+    fin, opcode, payload = await _ws_read_frame(reader)
+    if opcode >= WS_OP_CLOSE or fin:
+        return opcode, payload
+
+    parts = [payload]
+    while True:
+        fin, continuation, payload = await _ws_read_frame(reader)
+        if continuation != WS_OP_CONTINUATION:
+            raise ValueError("Se esperaba un fragmento de continuación")
+        parts.append(payload)
+        if sum(len(part) for part in parts) > MAX_BODY_BYTES:
+            raise ValueError("Mensaje WebSocket demasiado grande")
+        if fin:
+            return opcode, b"".join(parts)
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Servidor local de inferencia de MathVTuber")
+    parser.add_argument("--host", default=None, help="Dirección (por defecto, server.host)")
+    parser.add_argument("--port", type=int, default=None, help="Puerto (por defecto, server.port)")
+    parser.add_argument("--model", default=None, help="Ruta del modelo (por defecto, la de la configuración)")
+    parser.add_argument("--config", default="config.json", help="Archivo de configuración")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+
+    config_manager = ConfigManager(args.config)
+    get_metrics(config_manager)
+
+    model_path = args.model or config_manager.get_mistral_model_path()
+    if not model_path or not os.path.exists(model_path):
+        print(f"Archivo de modelo no encontrado: {model_path}")
+        return 2
+
+    from setup import MathVTuber
+    from render_service import shutdown_render_service
+
+    try:
+        math_vtuber = MathVTuber(model_path, config_manager)
+        server = InferenceServer(
+            math_vtuber,
+            host=args.host or config_manager.get("server.host", "127.0.0.1"),
+            port=args.port or config_manager.get("server.port", 8765),
+            max_queue=config_manager.get("server.max_queue", 8),
+            max_clients=config_manager.get("server.max_clients", 16),
+            max_question_chars=config_manager.get("server.max_question_chars", 2000),
+            request_timeout=config_manager.get("server.request_timeout", 300)
+        )
+        asyncio.run(server.serve())
+        return 0
+
+    except KeyboardInterrupt:
+        logger.info("Servidor detenido")
+        return 0
+
+    except Exception as e:
+        logger.error(f"Error en el servidor de inferencia: {e}")
+        return 1
+
+    finally:
+        shutdown_render_service()
+        shutdown_metrics(config_manager)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,329 @@
+import os
+import json
+import time
+import hashlib
+import logging
+import platform
+import threading
+from pathlib import Path
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple
+
+from file_hashing import file_fingerprint
+
+logger = logging.getLogger(__name__)
+
+TUNING_VERSION = 1
+DEFAULT_N_BATCH = 512
+BATCH_CANDIDATES = (128, 256, 512)
+CALIBRATION_CONTEXT = 1024
+PROMPT_TOKENS = 512
+GENERATION_TOKENS = 16
+# Dentro de este margen gana la opción con menos hilos (deja núcleos a la GUI y al TTS)
+TIE_TOLERANCE = 0.03
+# Texto de calibración (se repite hasta llegar a PROMPT_TOKENS)
+CALIBRATION_TEXT = "Calcula la derivada de f(x) = 3x^2 + 2x - 5 y explica cada paso con detalle. "
+
+_threads_batch_supported: Optional[bool] = None
+
+
+class InferenceParams(NamedTuple):
+    n_threads: int
+    # None: no se pasa a Llama y llama-cpp-python usa todas las CPUs para los lotes
+    n_threads_batch: Optional[int]
+    n_batch: int
+    # tokens/s medidos (0 si no vienen de una calibración)
+    prompt_tps: float = 0.0
+    generation_tps: float = 0.0
+
+    def llama_kwargs(self) -> Dict[str, int]:
+        """Argumentos para llama_cpp.Llama (n_threads_batch solo si la versión instalada lo admite)"""
+        kwargs = {"n_threads": self.n_threads, "n_batch": self.n_batch}
+        if self.n_threads_batch is not None and supports_threads_batch():
+            kwargs["n_threads_batch"] = self.n_threads_batch
+        return kwargs
+
+
+def supports_threads_batch() -> bool:
+    """True si llama_cpp.Llama acepta n_threads_batch (llama-cpp-python >= 0.2.x)"""
+    global _threads_batch_supported
+    if _threads_batch_supported is None:
+        try:
+            import inspect
+            from llama_cpp import Llama
+            _threads_batch_supported = "n_threads_batch" in inspect.signature(Llama.__init__).parameters
+        except Exception:
+            _threads_batch_supported = False
+    return _threads_batch_supported
+
+
+def _usable_cpus() -> List[int]:
+    try:
+        return sorted(os.sched_getaffinity(0))
+    except AttributeError:
+        return list(range(os.cpu_count() or 1))
+
+
+def _physical_cores_sysfs(cpus: List[int]) -> Optional[int]:
+    """Núcleos físicos distintos entre las CPUs utilizables (Linux)"""
+    cores = set()
+    for cpu in cpus:
+        topology = f"/sys/devices/system/cpu/cpu{cpu}/topology"
+        try:
+            with open(os.path.join(topology, "physical_package_id")) as f:
+                package = f.read().strip()
+            with open(os.path.join(topology, "core_id")) as f:
+                core = f.read().strip()
+        except OSError:
+            return None
+        cores.add((package, core))
+    return len(cores) or None
+
+
+def _physical_cores_psutil() -> Optional[int]:
+    try:
+        import psutil
+        return psutil.cpu_count(logical=False)
+    except Exception:
+        return None
+
+
+def cpu_topology() -> Tuple[int, int]:
+    """(núcleos físicos, CPUs lógicas) que puede usar este proceso"""
+    cpus = _usable_cpus()
+    logical = len(cpus)
+    physical = _physical_cores_sysfs(cpus) or _physical_cores_psutil() or logical
+    return max(1, min(physical, logical)), logical
+
+
+def _cpu_model() -> str:
+    try:
+        with open("/proc/cpuinfo", 'r', encoding='utf-8', errors='replace') as f:
+            for line in f:
+                if line.startswith("model name"):
+                    return line.split(":", 1)[1].strip()
+    except OSError:
+        pass
+    return platform.processor() or platform.machine()
+
+
+def cpu_signature() -> str:
+    """Identificador de la CPU: modelo, arquitectura y topología utilizable"""
+    physical, logical = cpu_topology()
+    description = f"{_cpu_model()}|{platform.machine()}|{physical}c/{logical}t"
+    return hashlib.sha1(description.encode('utf-8')).hexdigest()[:16]
+
+
+def default_params() -> InferenceParams:
+    """Sin calibración: un hilo por núcleo físico para generar (el SMT rara vez acelera llama.cpp)"""
+    physical, _logical = cpu_topology()
+    return InferenceParams(physical, None, DEFAULT_N_BATCH)
+
+
+def thread_candidates() -> List[int]:
+    """Números de hilos a probar según la topología"""
+    physical, logical = cpu_topology()
+    candidates = {physical, max(1, physical // 2), max(1, physical - 1)}
+    if logical > physical:
+        candidates.add(logical)
+    return sorted(candidates)
+
+
+def _faster(candidate: float, best: float) -> bool:
+    return candidate > best * (1 + TIE_TOLERANCE)
+
+
+class InferenceTuner:
+    """
+    Calibra n_threads, n_threads_batch y n_batch de llama.cpp y guarda el mejor resultado.
+
+    Los resultados se guardan en un JSON por huella del modelo (file_fingerprint)
+    y firma de CPU (cpu_signature): la calibración se hace una vez por modelo y
+    tipo de máquina y después solo se consulta.
+
+    La búsqueda tiene dos fases, porque cada parámetro afecta a una etapa:
+    - generación (un token por paso): depende de n_threads
+    - evaluación del prompt (por lotes): depende de n_threads_batch y n_batch
+    Cada medida crea un Llama con n_ctx pequeño; con mmap y el modelo ya en la
+    caché de páginas, crearlo cuesta poco comparado con la medida.
+    """
+
+    def __init__(self, store_path: str = "cache/inference_tuning.json", budget_seconds: float = 120.0):
+        self.store_path = Path(store_path)
+        self.budget_seconds = budget_seconds
+        self.lock = threading.Lock()
+        self.results: Dict[str, Dict[str, Any]] = self._load()
+
+    def _load(self) -> Dict[str, Dict[str, Any]]:
+        try:
+            if self.store_path.exists():
+                with open(self.store_path, 'r', encoding='utf-8') as f:
+                    data = json.load(f)
+                if data.get("version") == TUNING_VERSION:
+                    return data.get("results", {})
+        except Exception as e:
+            logger.error(f"Error cargando calibraciones de inferencia: {e}")
+        return {}
+
+    def _save(self):
+        with self.lock:
+            data = {"version": TUNING_VERSION, "results": dict(self.results)}
+        try:
+            self.store_path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = self.store_path.with_suffix(".tmp")
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(data, f, indent=2, ensure_ascii=False)
+            os.replace(tmp_path, self.store_path)
+        except Exception as e:
+            logger.error(f"Error guardando calibraciones de inferencia: {e}")
+
+    def _key(self, model_path: str) -> str:
+        return f"{file_fingerprint(model_path)}:{cpu_signature()}"
+
+    def lookup(self, model_path: str) -> Optional[InferenceParams]:
+        """Parámetros ya medidos para este modelo en esta CPU, None si no hay"""
+        try:
+            key = self._key(model_path)
+        except OSError as e:
+            logger.error(f"Error calculando huella del modelo: {e}")
+            return None
+        with self.lock:
+            entry = self.results.get(key)
+        if not entry:
+            return None
+        return InferenceParams(entry["n_threads"], entry["n_threads_batch"], entry["n_batch"],
+                               entry.get("prompt_tps", 0.0), entry.get("generation_tps", 0.0))
+
+    def params_for(self, model_path: str) -> InferenceParams:
+        """Parámetros medidos (calibrando la primera vez); los de por defecto si no se puede medir"""
+        params = self.lookup(model_path)
+        if params is not None:
+            logger.info(f"Usando calibración guardada: {params.n_threads} hilos, "
+                        f"{params.n_threads_batch} hilos de lote, n_batch={params.n_batch}")
+            return params
+        try:
+            return self.calibrate(model_path)
+        except ImportError:
+            logger.warning("llama-cpp-python no está instalado: no se puede calibrar")
+        except Exception as e:
+            logger.error(f"Error calibrando inferencia: {e}")
+        return default_params()
+
+    def _measure(self, llama_class, model_path: str, prompt_tokens: int,
+                 n_threads: int, n_threads_batch: int, n_batch: int) -> Tuple[float, float]:
+        """tokens/s de evaluación de prompt y de generación con una configuración"""
+        params = InferenceParams(n_threads, n_threads_batch, n_batch)
+        llm = llama_class(model_path=model_path, n_ctx=CALIBRATION_CONTEXT, n_gpu_layers=0,
+                          use_mmap=True, verbose=False, **params.llama_kwargs())
+        try:
+            text = CALIBRATION_TEXT
+            tokens = llm.tokenize(text.encode('utf-8'))
+            while len(tokens) < prompt_tokens:
+                tokens = tokens + llm.tokenize(text.encode('utf-8'), add_bos=False)
+            tokens = tokens[:prompt_tokens]
+
+            # Calentamiento: reserva de buffers y primeras páginas del modelo
+            llm.eval(tokens[:8])
+            llm.reset()
+
+            start = time.perf_counter()
+            llm.eval(tokens)
+            prompt_tps = len(tokens) / (time.perf_counter() - start)
+
+            start = time.perf_counter()
+            for token in tokens[:GENERATION_TOKENS]:
+                llm.eval([token])
+            generation_tps = GENERATION_TOKENS / (time.perf_counter() - start)
+            return prompt_tps, generation_tps
+        finally:
+            close = getattr(llm, "close", None)
+            if callable(close):
+                close()
+            del llm
+
+    def calibrate(self, model_path: str) -> InferenceParams:
+        """
+        Mide las combinaciones candidatas y guarda la mejor
+
+        Si se agota budget_seconds se usa lo mejor medido hasta entonces.
+
+        Raises:
+            ImportError: Si llama-cpp-python no está instalado
+        """
+        from llama_cpp import Llama
+
+        physical, logical = cpu_topology()
+        logger.info(f"Calibrando inferencia para {os.path.basename(model_path)} "
+                    f"({physical} núcleos físicos, {logical} CPUs lógicas)...")
+        started = time.monotonic()
+        prompt_tokens = min(PROMPT_TOKENS, CALIBRATION_CONTEXT - GENERATION_TOKENS - 1)
+        measured: Dict[Tuple[int, int, int], Tuple[float, float]] = {}
+
+        def measure(n_threads, n_threads_batch, n_batch):
+            key = (n_threads, n_threads_batch, n_batch)
+            if key not in measured:
+                measured[key] = self._measure(Llama, model_path, prompt_tokens, *key)
+                logger.info(f"  hilos={n_threads} hilos_lote={n_threads_batch} n_batch={n_batch}: "
+                            f"prompt {measured[key][0]:.1f} tok/s, generación {measured[key][1]:.1f} tok/s")
+            return measured[key]
+
+        def out_of_time():
+            return time.monotonic() - started > self.budget_seconds
+
+        # Fase 1: hilos de generación
+        best_threads, best_generation = physical, 0.0
+        for n_threads in thread_candidates():
+            if measured and out_of_time():
+                break
+            _prompt_tps, generation_tps = measure(n_threads, n_threads, DEFAULT_N_BATCH)
+            if _faster(generation_tps, best_generation):
+                best_threads, best_generation = n_threads, generation_tps
+
+        # Fase 2: hilos y tamaño de lote para evaluar el prompt
+        batch_threads = sorted({best_threads, physical, logical}) if supports_threads_batch() else [best_threads]
+        best_batch_threads, best_batch = best_threads, DEFAULT_N_BATCH
+        best_prompt = measured[(best_threads, best_threads, DEFAULT_N_BATCH)][0]
+        for n_threads_batch in batch_threads:
+            for n_batch in BATCH_CANDIDATES:
+                if out_of_time():
+                    break
+                prompt_tps, _generation_tps = measure(best_threads, n_threads_batch, n_batch)
+                if _faster(prompt_tps, best_prompt):
+                    best_batch_threads, best_batch, best_prompt = n_threads_batch, n_batch, prompt_tps
+
+        params = InferenceParams(best_threads, best_batch_threads, best_batch, best_prompt, best_generation)
+        logger.info(f"Calibración completada en {time.monotonic() - started:.0f}s: {params.n_threads} hilos, "
+                    f"{params.n_threads_batch} hilos de lote, n_batch={params.n_batch} "
+                    f"(prompt {params.prompt_tps:.1f} tok/s, generación {params.generation_tps:.1f} tok/s)")
+
+        try:
+            import llama_cpp
+            version = getattr(llama_cpp, "__version__", "")
+        except ImportError:
+            version = ""
+        with self.lock:
+            self.results[self._key(model_path)] = dict(
+                params._asdict(),
+                model=os.path.basename(model_path),
+                cpu=f"{_cpu_model()} ({physical}c/{logical}t)",
+                llama_cpp=version,
+                measured_at=time.strftime("%Y-%m-%dT%H:%M:%S"),
+            )
+        self._save()
+        return params
+
+
+_inference_tuner = None
+
+
+def get_inference_tuner(config_manager=None) -> InferenceTuner:
+    """Obtiene el calibrador global"""
+    global _inference_tuner
+    if _inference_tuner is None:
+        if config_manager is not None:
+            _inference_tuner = InferenceTuner(
+                store_path=config_manager.get("paths.inference_tuning", "cache/inference_tuning.json"),
+                budget_seconds=config_manager.get("ai.auto_tune_budget", 120)
+            )
+        else:
+            _inference_tuner = InferenceTuner()
+    return _inference_tuner
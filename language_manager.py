@@ -3,6 +3,7 @@ import os
 import logging
 from typing import Dict, Any, Optional
 from pathlib import Path
+from startup_trace import traced
 
 logger = logging.getLogger(__name__)
 
@@ -25,6 +26,7 @@ class LanguageManager:
         if config_manager:
             self.current_language = config_manager.get("ui.language", "es")
     
+    @traced()
     def load_languages(self):
         """Carga todos los archivos de idioma disponibles"""
         try:
@@ -289,18 +291,19 @@ Always respond in English and be concise but complete.""",
             with open(en_file, 'w', encoding='utf-8') as f:
                 json.dump(english_translations, f, indent=2, ensure_ascii=False)
     
-    def get_text(self, key: str, default: str = None) -> str:
-        """Obtiene texto traducido usando notación de punto"""
+    def get_text(self, key: str, default: str = None, language: str = None) -> str:
+        """Obtiene texto traducido usando notación de punto (en language si se indica, sin cambiar el idioma actual)"""
         try:
+            language = language or self.current_language
             keys = key.split('.')
-            value = self.translations.get(self.current_language, {})
+            value = self.translations.get(language, {})
             
             for k in keys:
                 if isinstance(value, dict) and k in value:
                     value = value[k]
                 else:
                     # Si no se encuentra, intentar en español como fallback
-                    if self.current_language != "es":
+                    if language != "es":
                         value = self.translations.get("es", {})
                         for k in keys:
                             if isinstance(value, dict) and k in value:
@@ -0,0 +1,100 @@
+import logging
+import importlib
+import importlib.util
+import threading
+import time
+from typing import Iterable, Optional
+
+from startup_trace import trace_span
+
+logger = logging.getLogger(__name__)
+
+# Módulos pesados que no deben cargarse antes de mostrar la ventana. sympy va
+# primero: matplotlib ya lo importa el hilo que crea MathVTuber
+HEAVY_MODULES = (
+    'sympy',
+    'numpy',
+    'matplotlib.figure',
+    'matplotlib.backends.backend_agg',
+)
+
+
+def is_available(name: str) -> bool:
+    """
+    Comprueba si un módulo se puede importar sin importarlo
+
+    find_spec solo busca el paquete en sys.path; no ejecuta su código, así que
+    comprobar numpy, matplotlib o sympy cuesta milisegundos en lugar de segundos.
+    """
+    try:
+        return importlib.util.find_spec(name) is not None
+    except (ImportError, ValueError):
+        # ModuleNotFoundError si falta el paquete padre de un submódulo
+        return False
+
+
+class LazyModule:
+    """
+    Módulo que se importa la primera vez que se usa uno de sus atributos.
+
+    Permite escribir sp = lazy_import('sympy') al principio del archivo y usar
+    sp.solve(...) como siempre: sympy solo se carga al resolver la primera ecuación.
+    """
+
+    def __init__(self, name: str):
+        self.__dict__['_name'] = name
+        self.__dict__['_module'] = None
+
+    def _load(self):
+        module = self.__dict__['_module']
+        if module is None:
+            # importlib ya serializa importaciones concurrentes del mismo módulo
+            module = importlib.import_module(self.__dict__['_name'])
+            self.__dict__['_module'] = module
+        return module
+
+    def __getattr__(self, attribute: str):
+        return getattr(self._load(), attribute)
+
+    def __repr__(self) -> str:
+        state = 'cargado' if self.__dict__['_module'] is not None else 'sin cargar'
+        return f"<LazyModule {self.__dict__['_name']} ({state})>"
+
+
+def lazy_import(name: str) -> LazyModule:
+    """Devuelve un módulo diferido (ver LazyModule)"""
+    return LazyModule(name)
+
+
+def warm_up(modules: Iterable[str] = HEAVY_MODULES, delay: float = 0.0) -> Optional[threading.Thread]:
+    """
+    Importa módulos pesados en un hilo en segundo plano
+
+    Se llama después de mostrar la ventana: cuando el usuario pide la primera
+    visualización o ecuación, los módulos ya están en sys.modules.
+
+    Args:
+        modules: Nombres de módulo a importar, en orden
+        delay: Segundos de espera antes de empezar (deja terminar el primer dibujado)
+    """
+    modules = list(modules)
+
+    def worker():
+        if delay:
+            time.sleep(delay)
+        start = time.perf_counter()
+        for name in modules:
+            try:
+                with trace_span(f"import {name}"):
+                    importlib.import_module(name)
+            except Exception as e:
+                logger.warning(f"No se pudo precargar {name}: {e}")
+        logger.info(f"Módulos precargados en {time.perf_counter() - start:.2f}s")
+
+    try:
+        thread = threading.Thread(target=worker, name="warm-up-imports", daemon=True)
+        thread.start()
+        return thread
+    except Exception as e:
+        logger.error(f"Error iniciando precarga de módulos: {e}")
+        return None
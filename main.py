@@ -23,9 +23,15 @@ from tkinter import messagebox
 current_dir = Path(__file__).parent
 sys.path.insert(0, str(current_dir))
 
+# Traza de arranque (MATHVTUBER_TRACE_STARTUP=1): el origen de tiempos es este punto
+from startup_trace import get_startup_tracer, trace_span, traced
+get_startup_tracer()
+
 # Importar ConfigManager (asegúrate de que esta línea esté presente)
-from config_manager import ConfigManager # ✅ Asegúrate de que esta importación existe
-from main_window import MainWindow # ✅ Asegúrate de que MainWindow está importada
+with trace_span("import main_window"):
+    from config_manager import ConfigManager # ✅ Asegúrate de que esta importación existe
+    from main_window import MainWindow # ✅ Asegúrate de que MainWindow está importada
+from lazy_imports import is_available
 
 class ApplicationManager:
     """Gestor principal de la aplicación con mejor control de errores"""
@@ -65,6 +71,7 @@ class ApplicationManager:
         logger.info("Sistema de logging inicializado")
         return logger
 
+    @traced()
     def check_dependencies(self) -> bool:
         """Verifica dependencias con mejor feedback"""
         self.logger.info("Verificando dependencias...")
@@ -80,24 +87,12 @@ class ApplicationManager:
         
         missing_packages = []
         
+        # Solo se busca cada paquete (find_spec), sin importarlo: numpy, matplotlib y
+        # sympy se cargan después de mostrar la ventana
         for import_name, package_name in required_packages.items():
-            try:
-                if import_name == 'tkinter':
-                    import tkinter
-                elif import_name == 'PIL':
-                    from PIL import Image, ImageTk
-                elif import_name == 'pyttsx3':
-                    import pyttsx3
-                elif import_name == 'numpy':
-                    import numpy
-                elif import_name == 'matplotlib':
-                    import matplotlib.pyplot as plt
-                elif import_name == 'sympy':
-                    import sympy
-                    
+            if is_available(import_name):
                 self.logger.debug(f"✓ {package_name} disponible")
-                
-            except ImportError:
+            else:
                 missing_packages.append(package_name)
                 self.logger.warning(f"✗ {package_name} no encontrado")
 
@@ -146,6 +141,7 @@ pip install {' '.join(missing_packages)}
             
         return os.path.join(base_path, ruta_relativa)
 
+    @traced()
     def load_configuration(self) -> bool:
         """Carga y valida la configuración"""
         try:
@@ -182,6 +178,7 @@ pip install {' '.join(missing_packages)}
         os._exit(0)  # Cierre definitivo incluso en .exe
     
 
+    @traced()
     def create_application(self) -> Optional[tk.Tk]:
         """Crea la aplicación principal con manejo de errores mejorado"""
         try:
@@ -219,6 +216,9 @@ pip install {' '.join(missing_packages)}
             # Mostrar ventana
             root.deiconify()
             root.protocol("WM_DELETE_WINDOW", lambda: self.force_close(root))
+            
+            # Primer ciclo ocioso de Tk: la ventana ya está dibujada
+            root.after_idle(self.on_window_shown)
 
             
             self.logger.info("✓ Aplicación creada exitosamente")
@@ -229,6 +229,12 @@ pip install {' '.join(missing_packages)}
             self.logger.error(traceback.format_exc())
             return None
 
+    def on_window_shown(self):
+        """Marca en la traza de arranque el momento en que la ventana es visible y la guarda"""
+        tracer = get_startup_tracer()
+        tracer.mark("ventana visible")
+        tracer.write()
+
     def center_window(self, window: tk.Tk):
         """Centra la ventana en la pantalla"""
         window.update_idletasks()
@@ -247,21 +253,22 @@ pip install {' '.join(missing_packages)}
             
             self.logger.info("Iniciando MathVTuber v2.1...")
             
-            # Verificar dependencias
-            if not self.check_dependencies():
-                input("\nPresiona Enter para salir...")
-                return 1
-            
-            # Cargar configuración
-            if not self.load_configuration():
-                self.logger.warning("Problemas en configuración, continuando...")
-            
-            # Crear aplicación
-            root = self.create_application()
-            if not root:
-                print("\n❌ Error: No se pudo crear la interfaz gráfica")
-                input("Presiona Enter para salir...")
-                return 1
+            with trace_span("ApplicationManager.run"):
+                # Verificar dependencias
+                if not self.check_dependencies():
+                    input("\nPresiona Enter para salir...")
+                    return 1
+                
+                # Cargar configuración
+                if not self.load_configuration():
+                    self.logger.warning("Problemas en configuración, continuando...")
+                
+                # Crear aplicación
+                root = self.create_application()
+                if not root:
+                    print("\n❌ Error: No se pudo crear la interfaz gráfica")
+                    input("Presiona Enter para salir...")
+                    return 1
             
             print("\n✅ MathVTuber iniciado correctamente")
             print("📝 Revisa la ventana de la aplicación")
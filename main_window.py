@@ -7,6 +7,13 @@ from tts_manager import TTSManager
 from config_manager import ConfigManager
 from settings_window import SettingsWindow
 from language_manager import get_language_manager, _
+from render_service import shutdown_render_service
+from solver_service import shutdown_solver_service
+from rendered_image import RenderedImage
+from lazy_imports import HEAVY_MODULES, lazy_import, warm_up
+from startup_trace import get_startup_tracer, trace_span, traced
+from metrics import get_metrics, shutdown_metrics
+from model_loader import ModelLoader, LoadCancelled, PHASE_READING, PHASE_INITIALIZING
 import base64
 from io import BytesIO
 from PIL import Image, ImageTk
@@ -49,7 +56,7 @@ except ImportError:
                             
                             # Evaluar de forma segura
                             if all(c in '0123456789+-*/(). ' for c in expr_clean):
-                                result = eval(expr_clean)
+                                result = lazy_import('safe_expr').safe_eval(expr_clean)
                                 formula = f"{expr} = {result}"
                                 
                                 response = f"**Resolviendo: {expr}**\n\nResultado: {result}"
@@ -78,6 +85,7 @@ class VTuberModel:
         self.current_image = None
         self.load_images()
         
+    @traced()
     def load_images(self):
         """Carga las imágenes específicas del modelo VTuber en formato PNG"""
         try:
@@ -191,6 +199,11 @@ class VTuberModel:
         return self.get_base_image(size)
 
 class MainWindow(tk.Frame):
+    # Margen de las visualizaciones dentro del canvas y ancho usado antes de conocer su tamaño
+    VIZ_MARGIN = 10
+    VIZ_DEFAULT_WIDTH = 420
+    
+    @traced()
     def __init__(self, master: tk.Tk, config_manager: ConfigManager, *args, **kwargs):
         super().__init__(master, *args, **kwargs) # Usar *args, **kwargs para ser consistente con main.py
         self.master = master
@@ -202,14 +215,20 @@ class MainWindow(tk.Frame):
         # Inicializar gestor de idiomas
         self.language_manager = get_language_manager(self.config_manager)
         
+        # Registro de métricas por petición (se exporta al cerrar)
+        get_metrics(self.config_manager)
+        
         # Configurar ventana principal
         self.setup_window()
         
         # Inicializar variables
         self.math_vtuber = None
         self.model_loaded = False
+        self.model_loader = None  # Carga en curso (model_loader.ModelLoader)
+        self._generation_lock = threading.Lock()  # El modelo no admite generaciones concurrentes
         self.current_image = None
         self._last_pil_image = None  # Para guardar imágenes
+        self._last_rendered = None  # RenderedImage mostrada (para exportar a más resolución)
         self._current_visualization = None  # Para guardar visualización actual
         
         # Inicializar TTS Manager
@@ -230,6 +249,10 @@ class MainWindow(tk.Frame):
         # Inicializar MathVTuber en un hilo separado
         self.initialize_math_vtuber()
         
+        # Precargar sympy, numpy y matplotlib cuando la ventana ya esté dibujada
+        if self.config_manager.get("performance.warm_imports", True):
+            self.root.after_idle(warm_up, HEAVY_MODULES)
+        
         # Iniciar cambio automático de imágenes VTuber si está disponible
         if self.vtuber_model:
             self.start_vtuber_animation()
@@ -266,6 +289,7 @@ class MainWindow(tk.Frame):
         style.configure('TButton', background=colors.get("accent", "#8b0000"),
                        foreground=colors.get("button_text", "#ffe6e6"))
     
+    @traced()
     def setup_ui(self):
         """Configura la interfaz de usuario con layout fijo"""
         colors = self.config_manager.get_ui_colors()
@@ -358,7 +382,8 @@ class MainWindow(tk.Frame):
         left_frame.grid(row=0, column=0, sticky="nsew", padx=(0, 5))
         
         # Chat frame
-        self.chat_frame = ChatFrame(left_frame, self.process_message, self.config_manager)
+        self.chat_frame = ChatFrame(left_frame, self.process_message, self.config_manager,
+                                    stream_callback=self.process_message_stream)
         self.chat_frame.pack(fill=tk.BOTH, expand=True)
         
         # Frame derecho para VTuber y visualización con tamaño fijo
@@ -409,6 +434,9 @@ class MainWindow(tk.Frame):
         self.viz_canvas.pack(side="left", fill="both", expand=True, padx=5, pady=5)
         viz_scrollbar.pack(side="right", fill="y")
         
+        # Las visualizaciones se renderizan al ancho real del canvas
+        self.viz_canvas.bind("<Configure>", lambda event: self._update_render_target())
+        
         # Label inicial para visualización
         self.viz_label = tk.Label(
             self.viz_canvas,
@@ -430,6 +458,18 @@ class MainWindow(tk.Frame):
         # Estado inicial del botón TTS
         self.update_tts_button()
     
+    def _viz_target_width(self) -> int:
+        """Ancho en píxeles disponible para una visualización dentro del canvas"""
+        width = self.viz_canvas.winfo_width() - 2 * self.VIZ_MARGIN
+        # Antes de mostrarse la ventana winfo_width() vale 1
+        return width if width > 100 else self.VIZ_DEFAULT_WIDTH
+    
+    def _update_render_target(self):
+        """Comunica al visualizador el tamaño actual del canvas de visualización"""
+        visualizer = getattr(self.math_vtuber, 'visualizer', None)
+        if visualizer is not None:
+            visualizer.set_render_target(self._viz_target_width())
+    
     def _configure_viz_scroll(self, event):
         """Configura la región de scroll para la visualización"""
         self.viz_canvas.configure(scrollregion=self.viz_canvas.bbox("all"))
@@ -541,6 +581,12 @@ Características especiales:
         """Inicializa MathVTuber en un hilo separado"""
         def init_worker():
             try:
+                # Con un servidor de inferencia configurado se usa su modelo en lugar de cargar otro
+                server_url = self.config_manager.get("server.url", "")
+                if server_url:
+                    self._connect_to_server(server_url)
+                    return
+                
                 # Obtener ruta del modelo desde configuración
                 model_path = self.config_manager.get_mistral_model_path()
                 
@@ -554,6 +600,9 @@ Características especiales:
                 # Inicializar MathVTuber con mejor manejo de progreso
                 self._initialize_math_vtuber_thread(model_path)
                 
+                # La traza de arranque se completa con la carga del modelo
+                get_startup_tracer().write()
+                
             except Exception as e:
                 logger.error(f"Error al inicializar MathVTuber: {e}")
                 self.root.after(0, lambda: self.show_model_error(str(e)))
@@ -561,6 +610,28 @@ Características especiales:
         # Iniciar en hilo separado
         threading.Thread(target=init_worker, daemon=True).start()
     
+    def _connect_to_server(self, server_url):
+        """Usa el modelo ya cargado en inference_server.py (se llama desde un hilo secundario)"""
+        from inference_client import RemoteMathVTuber
+        
+        remote = RemoteMathVTuber(server_url, timeout=self.config_manager.get("server.request_timeout", 300))
+        try:
+            health = remote.health()
+        except Exception as e:
+            logger.error(f"No se pudo conectar con el servidor de inferencia {server_url}: {e}")
+            self.root.after(0, lambda: self.show_model_error(
+                _("errors.server_unreachable", "No se pudo conectar con el servidor de inferencia")))
+            return
+        
+        self.math_vtuber = remote
+        self.model_loaded = True
+        logger.info(f"Conectado al servidor de inferencia {server_url} (modelo {health.get('model_type')})")
+        
+        connected_msg = _("messages.server_connected", "Conectado al servidor de inferencia") + f": {server_url}"
+        self.root.after(0, lambda: self.chat_frame.add_message(_("chat.system", "Sistema"), connected_msg))
+        self.root.after(0, self.on_model_loaded)
+    
+    @traced()
     def _initialize_math_vtuber_thread(self, mistral_path):
         """Inicializa MathVTuber en un hilo separado con mejor manejo de progreso"""
         try:
@@ -585,66 +656,70 @@ Características especiales:
             
             # Crear timeout personalizado basado en el tamaño del archivo
             timeout_seconds = max(120, int(file_size / 10))  # Mínimo 2 minutos, +1 min por cada 600MB
+            if self.config_manager.get("ai.auto_tune", False):
+                # La primera carga de un modelo incluye su calibración (inference_tuner)
+                timeout_seconds += self.config_manager.get("ai.auto_tune_budget", 120)
             logger.info(f"⏰ Timeout configurado: {timeout_seconds} segundos")
             
-            # Función para cargar el modelo
-            def load_model():
-                try:
-                    # Inicializar MathVTuber
-                    self.math_vtuber = MathVTuber(mistral_path, self.config_manager)
-                    return True
-                except Exception as e:
-                    logger.error(f"Error en carga del modelo: {e}")
-                    return str(e)
+            # Una carga anterior que siga en curso queda sustituida por esta (y libera su memoria)
+            if self.model_loader is not None:
+                self.model_loader.cancel()
             
-            # Ejecutar carga con timeout
-            import concurrent.futures
+            reported_steps = set()
             
-            with concurrent.futures.ThreadPoolExecutor() as executor:
-                # Enviar tarea de carga
-                future = executor.submit(load_model)
-                
-                # Mostrar progreso cada 10 segundos
-                progress_count = 0
-                while not future.done():
-                    import time
-                    time.sleep(10)
-                    progress_count += 10
-                    
-                    if progress_count <= timeout_seconds:
-                        progress_msg = _("messages.loading_progress", "Cargando modelo...") + f" ({progress_count}s " + _("messages.elapsed", "transcurridos") + ")"
-                        self.root.after(0, lambda msg=progress_msg: self.chat_frame.add_message(_("chat.system", "Sistema"), msg))
-                    else:
-                        # Timeout alcanzado
-                        future.cancel()
-                        error_msg = _("messages.timeout_error", "Timeout: La carga del modelo excedió") + f" {timeout_seconds} " + _("messages.seconds", "segundos")
-                        logger.error(error_msg)
-                        self.root.after(0, lambda: self.show_model_error(_("messages.timeout_loading", "Timeout en carga del modelo")))
+            def on_progress(progress):
+                # Un mensaje por cada 25% leído y otro al empezar la inicialización
+                if progress.phase == PHASE_READING:
+                    step = int(progress.percent // 25) * 25
+                    if step == 0 or step in reported_steps:
                         return
-                
-                # Obtener resultado
-                try:
-                    result = future.result(timeout=5)  # Timeout corto para obtener resultado
-                    
-                    if result is True:
-                        # Éxito
-                        self.model_loaded = True
-                        logger.info("MathVTuber inicializado correctamente")
-                        
-                        success_msg = "¡" + _("messages.model_loaded", "Modelo Mistral cargado exitosamente") + "!\n" + _("messages.system_ready", "Sistema listo para responder preguntas matemáticas con visualizaciones automáticas.")
-                        self.root.after(0, lambda: self.chat_frame.add_message(_("chat.system", "Sistema"), success_msg))
-                        self.root.after(0, self.on_model_loaded)
-                        
-                    else:
-                        # Error en la carga
-                        error_msg = _("errors.model_loading", "Error al cargar modelo") + f": {result}"
-                        logger.error(error_msg)
-                        self.root.after(0, lambda: self.show_model_error(str(result)))
-                        
-                except concurrent.futures.TimeoutError:
-                    error_msg = _("messages.timeout_result", "Timeout obteniendo resultado de carga")
-                    logger.error(error_msg)
-                    self.root.after(0, lambda: self.show_model_error(_("messages.timeout_loading", "Timeout en carga")))
+                    reported_steps.add(step)
+                    msg = (_("messages.loading_progress", "Cargando modelo...") +
+                           f" {step}% ({progress.loaded_bytes / (1024 * 1024):.0f} MB, {progress.elapsed:.0f}s " +
+                           _("messages.elapsed", "transcurridos") + ")")
+                elif progress.phase == PHASE_INITIALIZING:
+                    msg = (_("messages.model_initializing", "Inicializando modelo...") +
+                           f" ({progress.elapsed:.0f}s " + _("messages.elapsed", "transcurridos") + ")")
+                else:
+                    return
+                self.root.after(0, lambda: self.chat_frame.add_message(_("chat.system", "Sistema"), msg))
+            
+            def create_math_vtuber():
+                with trace_span("MathVTuber.__init__"):
+                    return MathVTuber(mistral_path, self.config_manager)
+            
+            # Lectura por bloques con progreso real; cancelar detiene la carga y libera el modelo
+            loader = ModelLoader(mistral_path, create_math_vtuber, on_progress=on_progress,
+                                 page_in=self.config_manager.get("performance.model_page_in", True))
+            self.model_loader = loader.start()
+            
+            try:
+                math_vtuber = loader.wait(timeout_seconds)
+            except TimeoutError:
+                loader.cancel()
+                error_msg = _("messages.timeout_error", "Timeout: La carga del modelo excedió") + f" {timeout_seconds} " + _("messages.seconds", "segundos")
+                logger.error(error_msg)
+                self.root.after(0, lambda: self.show_model_error(_("messages.timeout_loading", "Timeout en carga del modelo")))
+                return
+            except LoadCancelled:
+                logger.info("Carga del modelo cancelada")
+                return
+            except Exception as e:
+                error_text = str(e)
+                logger.error(_("errors.model_loading", "Error al cargar modelo") + f": {error_text}")
+                self.root.after(0, lambda: self.show_model_error(error_text))
+                return
+            finally:
+                if self.model_loader is loader:
+                    self.model_loader = None
+            
+            self.math_vtuber = math_vtuber
+            self.model_loaded = True
+            logger.info("MathVTuber inicializado correctamente")
+            
+            success_msg = "¡" + _("messages.model_loaded", "Modelo Mistral cargado exitosamente") + "!\n" + _("messages.system_ready", "Sistema listo para responder preguntas matemáticas con visualizaciones automáticas.")
+            self.root.after(0, lambda: self.chat_frame.add_message(_("chat.system", "Sistema"), success_msg))
+            self.root.after(0, self.on_model_loaded)
             
         except Exception as e:
             error_msg = f"Error crítico en inicialización: {str(e)}"
@@ -653,6 +728,7 @@ Características especiales:
     
     def on_model_loaded(self):
         """Callback cuando el modelo se ha cargado"""
+        self._update_render_target()
         self.chat_frame.add_message(_("chat.system", "Sistema"), 
                                    _("messages.model_ready", "Modelo Mistral cargado correctamente. ¡Listo para ayudarte con visualizaciones automáticas!"))
     
@@ -672,22 +748,10 @@ Características especiales:
                 self.show_thinking_vtuber()
             
             # Generar respuesta con visualización
-            response, formula, visualization_data = self.math_vtuber.generate_response(message)
-            
-            # Mostrar imagen VTuber feliz
-            if self.vtuber_model:
-                self.show_happy_vtuber()
+            with self._generation_lock:
+                response, formula, visualization_data = self.math_vtuber.generate_response(message)
             
-            # Mostrar visualización automática
-            if visualization_data:
-                self.show_math_visualization(visualization_data)
-            elif formula:
-                # Si no hay visualización pero hay fórmula, mostrar fórmula simple
-                self.show_formula_visualization(formula)
-            
-            # Reproducir respuesta con TTS
-            if self.tts_manager.is_enabled():
-                self.tts_manager.speak(response)
+            self._present_response(response, formula, visualization_data)
             
             return response
             
@@ -701,6 +765,54 @@ Características especiales:
             
             return error_response
     
+    def process_message_stream(self, message, on_token, cancel_event=None):
+        """
+        Procesa un mensaje del usuario enviando los tokens al chat a medida que se generan.
+        La visualización y el TTS se lanzan solo cuando el stream ha terminado.
+        """
+        try:
+            if not self.model_loaded or not self.math_vtuber:
+                return _("messages.model_not_loaded", "El modelo aún no está cargado. Por favor, espera un momento.")
+            
+            # Cambiar imagen VTuber a "pensando"
+            if self.vtuber_model:
+                self.root.after(0, self.show_thinking_vtuber)
+            
+            with self._generation_lock:
+                if hasattr(self.math_vtuber, 'generate_response_stream'):
+                    response, formula, visualization_data = self.math_vtuber.generate_response_stream(
+                        message, on_token, cancel_event)
+                else:
+                    response, formula, visualization_data = self.math_vtuber.generate_response(message)
+            
+            if cancel_event is not None and cancel_event.is_set():
+                return response
+            
+            self.root.after(0, lambda: self._present_response(response, formula, visualization_data))
+            
+            return response
+            
+        except Exception as e:
+            logger.error(f"Error procesando mensaje: {e}")
+            return _("errors.processing", "Error al procesar tu consulta") + f": {str(e)}"
+    
+    def _present_response(self, response, formula, visualization_data):
+        """Muestra la visualización y reproduce la respuesta una vez generada"""
+        # Mostrar imagen VTuber feliz
+        if self.vtuber_model:
+            self.show_happy_vtuber()
+        
+        # Mostrar visualización automática
+        if visualization_data:
+            self.show_math_visualization(visualization_data)
+        elif formula:
+            # Si no hay visualización pero hay fórmula, mostrar fórmula simple
+            self.show_formula_visualization(formula)
+        
+        # Reproducir respuesta con TTS
+        if self.tts_manager.is_enabled():
+            self.tts_manager.speak(response)
+    
     def show_thinking_vtuber(self):
         """Muestra la imagen VTuber en estado 'pensando'"""
         if not self.vtuber_model:
@@ -761,27 +873,27 @@ Características especiales:
         self.root.after(5000, animate)  # Primer cambio después de 5 segundos
     
     def show_math_visualization(self, visualization_data):
-        """Muestra visualización matemática generada automáticamente"""
+        """
+        Muestra visualización matemática generada automáticamente
+        
+        Args:
+            visualization_data: RenderedImage del visualizador, o PNG en base64 (caché)
+        """
         try:
-            if not visualization_data:
+            rendered = RenderedImage.coerce(visualization_data)
+            if not rendered:
                 return
             
-            # Decodificar imagen base64
-            image_bytes = base64.b64decode(visualization_data)
-            image = Image.open(BytesIO(image_bytes))
+            image = rendered.to_pil()
             
-            # Redimensionar para el área de visualización (más grande)
-            # Mantener proporción pero hacer más grande
-            max_width = 420
-            max_height = 600
-            
-            # Calcular nuevo tamaño manteniendo proporción
+            # El visualizador ya dibuja al ancho del canvas; solo se reducen imágenes
+            # que llegan más grandes (caché antigua o ventana encogida desde el render)
+            max_width = self._viz_target_width()
             img_width, img_height = image.size
-            ratio = min(max_width/img_width, max_height/img_height)
-            new_width = int(img_width * ratio)
-            new_height = int(img_height * ratio)
-            
-            image = image.resize((new_width, new_height), Image.Resampling.LANCZOS)
+            if img_width > max_width:
+                ratio = max_width / img_width
+                image = image.resize((max_width, int(img_height * ratio)), Image.Resampling.LANCZOS)
+            new_width, new_height = image.size
             
             # Convertir a PhotoImage
             photo = ImageTk.PhotoImage(image)
@@ -790,15 +902,17 @@ Características especiales:
             self.viz_canvas.delete("all")
             
             # Crear imagen en canvas
-            self.viz_canvas.create_image(10, 10, anchor="nw", image=photo)
+            self.viz_canvas.create_image(self.VIZ_MARGIN, self.VIZ_MARGIN, anchor="nw", image=photo)
             
             # Mantener referencia
             self.viz_canvas.image = photo
             self._current_visualization = photo
             self._last_pil_image = image
+            self._last_rendered = rendered
             
             # Actualizar scroll region
-            self.viz_canvas.configure(scrollregion=(0, 0, new_width + 20, new_height + 20))
+            self.viz_canvas.configure(scrollregion=(0, 0, new_width + 2 * self.VIZ_MARGIN,
+                                                    new_height + 2 * self.VIZ_MARGIN))
             
             logger.info("Visualización matemática mostrada correctamente")
             
@@ -919,7 +1033,7 @@ Características especiales:
             
             # Determinar qué imagen guardar
             if hasattr(self, '_last_pil_image') and self._last_pil_image:
-                image_to_save = self._last_pil_image
+                image_to_save = self._export_visualization() or self._last_pil_image
                 default_name = _("files.math_visualization", "visualizacion_matematica")
             elif self.vtuber_model and self.current_image:
                 # Convertir PhotoImage a PIL
@@ -955,6 +1069,16 @@ Características especiales:
             messagebox.showerror(_("errors.general", "Error"), 
                                _("errors.file_error", "Error al guardar imagen") + f": {str(e)}")
     
+    def _export_visualization(self):
+        """Vuelve a renderizar la visualización actual a la resolución de exportación"""
+        visualizer = getattr(self.math_vtuber, 'visualizer', None)
+        if visualizer is None or self._last_rendered is None:
+            return None
+        
+        export_dpi = self.config_manager.get("visualization.export_dpi", 200)
+        rendered = visualizer.rerender(self._last_rendered, export_dpi)
+        return rendered.to_pil() if rendered else None
+    
     def open_settings(self):
         """Abre la ventana de configuración"""
         try:
@@ -1005,10 +1129,21 @@ Características especiales:
         try:
             logger.info("Cerrando aplicación...")
             
+            # Detener una carga del modelo en curso
+            if self.model_loader is not None:
+                self.model_loader.cancel()
+            
             # Cerrar TTS Manager
             if hasattr(self, 'tts_manager'):
                 self.tts_manager.shutdown()
             
+            # Cerrar procesos de renderizado
+            shutdown_render_service()
+            shutdown_solver_service()
+            
+            # Exportar métricas de latencia de la sesión
+            shutdown_metrics(self.config_manager)
+            
             # Cerrar ventana
             self.root.quit()
             self.root.destroy()
@@ -4,6 +4,9 @@ import io
 import base64
 from matplotlib.patches import Rectangle, Circle, Arc
 import re
+from plot_helpers import MAX_ELEMENT_LABELS, add_circles, label_step
+from safe_expr import compile_expression
+from adaptive_sampling import sample_function
 
 def create_addition_visualization(num1=5, num2=3):
     """Crea una visualización para explicar la suma"""
@@ -20,19 +23,21 @@ def create_addition_visualization(num1=5, num2=3):
         ax.axis('off')
         
         # Dibujar primer número con círculos azules
-        for i in range(num1):
-            circle = Circle((i, 0), 0.4, color='#4a86e8', alpha=0.7)
-            ax.add_patch(circle)
-            plt.text(i, 0, str(i+1), ha='center', va='center', color='white')
+        first_x = np.arange(num1)
+        add_circles(ax, np.column_stack([first_x, np.zeros(num1)]), 0.4, '#4a86e8')
+        if num1 <= MAX_ELEMENT_LABELS:
+            for i in first_x:
+                ax.text(i, 0, str(i+1), ha='center', va='center', color='white')
         
         # Dibujar signo +
         plt.text(num1, 0, '+', ha='center', va='center', color='white', fontsize=24)
         
         # Dibujar segundo número con círculos rojos
-        for i in range(num2):
-            circle = Circle((num1 + 1 + i, 0), 0.4, color='#ff6b6b', alpha=0.7)
-            ax.add_patch(circle)
-            plt.text(num1 + 1 + i, 0, str(i+1), ha='center', va='center', color='white')
+        second_x = num1 + 1 + np.arange(num2)
+        add_circles(ax, np.column_stack([second_x, np.zeros(num2)]), 0.4, '#ff6b6b')
+        if num2 <= MAX_ELEMENT_LABELS:
+            for i, x in enumerate(second_x):
+                ax.text(x, 0, str(i+1), ha='center', va='center', color='white')
         
         # Dibujar signo =
         plt.text(num1 + num2 + 1, 0, '=', ha='center', va='center', color='white', fontsize=24)
@@ -74,15 +79,13 @@ def create_subtraction_visualization(num1=8, num2=3):
         ax.set_aspect('equal')
         ax.axis('off')
         
-        # Dibujar primer número con círculos azules
-        for i in range(num1):
-            if i < num1 - num2:
-                circle = Circle((i, 0), 0.4, color='#4a86e8', alpha=0.7)
-            else:
-                # Los que se van a restar en un color diferente
-                circle = Circle((i, 0), 0.4, color='#ff6b6b', alpha=0.7)
-            ax.add_patch(circle)
-            plt.text(i, 0, str(i+1), ha='center', va='center', color='white')
+        # Dibujar primer número con círculos azules (los que se van a restar en otro color)
+        xs = np.arange(num1)
+        colors = np.where(xs < num1 - num2, '#4a86e8', '#ff6b6b')
+        add_circles(ax, np.column_stack([xs, np.zeros(num1)]), 0.4, colors)
+        if num1 <= MAX_ELEMENT_LABELS:
+            for i in xs:
+                ax.text(i, 0, str(i+1), ha='center', va='center', color='white')
         
         # Dibujar signo -
         plt.text(num1, 0, '-', ha='center', va='center', color='white', fontsize=24)
@@ -131,18 +134,16 @@ def create_multiplication_visualization(num1=4, num2=3):
         ax.set_aspect('equal')
         ax.axis('off')
         
-        # Dibujar matriz de círculos
-        for j in range(num2):
-            for i in range(num1):
-                circle = Circle((i, j), 0.4, color='#4a86e8', alpha=0.7)
-                ax.add_patch(circle)
+        # Dibujar matriz de círculos (num1 × num2 elementos en una sola colección)
+        grid_x, grid_y = np.meshgrid(np.arange(num1), np.arange(num2))
+        add_circles(ax, np.column_stack([grid_x.ravel(), grid_y.ravel()]), 0.4, '#4a86e8')
         
-        # Añadir etiquetas
-        for i in range(num1):
-            plt.text(i, -0.8, str(i+1), ha='center', va='center', color='white')
+        # Añadir etiquetas (espaciadas si hay muchas columnas o filas)
+        for i in range(0, num1, label_step(num1)):
+            ax.text(i, -0.8, str(i+1), ha='center', va='center', color='white')
         
-        for j in range(num2):
-            plt.text(-0.8, j, str(j+1), ha='center', va='center', color='white')
+        for j in range(0, num2, label_step(num2)):
+            ax.text(-0.8, j, str(j+1), ha='center', va='center', color='white')
         
         # Añadir explicación
         result = num1 * num2
@@ -185,18 +186,16 @@ def create_division_visualization(num1=12, num2=3):
         ax.set_aspect('equal')
         ax.axis('off')
         
-        # Dibujar todos los elementos
-        for i in range(num1):
-            group_idx = i // result
-            color = plt.cm.tab10(group_idx % 10)
-            circle = Circle((i, 0), 0.4, color=color, alpha=0.7)
-            ax.add_patch(circle)
-            plt.text(i, 0, str(i+1), ha='center', va='center', color='white', fontsize=8)
+        # Dibujar todos los elementos, coloreados por grupo
+        xs = np.arange(num1)
+        colors = plt.cm.tab10((xs // result) % 10)
+        add_circles(ax, np.column_stack([xs, np.zeros(num1)]), 0.4, colors)
+        if num1 <= MAX_ELEMENT_LABELS:
+            for i in xs:
+                ax.text(i, 0, str(i+1), ha='center', va='center', color='white', fontsize=8)
         
         # Dibujar líneas de separación entre grupos
-        for i in range(1, num2):
-            x_pos = i * result - 0.5
-            plt.axvline(x=x_pos, color='white', linestyle='--', alpha=0.5)
+        ax.vlines(np.arange(1, num2) * result - 0.5, -3, 3, colors='white', linestyles='--', alpha=0.5)
         
         # Añadir explicación
         plt.text(num1/2, 2, f"División: {num1} ÷ {num2} = {result}", ha='center', va='center', color='white', fontsize=16)
@@ -204,7 +203,7 @@ def create_division_visualization(num1=12, num2=3):
         plt.text(num1/2, -2, f"Cada grupo tiene {result} elementos", ha='center', va='center', color='#00a896')
         
         # Etiquetar grupos
-        for i in range(num2):
+        for i in range(0, num2, label_step(num2)):
             x_pos = i * result + result/2 - 0.5
             plt.text(x_pos, 1.2, f"Grupo {i+1}", ha='center', va='center', color=plt.cm.tab10(i % 10))
         
@@ -222,25 +221,19 @@ def create_division_visualization(num1=12, num2=3):
         print(f"Error al crear visualización de división: {str(e)}")
         return ""
 
-def create_function_plot(formula, x_range=(-10, 10), num_points=500):
+def create_function_plot(formula, x_range=(-10, 10)):
     """Crea una gráfica de una función matemática"""
     try:
-        # Crear puntos x
-        x = np.linspace(x_range[0], x_range[1], num_points)
-        
-        # Evaluar la función
-        # Reemplazar funciones matemáticas comunes
-        expr = formula.replace('^', '**')
-        for func in ['sin', 'cos', 'tan', 'exp', 'log']:
-            expr = expr.replace(func, f'np.{func}')
-        
-        # Evaluar y
-        y = eval(expr.replace('x', '(x)'))
+        # Evaluar la función (sin, cos, exp... se resuelven a ufuncs de numpy) con muestreo adaptativo
+        compiled = compile_expression(formula, variables=('x',))
+        curve = sample_function(compiled.evaluate_on, x_range[0], x_range[1])
+        x, y = curve.x, curve.y
         
         # Crear figura
         plt.figure(figsize=(10, 6))
         plt.style.use('dark_background')
         plt.plot(x, y, color='#00a896', linewidth=2)
+        plt.ylim(*curve.y_limits)
         plt.grid(True, alpha=0.3)
         plt.axhline(y=0, color='white', linestyle='--', alpha=0.3)
         plt.axvline(x=0, color='white', linestyle='--', alpha=0.3)
@@ -1,16 +1,17 @@
-import matplotlib.pyplot as plt
+import matplotlib
+import matplotlib.style
 import matplotlib.patches as patches
 import numpy as np
-import sympy as sp
-from sympy import symbols, solve, diff, integrate, expand, factor, simplify
-from sympy.plotting import plot
-import io
-import base64
-from PIL import Image, ImageDraw, ImageFont
 import re
 import logging
+import threading
 from typing import Tuple, Optional, List
-from language_manager import get_language_manager, _
+from language_manager import get_language_manager
+from figure_pool import FigurePool
+from plot_helpers import add_circles, add_crosses
+from render_service import get_render_service
+from rendered_image import RenderedImage, RenderTarget
+from metrics import get_metrics, STAGE_TOPIC_DETECTION, STAGE_VISUALIZATION_RENDER
 
 logger = logging.getLogger(__name__)
 
@@ -22,10 +23,17 @@ class MathVisualizer:
         self.language_manager = get_language_manager(config_manager)
         
         # Configuración de matplotlib
-        plt.style.use('dark_background')
+        matplotlib.style.use('dark_background')
         self.fig_size = config_manager.get("visualization.figure_size", [10, 8])
         self.dpi = 100
         
+        # Superficie de destino (set_render_target) y DPI del render en curso
+        self.render_target: Optional[RenderTarget] = None
+        self.render_dpi = self.dpi
+        # Idioma de los textos del render en curso (el de la especificación)
+        self.render_language = None
+        self.render_lock = threading.Lock()
+        
         # Colores del tema
         colors = config_manager.get_ui_colors()
         self.colors = {
@@ -37,40 +45,154 @@ class MathVisualizer:
             'grid': '#666666',
             'highlight': '#ffd93d'
         }
+        
+        # Figuras 2x2 reutilizables (sin pyplot ni su estado global)
+        self.figure_pool = FigurePool(2, 2, figsize=self.fig_size, dpi=self.dpi,
+                                      facecolor=self.colors['background'])
+        
+        # Arrancar los procesos de renderizado ahora para que el primer dibujo no espere
+        service = get_render_service(config_manager)
+        if service is not None:
+            service.start()
     
     def generate_visualization(self, user_input: str, response: str, formula: str = "") -> Optional[str]:
         """
         Genera visualización automática basada en el tipo de problema
         
         Returns:
-            str: Imagen en base64 o None si no se puede generar
+            str: Imagen PNG en base64 o None si no se puede generar
+        """
+        image = self.render_image(user_input, response, formula)
+        return image.to_base64() if image else None
+    
+    def render_image(self, user_input: str, response: str, formula: str = "") -> Optional[RenderedImage]:
+        """
+        Genera la visualización sin codificarla (para mostrarla directamente en pantalla)
+        
+        Si el servicio de renderizado está activo, la figura se dibuja en un proceso
+        aparte; si no está disponible o falla, se dibuja aquí mismo.
+        
+        Returns:
+            RenderedImage: Imagen renderizada o None si no se puede generar
         """
         try:
-            # Detectar tipo de problema
-            problem_type = self._detect_problem_type(user_input)
+            metrics = get_metrics()
+            with metrics.stage(STAGE_TOPIC_DETECTION):
+                spec = self.build_render_spec(user_input, response, formula)
             
-            logger.info(f"Generando visualización para: {problem_type}")
+            logger.info(f"Generando visualización para: {spec['problem_type']}")
             
-            # Generar visualización según el tipo
-            if problem_type == "arithmetic":
-                return self._visualize_arithmetic(user_input, response)
-            elif problem_type == "algebra":
-                return self._visualize_algebra(user_input, response, formula)
-            elif problem_type == "geometry":
-                return self._visualize_geometry(user_input, response)
-            elif problem_type == "calculus":
-                return self._visualize_calculus(user_input, response)
-            elif problem_type == "statistics":
-                return self._visualize_statistics(user_input, response)
-            elif problem_type == "function":
-                return self._visualize_function(user_input, response)
-            else:
-                return self._visualize_general_concept(user_input, response)
+            with metrics.stage(STAGE_VISUALIZATION_RENDER):
+                return self._render(spec)
                 
         except Exception as e:
             logger.error(f"Error generando visualización: {e}")
             return None
     
+    def rerender(self, image: RenderedImage, dpi: float) -> Optional[RenderedImage]:
+        """Vuelve a dibujar una visualización a otro DPI (por ejemplo, para exportarla)"""
+        if image is None or not image.spec:
+            return None
+        try:
+            return self._render(dict(image.spec, dpi=dpi))
+        except Exception as e:
+            logger.error(f"Error volviendo a renderizar visualización: {e}")
+            return None
+    
+    def set_render_target(self, width: int, height: Optional[int] = None):
+        """
+        Indica el tamaño en píxeles donde se mostrarán las visualizaciones
+        
+        Args:
+            width: Ancho disponible en píxeles
+            height: Alto máximo en píxeles (None si la superficie tiene scroll vertical)
+        """
+        if width and width > 0:
+            self.render_target = RenderTarget(width, height)
+    
+    def _render(self, spec: dict) -> Optional[RenderedImage]:
+        """Dibuja la especificación en el servicio de renderizado o, si no está disponible, aquí"""
+        service = get_render_service(self.config_manager)
+        if service is not None:
+            handled, image = service.render(spec)
+            if handled:
+                return image
+        
+        return self.render_spec(spec)
+    
+    def build_render_spec(self, user_input: str, response: str, formula: str = "") -> dict:
+        """Describe la visualización con datos simples que pueden enviarse a otro proceso"""
+        return {
+            'problem_type': self._detect_problem_type(user_input),
+            'user_input': user_input,
+            'response': response,
+            'formula': formula or "",
+            'colors': dict(self.colors),
+            'fig_size': list(self.fig_size),
+            'dpi': self.render_target.dpi_for(self.fig_size) if self.render_target else self.dpi,
+            'language': self.language_manager.get_current_language()
+        }
+    
+    def render_spec(self, spec: dict) -> Optional[RenderedImage]:
+        """
+        Dibuja una especificación creada por build_render_spec
+        
+        Returns:
+            RenderedImage: Imagen renderizada o None si no hay nada que dibujar
+        """
+        try:
+            with self.render_lock:
+                self._apply_spec_style(spec)
+                
+                problem_type = spec['problem_type']
+                user_input = spec['user_input']
+                response = spec['response']
+                
+                # Generar visualización según el tipo
+                if problem_type == "arithmetic":
+                    image = self._visualize_arithmetic(user_input, response)
+                elif problem_type == "algebra":
+                    image = self._visualize_algebra(user_input, response, spec.get('formula', ""))
+                elif problem_type == "geometry":
+                    image = self._visualize_geometry(user_input, response)
+                elif problem_type == "calculus":
+                    image = self._visualize_calculus(user_input, response)
+                elif problem_type == "statistics":
+                    image = self._visualize_statistics(user_input, response)
+                elif problem_type == "function":
+                    image = self._visualize_function(user_input, response)
+                else:
+                    image = self._visualize_general_concept(user_input, response)
+                
+                if image is not None:
+                    image.spec = spec
+                return image
+                    
+        except Exception as e:
+            logger.error(f"Error renderizando visualización: {e}")
+            return None
+    
+    def _apply_spec_style(self, spec: dict):
+        """Aplica idioma, colores y tamaño de la especificación (necesario en los procesos de renderizado)"""
+        # Solo para los textos de este render: language_manager es el de toda la interfaz
+        self.render_language = spec.get('language')
+        
+        self.colors.update(spec.get('colors', {}))
+        
+        # El DPI cambia por render (lo aplica el pool al prestar la figura); el tamaño
+        # en pulgadas y el fondo requieren figuras nuevas
+        self.render_dpi = spec.get('dpi', self.dpi)
+        
+        fig_size = list(spec.get('fig_size', self.fig_size))
+        if fig_size != list(self.fig_size) or self.figure_pool.facecolor != self.colors['background']:
+            self.fig_size = fig_size
+            self.figure_pool = FigurePool(2, 2, figsize=self.fig_size, dpi=self.dpi,
+                                          facecolor=self.colors['background'])
+    
+    def _t(self, key: str, default: str = None) -> str:
+        """Traduce un texto de la visualización en el idioma del render en curso"""
+        return self.language_manager.get_text(key, default, self.render_language)
+    
     def _detect_problem_type(self, user_input: str) -> str:
         """Detecta el tipo de problema matemático"""
         user_lower = user_input.lower()
@@ -105,7 +227,7 @@ class MathVisualizer:
         
         return "general"
     
-    def _visualize_arithmetic(self, user_input: str, response: str) -> Optional[str]:
+    def _visualize_arithmetic(self, user_input: str, response: str) -> Optional[RenderedImage]:
         """Visualiza operaciones aritméticas con representaciones gráficas"""
         try:
             # Extraer números y operación
@@ -114,23 +236,23 @@ class MathVisualizer:
             if not numbers or not operation:
                 return None
             
-            fig, ((ax1, ax2), (ax3, ax4)) = plt.subplots(2, 2, figsize=self.fig_size)
-            fig.patch.set_facecolor(self.colors['background'])
-            
-            # Panel 1: Representación visual con objetos
-            self._draw_visual_objects(ax1, numbers, operation)
-            
-            # Panel 2: Operación paso a paso
-            self._draw_step_by_step(ax2, numbers, operation)
-            
-            # Panel 3: Representación en recta numérica
-            self._draw_number_line(ax3, numbers, operation)
-            
-            # Panel 4: Resultado final
-            self._draw_result_display(ax4, numbers, operation)
-            
-            plt.tight_layout()
-            return self._fig_to_base64(fig)
+            with self.figure_pool.figure(self.render_dpi) as (fig, axes):
+                (ax1, ax2), (ax3, ax4) = axes
+                
+                # Panel 1: Representación visual con objetos
+                self._draw_visual_objects(ax1, numbers, operation)
+                
+                # Panel 2: Operación paso a paso
+                self._draw_step_by_step(ax2, numbers, operation)
+                
+                # Panel 3: Representación en recta numérica
+                self._draw_number_line(ax3, numbers, operation)
+                
+                # Panel 4: Resultado final
+                self._draw_result_display(ax4, numbers, operation)
+                
+                fig.tight_layout()
+                return self._fig_to_image(fig)
             
         except Exception as e:
             logger.error(f"Error en visualización aritmética: {e}")
@@ -141,7 +263,7 @@ class MathVisualizer:
         ax.set_xlim(0, 10)
         ax.set_ylim(0, 6)
         ax.set_facecolor(self.colors['background'])
-        ax.set_title(_("visualization.visual_representation", "Representación Visual"), 
+        ax.set_title(self._t("visualization.visual_representation", "Representación Visual"), 
                     color=self.colors['text'], fontsize=12, fontweight='bold')
         
         if operation == '+':
@@ -150,10 +272,9 @@ class MathVisualizer:
             x_start = 1
             
             # Primer número
-            for i in range(min(int(numbers[0]), 10)):
-                circle = plt.Circle((x_start + i * 0.6, y_pos), 0.25, 
-                                  color=self.colors['primary'], alpha=0.8)
-                ax.add_patch(circle)
+            count = max(0, min(int(numbers[0]), 10))
+            add_circles(ax, np.column_stack([x_start + np.arange(count) * 0.6, np.full(count, y_pos)]),
+                        0.25, self.colors['primary'], alpha=0.8)
             
             # Signo +
             ax.text(x_start + numbers[0] * 0.6 + 0.5, y_pos, '+', 
@@ -161,10 +282,9 @@ class MathVisualizer:
             
             # Segundo número
             x_second = x_start + numbers[0] * 0.6 + 1
-            for i in range(min(int(numbers[1]), 10)):
-                circle = plt.Circle((x_second + i * 0.6, y_pos), 0.25, 
-                                  color=self.colors['secondary'], alpha=0.8)
-                ax.add_patch(circle)
+            count = max(0, min(int(numbers[1]), 10))
+            add_circles(ax, np.column_stack([x_second + np.arange(count) * 0.6, np.full(count, y_pos)]),
+                        0.25, self.colors['secondary'], alpha=0.8)
             
             # Resultado
             result = numbers[0] + numbers[1]
@@ -177,17 +297,13 @@ class MathVisualizer:
             x_start = 1
             
             # Dibujar todos los círculos del primer número
-            for i in range(min(int(numbers[0]), 10)):
-                circle = plt.Circle((x_start + i * 0.6, y_pos), 0.25, 
-                                  color=self.colors['primary'], alpha=0.8)
-                ax.add_patch(circle)
+            count = max(0, min(int(numbers[0]), 10))
+            centers = np.column_stack([x_start + np.arange(count) * 0.6, np.full(count, y_pos)])
+            add_circles(ax, centers, 0.25, self.colors['primary'], alpha=0.8)
             
             # Tachar los que se restan
-            for i in range(min(int(numbers[1]), int(numbers[0]))):
-                ax.plot([x_start + i * 0.6 - 0.2, x_start + i * 0.6 + 0.2], 
-                       [y_pos - 0.2, y_pos + 0.2], 'r-', linewidth=3)
-                ax.plot([x_start + i * 0.6 - 0.2, x_start + i * 0.6 + 0.2], 
-                       [y_pos + 0.2, y_pos - 0.2], 'r-', linewidth=3)
+            crossed = max(0, min(int(numbers[1]), count))
+            add_crosses(ax, centers[:crossed], 0.2, color='r', linewidth=3)
             
             result = numbers[0] - numbers[1]
             ax.text(5, 2, f"= {result}", fontsize=16, color=self.colors['text'], 
@@ -196,11 +312,9 @@ class MathVisualizer:
         elif operation == '*':
             # Multiplicación: matriz de puntos
             if numbers[0] <= 10 and numbers[1] <= 10:
-                for i in range(int(numbers[0])):
-                    for j in range(int(numbers[1])):
-                        circle = plt.Circle((1.5 + i * 0.7, 2 + j * 0.5), 0.15, 
-                                          color=self.colors['accent'], alpha=0.8)
-                        ax.add_patch(circle)
+                grid_x, grid_y = np.meshgrid(np.arange(int(numbers[0])), np.arange(int(numbers[1])))
+                centers = np.column_stack([1.5 + grid_x.ravel() * 0.7, 2 + grid_y.ravel() * 0.5])
+                add_circles(ax, centers, 0.15, self.colors['accent'], alpha=0.8)
                 
                 ax.text(5, 0.5, f"{numbers[0]} × {numbers[1]} = {numbers[0] * numbers[1]}", 
                        fontsize=14, color=self.colors['text'], ha='center', va='center')
@@ -217,34 +331,34 @@ class MathVisualizer:
         ax.set_xlim(0, 10)
         ax.set_ylim(0, 10)
         ax.set_facecolor(self.colors['background'])
-        ax.set_title(_("visualization.step_by_step", "Paso a Paso"), 
+        ax.set_title(self._t("visualization.step_by_step", "Paso a Paso"), 
                     color=self.colors['text'], fontsize=12, fontweight='bold')
         
         steps = []
         if operation == '+':
             steps = [
-                f"1. {_('visualization.we_have', 'Tenemos')}: {numbers[0]} + {numbers[1]}",
-                f"2. {_('visualization.adding', 'Sumamos')}: {numbers[0]} + {numbers[1]}",
-                f"3. {_('visualization.result', 'Resultado')}: {numbers[0] + numbers[1]}"
+                f"1. {self._t('visualization.we_have', 'Tenemos')}: {numbers[0]} + {numbers[1]}",
+                f"2. {self._t('visualization.adding', 'Sumamos')}: {numbers[0]} + {numbers[1]}",
+                f"3. {self._t('visualization.result', 'Resultado')}: {numbers[0] + numbers[1]}"
             ]
         elif operation == '-':
             steps = [
-                f"1. {_('visualization.we_have', 'Tenemos')}: {numbers[0]} - {numbers[1]}",
-                f"2. {_('visualization.subtracting', 'Restamos')}: {numbers[0]} - {numbers[1]}",
-                f"3. {_('visualization.result', 'Resultado')}: {numbers[0] - numbers[1]}"
+                f"1. {self._t('visualization.we_have', 'Tenemos')}: {numbers[0]} - {numbers[1]}",
+                f"2. {self._t('visualization.subtracting', 'Restamos')}: {numbers[0]} - {numbers[1]}",
+                f"3. {self._t('visualization.result', 'Resultado')}: {numbers[0] - numbers[1]}"
             ]
         elif operation == '*':
             steps = [
-                f"1. {_('visualization.we_have', 'Tenemos')}: {numbers[0]} × {numbers[1]}",
-                f"2. {_('visualization.multiplying', 'Multiplicamos')}: {numbers[0]} × {numbers[1]}",
-                f"3. {_('visualization.result', 'Resultado')}: {numbers[0] * numbers[1]}"
+                f"1. {self._t('visualization.we_have', 'Tenemos')}: {numbers[0]} × {numbers[1]}",
+                f"2. {self._t('visualization.multiplying', 'Multiplicamos')}: {numbers[0]} × {numbers[1]}",
+                f"3. {self._t('visualization.result', 'Resultado')}: {numbers[0] * numbers[1]}"
             ]
         elif operation == '/':
             result = numbers[0] / numbers[1] if numbers[1] != 0 else 0
             steps = [
-                f"1. {_('visualization.we_have', 'Tenemos')}: {numbers[0]} ÷ {numbers[1]}",
-                f"2. {_('visualization.dividing', 'Dividimos')}: {numbers[0]} ÷ {numbers[1]}",
-                f"3. {_('visualization.result', 'Resultado')}: {result}"
+                f"1. {self._t('visualization.we_have', 'Tenemos')}: {numbers[0]} ÷ {numbers[1]}",
+                f"2. {self._t('visualization.dividing', 'Dividimos')}: {numbers[0]} ÷ {numbers[1]}",
+                f"3. {self._t('visualization.result', 'Resultado')}: {result}"
             ]
         
         for i, step in enumerate(steps):
@@ -261,7 +375,7 @@ class MathVisualizer:
     def _draw_number_line(self, ax, numbers, operation):
         """Dibuja representación en recta numérica"""
         ax.set_facecolor(self.colors['background'])
-        ax.set_title(_("visualization.number_line", "Recta Numérica"), 
+        ax.set_title(self._t("visualization.number_line", "Recta Numérica"), 
                     color=self.colors['text'], fontsize=12, fontweight='bold')
         
         # Determinar rango
@@ -308,7 +422,7 @@ class MathVisualizer:
         ax.set_xlim(0, 10)
         ax.set_ylim(0, 10)
         ax.set_facecolor(self.colors['background'])
-        ax.set_title(_("visualization.final_result", "Resultado Final"), 
+        ax.set_title(self._t("visualization.final_result", "Resultado Final"), 
                     color=self.colors['text'], fontsize=12, fontweight='bold')
         
         # Calcular resultado
@@ -342,61 +456,61 @@ class MathVisualizer:
         ax.spines['bottom'].set_visible(False)
         ax.spines['left'].set_visible(False)
     
-    def _visualize_algebra(self, user_input: str, response: str, formula: str) -> Optional[str]:
+    def _visualize_algebra(self, user_input: str, response: str, formula: str) -> Optional[RenderedImage]:
         """Visualiza problemas de álgebra con gráficas y pasos"""
         try:
-            fig, ((ax1, ax2), (ax3, ax4)) = plt.subplots(2, 2, figsize=self.fig_size)
-            fig.patch.set_facecolor(self.colors['background'])
-            
-            # Extraer ecuación
-            equation = self._extract_equation(user_input, formula)
-            
-            if equation:
-                # Panel 1: Ecuación original
-                self._draw_equation_display(ax1, equation)
-                
-                # Panel 2: Pasos de resolución
-                self._draw_algebra_steps(ax2, equation)
-                
-                # Panel 3: Gráfica de la función
-                self._draw_equation_graph(ax3, equation)
-                
-                # Panel 4: Verificación
-                self._draw_verification(ax4, equation)
-            else:
-                # Si no hay ecuación específica, mostrar concepto general
-                self._draw_algebra_concept(ax1, user_input)
-                self._draw_algebra_example(ax2)
-                self._draw_algebra_tips(ax3)
-                self._draw_algebra_practice(ax4)
-            
-            plt.tight_layout()
-            return self._fig_to_base64(fig)
+            with self.figure_pool.figure(self.render_dpi) as (fig, axes):
+                (ax1, ax2), (ax3, ax4) = axes
+                
+                # Extraer ecuación
+                equation = self._extract_equation(user_input, formula)
+                
+                if equation:
+                    # Panel 1: Ecuación original
+                    self._draw_equation_display(ax1, equation)
+                    
+                    # Panel 2: Pasos de resolución
+                    self._draw_algebra_steps(ax2, equation)
+                    
+                    # Panel 3: Gráfica de la función
+                    self._draw_equation_graph(ax3, equation)
+                    
+                    # Panel 4: Verificación
+                    self._draw_verification(ax4, equation)
+                else:
+                    # Si no hay ecuación específica, mostrar concepto general
+                    self._draw_algebra_concept(ax1, user_input)
+                    self._draw_algebra_example(ax2)
+                    self._draw_algebra_tips(ax3)
+                    self._draw_algebra_practice(ax4)
+                
+                fig.tight_layout()
+                return self._fig_to_image(fig)
             
         except Exception as e:
             logger.error(f"Error en visualización de álgebra: {e}")
             return None
     
-    def _visualize_geometry(self, user_input: str, response: str) -> Optional[str]:
+    def _visualize_geometry(self, user_input: str, response: str) -> Optional[RenderedImage]:
         """Visualiza problemas de geometría con figuras y cálculos"""
         try:
-            fig, ((ax1, ax2), (ax3, ax4)) = plt.subplots(2, 2, figsize=self.fig_size)
-            fig.patch.set_facecolor(self.colors['background'])
-            
-            # Detectar tipo de figura
-            shape_type = self._detect_geometric_shape(user_input)
-            
-            if shape_type == "circle":
-                self._draw_circle_problem(ax1, ax2, ax3, ax4, user_input, response)
-            elif shape_type == "triangle":
-                self._draw_triangle_problem(ax1, ax2, ax3, ax4, user_input, response)
-            elif shape_type == "rectangle":
-                self._draw_rectangle_problem(ax1, ax2, ax3, ax4, user_input, response)
-            else:
-                self._draw_general_geometry(ax1, ax2, ax3, ax4, user_input, response)
-            
-            plt.tight_layout()
-            return self._fig_to_base64(fig)
+            with self.figure_pool.figure(self.render_dpi) as (fig, axes):
+                (ax1, ax2), (ax3, ax4) = axes
+                
+                # Detectar tipo de figura
+                shape_type = self._detect_geometric_shape(user_input)
+                
+                if shape_type == "circle":
+                    self._draw_circle_problem(ax1, ax2, ax3, ax4, user_input, response)
+                elif shape_type == "triangle":
+                    self._draw_triangle_problem(ax1, ax2, ax3, ax4, user_input, response)
+                elif shape_type == "rectangle":
+                    self._draw_rectangle_problem(ax1, ax2, ax3, ax4, user_input, response)
+                else:
+                    self._draw_general_geometry(ax1, ax2, ax3, ax4, user_input, response)
+                
+                fig.tight_layout()
+                return self._fig_to_image(fig)
             
         except Exception as e:
             logger.error(f"Error en visualización de geometría: {e}")
@@ -413,9 +527,9 @@ class MathVisualizer:
         ax1.set_xlim(-radius*1.5, radius*1.5)
         ax1.set_ylim(-radius*1.5, radius*1.5)
         ax1.set_facecolor(self.colors['background'])
-        ax1.set_title(_("visualization.circle", "Círculo"), color=self.colors['text'], fontweight='bold')
+        ax1.set_title(self._t("visualization.circle", "Círculo"), color=self.colors['text'], fontweight='bold')
         
-        circle = plt.Circle((0, 0), radius, fill=False, color=self.colors['primary'], linewidth=3)
+        circle = patches.Circle((0, 0), radius, fill=False, color=self.colors['primary'], linewidth=3)
         ax1.add_patch(circle)
         
         # Dibujar radio
@@ -425,7 +539,7 @@ class MathVisualizer:
         
         # Marcar centro
         ax1.plot(0, 0, 'o', color=self.colors['highlight'], markersize=8)
-        ax1.text(0, -0.5, _("visualization.center", "Centro"), ha='center', va='top', 
+        ax1.text(0, -0.5, self._t("visualization.center", "Centro"), ha='center', va='top', 
                 color=self.colors['text'], fontsize=10)
         
         ax1.set_aspect('equal')
@@ -437,12 +551,12 @@ class MathVisualizer:
         ax2.set_xlim(0, 10)
         ax2.set_ylim(0, 10)
         ax2.set_facecolor(self.colors['background'])
-        ax2.set_title(_("visualization.formulas", "Fórmulas"), color=self.colors['text'], fontweight='bold')
+        ax2.set_title(self._t("visualization.formulas", "Fórmulas"), color=self.colors['text'], fontweight='bold')
         
         formulas = [
-            f"{_('visualization.area', 'Área')}: A = πr² = π({radius})² = {np.pi * radius**2:.2f}",
-            f"{_('visualization.perimeter', 'Perímetro')}: P = 2πr = 2π({radius}) = {2 * np.pi * radius:.2f}",
-            f"{_('visualization.diameter', 'Diámetro')}: d = 2r = 2({radius}) = {2 * radius}"
+            f"{self._t('visualization.area', 'Área')}: A = πr² = π({radius})² = {np.pi * radius**2:.2f}",
+            f"{self._t('visualization.perimeter', 'Perímetro')}: P = 2πr = 2π({radius}) = {2 * np.pi * radius:.2f}",
+            f"{self._t('visualization.diameter', 'Diámetro')}: d = 2r = 2({radius}) = {2 * radius}"
         ]
         
         for i, formula in enumerate(formulas):
@@ -460,7 +574,7 @@ class MathVisualizer:
         ax3.set_xlim(0, 10)
         ax3.set_ylim(0, 10)
         ax3.set_facecolor(self.colors['background'])
-        ax3.set_title(_("visualization.visual_comparison", "Comparación Visual"), 
+        ax3.set_title(self._t("visualization.visual_comparison", "Comparación Visual"), 
                      color=self.colors['text'], fontweight='bold')
         
         # Dibujar cuadrado inscrito para comparar área
@@ -469,12 +583,12 @@ class MathVisualizer:
                                  fill=False, color=self.colors['accent'], linewidth=2, linestyle='--')
         ax3.add_patch(square)
         
-        circle_small = plt.Circle((0, 0), radius/2, fill=False, color=self.colors['primary'], linewidth=2)
+        circle_small = patches.Circle((0, 0), radius/2, fill=False, color=self.colors['primary'], linewidth=2)
         ax3.add_patch(circle_small)
         
-        ax3.text(5, 2, f"{_('visualization.circle_area', 'Área del círculo')}: {np.pi * radius**2:.1f}", 
+        ax3.text(5, 2, f"{self._t('visualization.circle_area', 'Área del círculo')}: {np.pi * radius**2:.1f}", 
                 ha='center', va='center', color=self.colors['primary'], fontsize=10)
-        ax3.text(5, 1, f"{_('visualization.square_area', 'Área del cuadrado')}: {square_side**2:.1f}", 
+        ax3.text(5, 1, f"{self._t('visualization.square_area', 'Área del cuadrado')}: {square_side**2:.1f}", 
                 ha='center', va='center', color=self.colors['accent'], fontsize=10)
         
         ax3.set_xlim(-radius, radius)
@@ -487,13 +601,13 @@ class MathVisualizer:
         ax4.set_xlim(0, 10)
         ax4.set_ylim(0, 10)
         ax4.set_facecolor(self.colors['background'])
-        ax4.set_title(_("visualization.applications", "Aplicaciones"), 
+        ax4.set_title(self._t("visualization.applications", "Aplicaciones"), 
                      color=self.colors['text'], fontweight='bold')
         
         applications = [
-            f"🍕 {_('visualization.pizza', 'Pizza')}: {_('visualization.pizza_slices', 'Rebanadas de área')} {np.pi * radius**2 / 8:.1f}",
-            f"🏃 {_('visualization.track', 'Pista')}: {_('visualization.distance', 'Distancia')} {2 * np.pi * radius:.1f}m",
-            f"🎯 {_('visualization.target', 'Diana')}: {_('visualization.probability', 'Probabilidad de acierto')}"
+            f"🍕 {self._t('visualization.pizza', 'Pizza')}: {self._t('visualization.pizza_slices', 'Rebanadas de área')} {np.pi * radius**2 / 8:.1f}",
+            f"🏃 {self._t('visualization.track', 'Pista')}: {self._t('visualization.distance', 'Distancia')} {2 * np.pi * radius:.1f}m",
+            f"🎯 {self._t('visualization.target', 'Diana')}: {self._t('visualization.probability', 'Probabilidad de acierto')}"
         ]
         
         for i, app in enumerate(applications):
@@ -507,106 +621,106 @@ class MathVisualizer:
         ax4.spines['bottom'].set_visible(False)
         ax4.spines['left'].set_visible(False)
     
-    def _visualize_function(self, user_input: str, response: str) -> Optional[str]:
+    def _visualize_function(self, user_input: str, response: str) -> Optional[RenderedImage]:
         """Visualiza funciones matemáticas"""
         try:
-            fig, ((ax1, ax2), (ax3, ax4)) = plt.subplots(2, 2, figsize=self.fig_size)
-            fig.patch.set_facecolor(self.colors['background'])
-            
-            # Extraer función
-            function_expr = self._extract_function(user_input)
-            
-            if function_expr:
-                # Panel 1: Gráfica de la función
-                self._plot_function(ax1, function_expr)
+            with self.figure_pool.figure(self.render_dpi) as (fig, axes):
+                (ax1, ax2), (ax3, ax4) = axes
                 
-                # Panel 2: Tabla de valores
-                self._draw_function_table(ax2, function_expr)
+                # Extraer función
+                function_expr = self._extract_function(user_input)
                 
-                # Panel 3: Propiedades
-                self._draw_function_properties(ax3, function_expr)
+                if function_expr:
+                    # Panel 1: Gráfica de la función
+                    self._plot_function(ax1, function_expr)
+                    
+                    # Panel 2: Tabla de valores
+                    self._draw_function_table(ax2, function_expr)
+                    
+                    # Panel 3: Propiedades
+                    self._draw_function_properties(ax3, function_expr)
+                    
+                    # Panel 4: Transformaciones
+                    self._draw_function_transformations(ax4, function_expr)
+                else:
+                    # Función ejemplo
+                    self._draw_function_example(ax1, ax2, ax3, ax4)
                 
-                # Panel 4: Transformaciones
-                self._draw_function_transformations(ax4, function_expr)
-            else:
-                # Función ejemplo
-                self._draw_function_example(ax1, ax2, ax3, ax4)
-            
-            plt.tight_layout()
-            return self._fig_to_base64(fig)
+                fig.tight_layout()
+                return self._fig_to_image(fig)
             
         except Exception as e:
             logger.error(f"Error en visualización de función: {e}")
             return None
     
-    def _visualize_calculus(self, user_input: str, response: str) -> Optional[str]:
+    def _visualize_calculus(self, user_input: str, response: str) -> Optional[RenderedImage]:
         """Visualiza problemas de cálculo"""
         try:
-            fig, ((ax1, ax2), (ax3, ax4)) = plt.subplots(2, 2, figsize=self.fig_size)
-            fig.patch.set_facecolor(self.colors['background'])
-            
-            if "derivada" in user_input.lower() or "derivative" in user_input.lower():
-                self._visualize_derivative(ax1, ax2, ax3, ax4, user_input)
-            elif "integral" in user_input.lower():
-                self._visualize_integral(ax1, ax2, ax3, ax4, user_input)
-            else:
-                self._visualize_general_calculus(ax1, ax2, ax3, ax4, user_input)
-            
-            plt.tight_layout()
-            return self._fig_to_base64(fig)
+            with self.figure_pool.figure(self.render_dpi) as (fig, axes):
+                (ax1, ax2), (ax3, ax4) = axes
+                
+                if "derivada" in user_input.lower() or "derivative" in user_input.lower():
+                    self._visualize_derivative(ax1, ax2, ax3, ax4, user_input)
+                elif "integral" in user_input.lower():
+                    self._visualize_integral(ax1, ax2, ax3, ax4, user_input)
+                else:
+                    self._visualize_general_calculus(ax1, ax2, ax3, ax4, user_input)
+                
+                fig.tight_layout()
+                return self._fig_to_image(fig)
             
         except Exception as e:
             logger.error(f"Error en visualización de cálculo: {e}")
             return None
     
-    def _visualize_statistics(self, user_input: str, response: str) -> Optional[str]:
+    def _visualize_statistics(self, user_input: str, response: str) -> Optional[RenderedImage]:
         """Visualiza problemas de estadística"""
         try:
-            fig, ((ax1, ax2), (ax3, ax4)) = plt.subplots(2, 2, figsize=self.fig_size)
-            fig.patch.set_facecolor(self.colors['background'])
-            
-            # Generar datos de ejemplo o extraer del input
-            data = self._extract_data_from_input(user_input)
-            
-            # Panel 1: Histograma
-            self._draw_histogram(ax1, data)
-            
-            # Panel 2: Medidas de tendencia central
-            self._draw_central_measures(ax2, data)
-            
-            # Panel 3: Diagrama de caja
-            self._draw_box_plot(ax3, data)
-            
-            # Panel 4: Resumen estadístico
-            self._draw_stats_summary(ax4, data)
-            
-            plt.tight_layout()
-            return self._fig_to_base64(fig)
+            with self.figure_pool.figure(self.render_dpi) as (fig, axes):
+                (ax1, ax2), (ax3, ax4) = axes
+                
+                # Generar datos de ejemplo o extraer del input
+                data = self._extract_data_from_input(user_input)
+                
+                # Panel 1: Histograma
+                self._draw_histogram(ax1, data)
+                
+                # Panel 2: Medidas de tendencia central
+                self._draw_central_measures(ax2, data)
+                
+                # Panel 3: Diagrama de caja
+                self._draw_box_plot(ax3, data)
+                
+                # Panel 4: Resumen estadístico
+                self._draw_stats_summary(ax4, data)
+                
+                fig.tight_layout()
+                return self._fig_to_image(fig)
             
         except Exception as e:
             logger.error(f"Error en visualización de estadística: {e}")
             return None
     
-    def _visualize_general_concept(self, user_input: str, response: str) -> Optional[str]:
+    def _visualize_general_concept(self, user_input: str, response: str) -> Optional[RenderedImage]:
         """Visualiza conceptos matemáticos generales"""
         try:
-            fig, ((ax1, ax2), (ax3, ax4)) = plt.subplots(2, 2, figsize=self.fig_size)
-            fig.patch.set_facecolor(self.colors['background'])
-            
-            # Panel 1: Concepto principal
-            self._draw_concept_title(ax1, user_input)
-            
-            # Panel 2: Ejemplo visual
-            self._draw_concept_example(ax2, user_input)
-            
-            # Panel 3: Aplicaciones
-            self._draw_concept_applications(ax3, user_input)
-            
-            # Panel 4: Consejos
-            self._draw_concept_tips(ax4, user_input)
-            
-            plt.tight_layout()
-            return self._fig_to_base64(fig)
+            with self.figure_pool.figure(self.render_dpi) as (fig, axes):
+                (ax1, ax2), (ax3, ax4) = axes
+                
+                # Panel 1: Concepto principal
+                self._draw_concept_title(ax1, user_input)
+                
+                # Panel 2: Ejemplo visual
+                self._draw_concept_example(ax2, user_input)
+                
+                # Panel 3: Aplicaciones
+                self._draw_concept_applications(ax3, user_input)
+                
+                # Panel 4: Consejos
+                self._draw_concept_tips(ax4, user_input)
+                
+                fig.tight_layout()
+                return self._fig_to_image(fig)
             
         except Exception as e:
             logger.error(f"Error en visualización general: {e}")
@@ -713,24 +827,13 @@ class MathVisualizer:
             # Datos de ejemplo
             return [23, 45, 56, 78, 32, 67, 89, 12, 34, 56, 78, 90, 23, 45, 67]
     
-    def _fig_to_base64(self, fig) -> str:
-        """Convierte figura matplotlib a base64"""
+    def _fig_to_image(self, fig) -> Optional[RenderedImage]:
+        """Dibuja la figura y copia su buffer RGBA (la figura pertenece al pool: no se cierra)"""
         try:
-            buffer = io.BytesIO()
-            fig.savefig(buffer, format='png', dpi=self.dpi, bbox_inches='tight',
-                       facecolor=self.colors['background'], edgecolor='none')
-            buffer.seek(0)
-            
-            # Convertir a base64
-            image_base64 = base64.b64encode(buffer.getvalue()).decode()
-            buffer.close()
-            plt.close(fig)
-            
-            return image_base64
+            return RenderedImage.from_figure(fig)
             
         except Exception as e:
-            logger.error(f"Error convirtiendo figura a base64: {e}")
-            plt.close(fig)
+            logger.error(f"Error renderizando figura: {e}")
             return None
     
     # Métodos de dibujo específicos (continuarán en la siguiente parte...)
@@ -738,12 +841,12 @@ class MathVisualizer:
     def _draw_histogram(self, ax, data):
         """Dibuja histograma de datos"""
         ax.set_facecolor(self.colors['background'])
-        ax.set_title(_("visualization.histogram", "Histograma"), 
+        ax.set_title(self._t("visualization.histogram", "Histograma"), 
                     color=self.colors['text'], fontweight='bold')
         
         ax.hist(data, bins=8, color=self.colors['primary'], alpha=0.7, edgecolor=self.colors['text'])
-        ax.set_xlabel(_("visualization.values", "Valores"), color=self.colors['text'])
-        ax.set_ylabel(_("visualization.frequency", "Frecuencia"), color=self.colors['text'])
+        ax.set_xlabel(self._t("visualization.values", "Valores"), color=self.colors['text'])
+        ax.set_ylabel(self._t("visualization.frequency", "Frecuencia"), color=self.colors['text'])
         ax.tick_params(colors=self.colors['text'])
         
         for spine in ax.spines.values():
@@ -754,17 +857,17 @@ class MathVisualizer:
         ax.set_xlim(0, 10)
         ax.set_ylim(0, 10)
         ax.set_facecolor(self.colors['background'])
-        ax.set_title(_("visualization.central_measures", "Medidas de Tendencia Central"), 
+        ax.set_title(self._t("visualization.central_measures", "Medidas de Tendencia Central"), 
                     color=self.colors['text'], fontweight='bold')
         
         mean_val = np.mean(data)
         median_val = np.median(data)
         
         measures = [
-            f"{_('visualization.mean', 'Media')}: {mean_val:.2f}",
-            f"{_('visualization.median', 'Mediana')}: {median_val:.2f}",
-            f"{_('visualization.range', 'Rango')}: {max(data) - min(data):.2f}",
-            f"{_('visualization.std', 'Desv. Estándar')}: {np.std(data):.2f}"
+            f"{self._t('visualization.mean', 'Media')}: {mean_val:.2f}",
+            f"{self._t('visualization.median', 'Mediana')}: {median_val:.2f}",
+            f"{self._t('visualization.range', 'Rango')}: {max(data) - min(data):.2f}",
+            f"{self._t('visualization.std', 'Desv. Estándar')}: {np.std(data):.2f}"
         ]
         
         for i, measure in enumerate(measures):
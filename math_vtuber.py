@@ -17,6 +17,12 @@ import math
 import random
 from PIL import Image, ImageDraw, ImageFont
 import traceback
+from response_store import ResponseStore
+from query_normalizer import normalize_cache_key, NgramIndex
+from safe_expr import safe_eval, is_valid_expression
+from step_solver import solve_steps, format_number
+from metrics import (get_metrics, STAGE_CACHE_LOOKUP, STAGE_PROMPT_BUILD, STAGE_GENERATION,
+                     STAGE_FORMULA_EXTRACTION, STAGE_TOPIC_DETECTION, STAGE_VISUALIZATION_RENDER)
 
 # Configuración del logger
 logger = logging.getLogger(__name__)
@@ -270,7 +276,9 @@ class MathVTuberPhi2:
         self.model = None
         self.model_type = "basic"
         self.conversation_history = []
-        self.cache = {}
+        self.cache = None
+        self.similarity_index = None  # Se construye al primer uso
+        self.similarity_threshold = 0.85  # None desactiva la búsqueda aproximada
         self.smart_board = SmartMathBoard()
         
         # Configuración específica para Phi-2
@@ -302,24 +310,14 @@ class MathVTuberPhi2:
             logger.warning("No se proporcionó ruta al modelo. Funcionando en modo básico.")
     
     def load_cache(self):
-        """Carga el caché de respuestas"""
-        cache_file = "math_cache.json"
-        if os.path.exists(cache_file):
-            try:
-                with open(cache_file, "r", encoding="utf-8") as f:
-                    self.cache = json.load(f)
-                logger.info(f"Caché cargado con {len(self.cache)} entradas")
-            except Exception as e:
-                logger.error(f"Error al cargar el caché: {str(e)}")
-                self.cache = {}
+        """Prepara el almacén de respuestas (los datos se leen de disco al primer uso)"""
+        # El antiguo math_cache.json se migra automáticamente la primera vez
+        self.cache = ResponseStore(legacy_json="math_cache.json")
     
     def save_cache(self):
-        """Guarda el caché de respuestas"""
-        cache_file = "math_cache.json"
+        """Confirma en disco el almacén de respuestas"""
         try:
-            with open(cache_file, "w", encoding="utf-8") as f:
-                json.dump(self.cache, f, ensure_ascii=False, indent=2)
-            logger.info(f"Caché guardado con {len(self.cache)} entradas")
+            self.cache.flush()
         except Exception as e:
             logger.error(f"Error al guardar el caché: {str(e)}")
     
@@ -360,13 +358,17 @@ class MathVTuberPhi2:
         """Carga con llama-cpp-python como PRIMERA opción"""
         try:
             from llama_cpp import Llama
+            from inference_tuner import get_inference_tuner, default_params
             
             logger.info("🦙 Intentando cargar con llama-cpp-python...")
             
+            # Calibración guardada para este modelo y CPU, o un hilo por núcleo físico
+            params = get_inference_tuner().lookup(self.model_path) or default_params()
+            
             self.model = Llama(
                 model_path=self.model_path,
                 n_ctx=self.context_length,
-                n_threads=4,
+                **params.llama_kwargs(),
                 n_gpu_layers=0,
                 verbose=False
             )
@@ -433,12 +435,20 @@ class MathVTuberPhi2:
     
     def generate_response(self, user_input):
         """Genera respuesta con pizarra inteligente"""
+        with get_metrics().request("chat"):
+            return self._generate_response(user_input)
+    
+    def _generate_response(self, user_input):
         start_time = time.time()
-        
-        # Verificar caché
-        if user_input in self.cache:
+        metrics = get_metrics()
+        
+        # Verificar caché con la clave normalizada (tildes, mayúsculas, operadores, forma canónica)
+        with metrics.stage(STAGE_CACHE_LOOKUP):
+            cache_key = normalize_cache_key(user_input)
+            cached_response = self.lookup_cache(cache_key)
+        metrics.record_cache(cached_response is not None)
+        if cached_response is not None:
             logger.info(f"💾 Respuesta encontrada en caché")
-            cached_response = self.cache[user_input]
             return cached_response.get("text", ""), cached_response.get("formula", ""), cached_response.get("image", "")
         
         # Generar respuesta
@@ -447,19 +457,26 @@ class MathVTuberPhi2:
         else:
             try:
                 if self.model_type == "llama_cpp":
-                    prompt = self.prepare_standard_prompt(user_input)
-                    response = self.generate_with_llama_cpp(prompt)
+                    with metrics.stage(STAGE_PROMPT_BUILD):
+                        prompt = self.prepare_standard_prompt(user_input)
+                    with metrics.stage(STAGE_GENERATION):
+                        response = self.generate_with_llama_cpp(prompt)
                     basic_response = self.process_standard_response(response)
                 elif self.model_type == "phi2":
-                    prompt = self.prepare_phi2_prompt(user_input)
-                    response = self.generate_with_phi2(prompt)
+                    with metrics.stage(STAGE_PROMPT_BUILD):
+                        prompt = self.prepare_phi2_prompt(user_input)
+                    with metrics.stage(STAGE_GENERATION):
+                        response = self.generate_with_phi2(prompt)
                     basic_response = self.process_phi2_response(response)
                 else:
-                    prompt = self.prepare_standard_prompt(user_input)
-                    response = self.generate_with_ctransformers(prompt)
+                    with metrics.stage(STAGE_PROMPT_BUILD):
+                        prompt = self.prepare_standard_prompt(user_input)
+                    with metrics.stage(STAGE_GENERATION):
+                        response = self.generate_with_ctransformers(prompt)
                     basic_response = self.process_standard_response(response)
                 
-                formula = self.extract_formula(basic_response)
+                with metrics.stage(STAGE_FORMULA_EXTRACTION):
+                    formula = self.extract_formula(basic_response)
                 basic_image = ""
                 
             except Exception as e:
@@ -467,8 +484,10 @@ class MathVTuberPhi2:
                 basic_response, formula, basic_image = self.generate_enhanced_basic_response(user_input)
         
         # Generar pizarra inteligente
-        detected_topics = self.smart_board.detect_topics(basic_response + " " + user_input)
-        smart_board_image = self.smart_board.generate_smart_board(basic_response + " " + user_input, detected_topics)
+        with metrics.stage(STAGE_TOPIC_DETECTION):
+            detected_topics = self.smart_board.detect_topics(basic_response + " " + user_input)
+        with metrics.stage(STAGE_VISUALIZATION_RENDER):
+            smart_board_image = self.smart_board.generate_smart_board(basic_response + " " + user_input, detected_topics)
         
         final_image = smart_board_image if smart_board_image else basic_image
         
@@ -478,21 +497,49 @@ class MathVTuberPhi2:
         
         highlighted_response = self.highlight_keywords(basic_response)
         
-        # Guardar en caché
-        self.cache[user_input] = {
+        # Guardar en caché (una fila por entrada, sin reescribir el resto)
+        self.cache.put(cache_key, {
             "text": highlighted_response,
             "formula": formula,
             "image": final_image
-        }
-        
-        if len(self.cache) % 5 == 0:
-            self.save_cache()
+        })
+        if self.similarity_index is not None and cache_key.startswith("text:"):
+            self.similarity_index.add(cache_key)
         
         elapsed_time = time.time() - start_time
         logger.info(f"⏱️ Respuesta generada en {elapsed_time:.2f} segundos")
         
         return highlighted_response, formula, final_image
     
+    def lookup_cache(self, cache_key):
+        """Busca una respuesta por clave exacta y, para preguntas de texto, por similitud"""
+        cached_response = self.cache.get(cache_key)
+        if cached_response is not None or not self.similarity_threshold:
+            return cached_response
+        
+        # Las expresiones matemáticas solo se reutilizan con coincidencia exacta
+        if not cache_key.startswith("text:"):
+            return None
+        
+        if self.similarity_index is None:
+            self.similarity_index = NgramIndex(threshold=self.similarity_threshold)
+            for key in self.cache.keys():
+                if key.startswith("text:"):
+                    self.similarity_index.add(key)
+        
+        match = self.similarity_index.query(cache_key)
+        if match is None:
+            return None
+        
+        similar_key, score = match
+        cached_response = self.cache.get(similar_key)
+        if cached_response is None:
+            # La entrada fue expulsada del almacén
+            self.similarity_index.remove(similar_key)
+        else:
+            logger.info(f"💾 Pregunta similar encontrada en caché (similitud {score:.2f})")
+        return cached_response
+    
     def generate_with_llama_cpp(self, prompt):
         """Genera con llama-cpp-python"""
         try:
@@ -504,6 +551,8 @@ class MathVTuberPhi2:
                     top_p=0.9,
                     stop=["Usuario:", "Human:", "User:"]
                 )
+                # Sin streaming solo se cuentan los tokens: el tiempo incluye la evaluación del prompt
+                get_metrics().record_tokens(completion.get('usage', {}).get('completion_tokens', 0))
                 return completion['choices'][0]['text']
             else:
                 raise ValueError("Modelo no compatible")
@@ -601,7 +650,7 @@ class MathVTuberPhi2:
                 # Verificar que sea una expresión matemática válida
                 if self.is_valid_math_expression(expr_clean):
                     # Resolver con jerarquía
-                    result = eval(expr_clean)
+                    result = safe_eval(expr_clean)
                     formula = f"${expression} = {result}$"
                     
                     # Generar explicación paso a paso
@@ -651,12 +700,7 @@ Para cargar un modelo, asegúrate de tener instalado llama-cpp-python o ctransfo
 
     def is_valid_math_expression(self, expr):
         """Verifica si una expresión es matemáticamente válida"""
-        try:
-            # Intentar evaluar la expresión
-            result = eval(expr)
-            return isinstance(result, (int, float))
-        except:
-            return False
+        return is_valid_expression(expr)
     
     def extract_math_expression_from_text(self, text):
         """Extrae expresiones matemáticas del texto"""
@@ -674,18 +718,21 @@ Para cargar un modelo, asegúrate de tener instalado llama-cpp-python o ctransfo
         return None
     
     def solve_with_hierarchy(self, expression):
-        """Resuelve expresión paso a paso"""
+        """Resuelve expresión paso a paso respetando la jerarquía de operaciones"""
         try:
-            expr = expression.replace('×', '*').replace('÷', '/').replace('^', '**')
-            
             steps = []
             steps.append(f"Expresión original: {expression}")
             
-            # Evaluar paso a paso (simplificado)
+            # Resolver una operación por paso (paréntesis, potencias, productos, sumas)
             try:
-                result = eval(expr)
-                steps.append(f"Resultado: {result}")
-            except:
+                solution = solve_steps(expression)
+                for number, step in enumerate(solution.steps, 1):
+                    steps.append(f"Paso {number}: {step.operation} → {step.expression}")
+                if solution.hidden_steps:
+                    steps.append(f"(… {solution.hidden_steps} pasos más)")
+                steps.append(f"Resultado: {format_number(solution.result)}")
+            except Exception as e:
+                logger.error(f"Error resolviendo paso a paso: {e}")
                 steps.append("Error en el cálculo")
             
             return '\n'.join(steps)
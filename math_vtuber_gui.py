@@ -29,6 +29,7 @@ class MathVTuberGUI:
         self.is_speaking = False
         self.current_avatar_state = "idle"
         self.math_engine = None
+        self.model_downloader = None
     
     # Configurar estilo
         self.setup_styles()
@@ -419,76 +420,27 @@ class MathVTuberGUI:
                 self.model_status.config(text="Estado: Modo básico", foreground="orange")
                 return
             
-            # Buscar los modelos específicos primero (diferentes variantes de nombres)
-            specific_models = [
-                "qwen1.5-1.8b-chat-q4_0.gguf",  # Nombre oficial con puntos
-                "qwen1_5-1_8b-chat-q4_0.gguf",  # Nombre con guiones bajos
-                "qwen1.5-7b-chat-q4_0.gguf",    # Modelo grande oficial
-                "qwen1_5-7b-chat-q4_0.gguf",
-                "mistral-7b-instruct-v0.2.Q4_K_M.gguf"     # Modelo grande con guiones bajos
-            ]
-            
-            for specific_model in specific_models:
-                specific_model_path = os.path.join(ai_dir, specific_model)
-                if os.path.exists(specific_model_path):
-                    self.add_to_chat("Sistema", f"Cargando modelo: {specific_model}...", "system")
-                    logger.info(f"Modelo encontrado en: {specific_model_path}")
-                    # Inicializar MathVTuber en un hilo separado
-                    threading.Thread(target=self.load_model, args=(specific_model_path,)).start()
-                    return
-            
-            # También buscar el modelo con extensión .opdownload
-            specific_model_opdownload = "qwen1_5-7b-chat-q4_0.gguf.opdownload"
-            specific_model_opdownload_path = os.path.join(ai_dir, specific_model_opdownload)
-            
-            if os.path.exists(specific_model_opdownload_path):
-                # Verificar si el archivo está completo o corrupto
-                file_size = os.path.getsize(specific_model_opdownload_path)
-                if file_size < 1000000:  # Si el archivo es muy pequeño (menos de 1MB)
-                    self.add_to_chat("Sistema", f"El archivo del modelo parece estar incompleto o corrupto. Tamaño: {file_size/1024/1024:.2f} MB", "error")
-                    self.add_to_chat("Sistema", "Intente descargar el modelo nuevamente o use otro modelo.", "system")
-                    self.model_status.config(text="Estado: Error en modelo", foreground="red")
-                    return
-                
-                self.add_to_chat("Sistema", f"Cargando modelo: {specific_model_opdownload}...", "system")
-                logger.info(f"Modelo encontrado en: {specific_model_opdownload_path}")
-                # Inicializar MathVTuber en un hilo separado
-                threading.Thread(target=self.load_model, args=(specific_model_opdownload_path,)).start()
-                return
-            
-            # Si no encuentra el modelo específico, buscar cualquier modelo GGUF
-            gguf_files = [f for f in os.listdir(ai_dir) if f.endswith('.gguf') or f.endswith('.gguf.opdownload')]
-            
-            if gguf_files:
-                model_path = os.path.join(ai_dir, gguf_files[0])
-                self.add_to_chat("Sistema", f"Cargando modelo: {gguf_files[0]}...", "system")
-                logger.info(f"Modelo encontrado en: {model_path}")
-                # Inicializar MathVTuber en un hilo separado
-                threading.Thread(target=self.load_model, args=(model_path,)).start()
-                return
-            
-            # Si no hay modelos en la carpeta específica, buscar en las ubicaciones por defecto
-            model_paths = [
+            # Elegir el mejor modelo para la memoria del equipo a partir de las cabeceras GGUF
+            # (ia/ primero; el índice evita volver a leerlas en cada arranque)
+            here = os.path.dirname(os.path.abspath(__file__))
+            model_dirs = [
+                ai_dir,
                 "models",  # Carpeta models en la raíz
                 os.path.join(os.getcwd(), "models"),  # Carpeta models relativa al directorio de trabajo
-                os.path.join(os.path.dirname(os.path.abspath(__file__)), "models"),
-                os.path.join(os.path.dirname(os.path.abspath(__file__)), "assets", "models")
+                os.path.join(here, "models"),
+                os.path.join(here, "assets", "models")
             ]
             
-            model_found = False
-            for models_dir in model_paths:
-                if os.path.exists(models_dir):
-                    gguf_files = [f for f in os.listdir(models_dir) if f.endswith('.gguf') or f.endswith('.gguf.opdownload')]
-                    if gguf_files:
-                        model_path = os.path.join(models_dir, gguf_files[0])
-                        self.add_to_chat("Sistema", f"Cargando modelo: {gguf_files[0]}...", "system")
-                        logger.info(f"Modelo encontrado en: {model_path}")
-                        # Inicializar MathVTuber en un hilo separado
-                        threading.Thread(target=self.load_model, args=(model_path,)).start()
-                        model_found = True
-                        break
-
-            if not model_found:
+            from model_registry import get_model_registry
+            best = get_model_registry().best_model(model_dirs)
+            
+            if best is not None:
+                model_name = os.path.basename(best.path)
+                self.add_to_chat("Sistema", f"Cargando modelo: {model_name} ({best.quantization})...", "system")
+                logger.info(f"Modelo encontrado en: {best.path}")
+                # Inicializar MathVTuber en un hilo separado
+                threading.Thread(target=self.load_model, args=(best.path,)).start()
+            else:
                 self.add_to_chat("Sistema", f"No se encontró ningún modelo GGUF en {ai_dir} ni en las carpetas por defecto", "system")
                 self.add_to_chat("Sistema", "Funcionando en modo básico sin modelo", "system")
                 self.add_to_chat("MathVTuber", "¡Hola! Soy MathVTuber, tu asistente matemático. Puedo ayudarte con operaciones básicas y conceptos matemáticos. ¿En qué puedo ayudarte?", "mathvtuber")
@@ -505,6 +457,16 @@ class MathVTuberGUI:
             if not os.path.exists(ai_dir):
                 os.makedirs(ai_dir)
             
+            # URL del modelo Qwen 7B
+            url = "https://huggingface.co/Qwen/Qwen1.5-7B-Chat-GGUF/resolve/main/qwen1.5-7b-chat-q4_0.gguf"
+            destination = os.path.join(ai_dir, "qwen1_5-7b-chat-q4_0.gguf")
+            
+            # Una descarga interrumpida deja .part + .part.json: se continúa sin preguntar
+            if os.path.exists(destination + ".part.json"):
+                self.add_to_chat("Sistema", "Reanudando la descarga interrumpida del modelo Qwen 7B...", "system")
+                threading.Thread(target=self._download_file, args=(url, destination), daemon=True).start()
+                return
+            
             # Verificar si ya hay modelos GGUF
             gguf_files = [f for f in os.listdir(ai_dir) if f.endswith('.gguf') or f.endswith('.gguf.opdownload')]
             if gguf_files:
@@ -516,52 +478,45 @@ class MathVTuberGUI:
                                   "No se encontró ningún modelo de IA. ¿Deseas descargar el modelo Qwen 7B (aproximadamente 4GB)?"):
                 self.add_to_chat("Sistema", "Iniciando descarga del modelo Qwen 7B...", "system")
                 
-                # URL del modelo Qwen 7B
-                url = "https://huggingface.co/Qwen/Qwen1.5-7B-Chat-GGUF/resolve/main/qwen1.5-7b-chat-q4_0.gguf"
-                destination = os.path.join(ai_dir, "qwen1_5-7b-chat-q4_0.gguf")
-                
                 # Iniciar descarga en un hilo separado
-                threading.Thread(target=self._download_file, args=(url, destination)).start()
+                threading.Thread(target=self._download_file, args=(url, destination), daemon=True).start()
             else:
                 self.add_to_chat("Sistema", "Descarga cancelada. La aplicación funcionará en modo básico.", "system")
         except Exception as e:
             self.add_to_chat("Sistema", f"Error al descargar el modelo: {str(e)}", "error")
 
     def _download_file(self, url, destination):
-        """Descarga un archivo desde una URL mostrando progreso"""
+        """Descarga un archivo desde una URL mostrando progreso (por rangos en paralelo y reanudable)"""
+        from model_downloader import ModelDownloader, DownloadCancelled
+        
+        announced = []
+        
+        def on_progress(progress):
+            # ModelDownloader limita los avisos a ~10 por segundo
+            if not announced:
+                announced.append(True)
+                action = "Reanudando" if progress.resumed else "Descargando"
+                self.root.after(0, lambda: self.add_to_chat(
+                    "Sistema", f"{action} modelo ({progress.total/1024/1024:.1f} MB)...", "system"))
+            text = f"Descargando: {progress.percent:.1f}% ({progress.bytes_per_second/1024/1024:.1f} MB/s)"
+            self.root.after(0, lambda: self.model_status.config(text=text, foreground="blue"))
+        
         try:
-            import requests
-            from tqdm import tqdm
-            
-            # Realizar la solicitud
-            response = requests.get(url, stream=True)
-            response.raise_for_status()
-            
-            # Obtener el tamaño total del archivo
-            total_size = int(response.headers.get('content-length', 0))
-            
-            # Actualizar estado
-            self.root.after(0, lambda: self.add_to_chat("Sistema", f"Descargando modelo ({total_size/1024/1024:.1f} MB)...", "system"))
             self.root.after(0, lambda: self.model_status.config(text="Estado: Descargando...", foreground="blue"))
+            self.model_downloader = ModelDownloader(url, destination, on_progress=on_progress)
+            result = self.model_downloader.download()
             
-            # Descargar el archivo
-            downloaded = 0
-            with open(destination, 'wb') as file:
-                for data in response.iter_content(chunk_size=1024*1024):  # 1MB chunks
-                    size = file.write(data)
-                    downloaded += size
-                    # Actualizar progreso cada 10MB
-                    if downloaded % (10*1024*1024) < 1024*1024:
-                        progress = downloaded / total_size * 100
-                        self.root.after(0, lambda p=progress: self.model_status.config(
-                            text=f"Descargando: {p:.1f}%", foreground="blue"))
-            
-            self.root.after(0, lambda: self.add_to_chat("Sistema", "Descarga completada. Iniciando carga del modelo...", "system"))
+            self.root.after(0, lambda: self.add_to_chat(
+                "Sistema", f"Descarga completada (SHA-256 {result.sha256[:16]}...). Iniciando carga del modelo...", "system"))
             self.root.after(0, lambda: self.initialize_math_vtuber())
             
+        except DownloadCancelled:
+            logger.info("Descarga del modelo cancelada; se reanudará en el próximo intento")
         except Exception as e:
             self.root.after(0, lambda: self.add_to_chat("Sistema", f"Error al descargar: {str(e)}", "error"))
             self.root.after(0, lambda: self.model_status.config(text="Estado: Error", foreground="red"))
+        finally:
+            self.model_downloader = None
 
     def browse_model(self):
         filename = filedialog.askopenfilename(
@@ -593,37 +548,12 @@ class MathVTuberGUI:
                 self.add_to_chat("Sistema", "Advertencia: El archivo del modelo tiene extensión .opdownload, lo que indica que la descarga podría estar incompleta.", "system")
                 self.add_to_chat("Sistema", "Intente renombrar el archivo quitando la extensión .opdownload si la descarga está completa.", "system")
         
-            # Verificar si la ruta contiene espacios o caracteres especiales
-            if ' ' in model_path or '\\' in model_path:
-                self.add_to_chat("Sistema", "La ruta del modelo contiene espacios o caracteres especiales que pueden causar problemas.", "system")
-                self.add_to_chat("Sistema", "Copiando el modelo a una ubicación temporal...", "system")
-                
-                # Crear una carpeta temporal en el directorio actual
-                temp_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), "temp_models")
-                os.makedirs(temp_dir, exist_ok=True)
-                
-                # Crear un nombre de archivo válido (solo alfanuméricos, guiones y puntos)
-                filename = os.path.basename(model_path)
-                valid_filename = ''.join(c if (c.isalnum() or c in ['-', '_', '.']) else '_' for c in filename)
-                
-                # Crear la ruta para el nuevo archivo
-                new_model_path = os.path.join(temp_dir, valid_filename)
-                
-                try:
-                    # Copiar el archivo con el nuevo nombre a la ubicación temporal
-                    import shutil
-                    if not os.path.exists(new_model_path):
-                        self.add_to_chat("Sistema", f"Copiando modelo a: {new_model_path}", "system")
-                        shutil.copy2(model_path, new_model_path)
-                    else:
-                        self.add_to_chat("Sistema", f"Usando copia existente del modelo en: {new_model_path}", "system")
-                    
-                    # Actualizar la ruta del modelo
-                    self.add_to_chat("Sistema", "Usando la copia temporal del modelo.", "system")
-                    model_path = new_model_path
-                except Exception as copy_error:
-                    self.add_to_chat("Sistema", f"Error al copiar el modelo: {str(copy_error)}", "error")
-                    self.add_to_chat("Sistema", "Intentando continuar con la ruta original...", "system")
+            # Algunos cargadores fallan con espacios o caracteres especiales en la ruta:
+            # se usa un alias del mismo archivo (enlace o descriptor), nunca una copia
+            from model_path_resolver import is_safe_path, resolve_model_path
+            if not is_safe_path(model_path):
+                model_path = resolve_model_path(model_path)
+                self.add_to_chat("Sistema", f"Usando el modelo a través de: {model_path}", "system")
 
             # Intentar instalar dependencias necesarias
             self.try_install_dependencies()
@@ -898,6 +828,10 @@ class MathVTuberGUI:
                 except Exception as e:
                     print(f"Error al guardar caché: {str(e)}")
             
+            # La descarga en curso se detiene conservando lo descargado
+            if self.model_downloader is not None:
+                self.model_downloader.cancel()
+            
             self.root.destroy()
 
     def draw(self, event):
@@ -0,0 +1,353 @@
+import os
+import json
+import math
+import time
+import logging
+import threading
+from collections import deque
+from contextlib import contextmanager, nullcontext
+from pathlib import Path
+from typing import Any, Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Prefijo de todas las métricas exportadas
+METRIC_PREFIX = "mathvtuber"
+# Muestras recientes que guarda cada histograma para calcular percentiles
+RESERVOIR_SIZE = 1024
+# Percentiles que se exportan
+QUANTILES = (0.5, 0.95, 0.99)
+
+# Etapas de una petición (etiqueta stage de mathvtuber_stage_seconds)
+STAGE_CACHE_LOOKUP = "cache_lookup"
+STAGE_PROMPT_BUILD = "prompt_build"
+# Restaurar (o evaluar) el prefijo del prompt del sistema; separado de prompt_eval
+STAGE_PREFIX_RESTORE = "prefix_restore"
+# Desde la llamada al modelo hasta el primer token (solo se mide con streaming)
+STAGE_PROMPT_EVAL = "prompt_eval"
+STAGE_TOKEN_GENERATION = "token_generation"
+# Sin streaming no se sabe cuándo llega el primer token: evaluación y generación juntas
+STAGE_GENERATION = "generation"
+STAGE_FORMULA_EXTRACTION = "formula_extraction"
+STAGE_TOPIC_DETECTION = "topic_detection"
+STAGE_VISUALIZATION_RENDER = "visualization_render"
+STAGE_PNG_ENCODE = "png_encode"
+STAGE_TTS = "tts"
+
+LabelKey = Tuple[Tuple[str, str], ...]
+
+
+class Counter:
+    """Valor que solo crece (peticiones, tokens, aciertos de caché...)"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.value = 0.0
+
+    def inc(self, amount: float = 1.0):
+        with self.lock:
+            self.value += amount
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {"value": self.value}
+
+
+class Gauge:
+    """Valor que sube y baja (último tokens/s, tamaño de caché...)"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.value = 0.0
+
+    def set(self, value: float):
+        with self.lock:
+            self.value = float(value)
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {"value": self.value}
+
+
+class Histogram:
+    """
+    Distribución de valores observados (normalmente segundos).
+
+    Guarda el total y la suma de todas las observaciones, y las últimas
+    RESERVOIR_SIZE muestras para los percentiles: así p95/p99 reflejan el
+    comportamiento reciente sin que la memoria crezca con el tiempo de uso.
+    Se exporta a Prometheus como summary.
+    """
+
+    def __init__(self, reservoir_size: int = RESERVOIR_SIZE):
+        self.lock = threading.Lock()
+        self.count = 0
+        self.sum = 0.0
+        self.recent = deque(maxlen=reservoir_size)
+
+    def observe(self, value: float):
+        with self.lock:
+            self.count += 1
+            self.sum += value
+            self.recent.append(value)
+
+    def percentile(self, q: float) -> Optional[float]:
+        """Percentil q (0-1) de las muestras recientes por rango más cercano, None si no hay"""
+        with self.lock:
+            samples = sorted(self.recent)
+        return _nearest_rank(samples, q)
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self.lock:
+            count, total, samples = self.count, self.sum, sorted(self.recent)
+        result = {"count": count, "sum": total}
+        for q in QUANTILES:
+            result[f"p{round(q * 100)}"] = _nearest_rank(samples, q)
+        return result
+
+
+def _nearest_rank(samples, q: float) -> Optional[float]:
+    if not samples:
+        return None
+    return samples[max(1, math.ceil(q * len(samples))) - 1]
+
+
+class RequestBreakdown:
+    """Tiempos por etapa de una única petición (para el registro de cada respuesta)"""
+
+    def __init__(self, kind: str):
+        self.kind = kind
+        self.start = time.perf_counter()
+        self.stages: Dict[str, float] = {}
+        self.tokens = 0
+        self.tokens_per_second: Optional[float] = None
+
+    def add(self, stage: str, seconds: float):
+        # Una etapa puede repetirse (por ejemplo, varias búsquedas en caché)
+        self.stages[stage] = self.stages.get(stage, 0.0) + seconds
+
+    def elapsed(self) -> float:
+        return time.perf_counter() - self.start
+
+    def summary(self) -> str:
+        parts = [f"{stage}={seconds * 1000:.1f}ms" for stage, seconds in self.stages.items()]
+        if self.tokens_per_second is not None:
+            parts.append(f"{self.tokens} tokens a {self.tokens_per_second:.1f} tok/s")
+        return f"{self.kind} en {self.elapsed():.2f}s: " + (", ".join(parts) or "sin etapas")
+
+
+class MetricsRegistry:
+    """
+    Registro de contadores, gauges e histogramas con etiquetas.
+
+    stage() mide una etapa en mathvtuber_stage_seconds{stage=...} y, si el hilo
+    está dentro de request(), la añade al desglose de esa petición, que se
+    registra al terminar. export() escribe todo en texto de Prometheus o en JSON.
+    """
+
+    def __init__(self, enabled: bool = True, log_breakdown: bool = True):
+        self.enabled = enabled
+        self.log_breakdown = log_breakdown
+        self.lock = threading.Lock()
+        # nombre -> (tipo, ayuda, {etiquetas: métrica})
+        self.families: Dict[str, Tuple[str, str, Dict[LabelKey, Any]]] = {}
+        self.local = threading.local()
+
+    def _metric(self, kind: str, factory, name: str, help_text: str, labels: Dict[str, str]):
+        key = tuple(sorted((k, str(v)) for k, v in labels.items()))
+        with self.lock:
+            family = self.families.get(name)
+            if family is None:
+                family = (kind, help_text, {})
+                self.families[name] = family
+            elif family[0] != kind:
+                raise ValueError(f"La métrica {name} ya existe como {family[0]}")
+            series = family[2]
+            if key not in series:
+                series[key] = factory()
+            return series[key]
+
+    def counter(self, name: str, help_text: str = "", **labels) -> Counter:
+        return self._metric("counter", Counter, name, help_text, labels)
+
+    def gauge(self, name: str, help_text: str = "", **labels) -> Gauge:
+        return self._metric("gauge", Gauge, name, help_text, labels)
+
+    def histogram(self, name: str, help_text: str = "", **labels) -> Histogram:
+        return self._metric("summary", Histogram, name, help_text, labels)
+
+    @contextmanager
+    def _timed_stage(self, stage: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe_stage(stage, time.perf_counter() - start)
+
+    def stage(self, stage: str):
+        """Context manager que mide una etapa (no hace nada si las métricas están desactivadas)"""
+        if not self.enabled:
+            return nullcontext()
+        return self._timed_stage(stage)
+
+    def observe_stage(self, stage: str, seconds: float):
+        """Registra una etapa medida por fuera (por ejemplo, el tiempo hasta el primer token)"""
+        if not self.enabled:
+            return
+        self.histogram(f"{METRIC_PREFIX}_stage_seconds", "Duración de cada etapa de una petición",
+                       stage=stage).observe(seconds)
+        request = getattr(self.local, "request", None)
+        if request is not None:
+            request.add(stage, seconds)
+
+    def record_tokens(self, tokens: int, seconds: Optional[float] = None):
+        """
+        Registra los tokens generados y la velocidad de generación
+
+        Args:
+            seconds: Tiempo de generación sin la evaluación del prompt; None si no se
+                conoce (llamadas sin streaming), y entonces solo se cuentan los tokens
+        """
+        if not self.enabled or tokens <= 0:
+            return
+        self.counter(f"{METRIC_PREFIX}_generated_tokens_total", "Tokens generados").inc(tokens)
+        request = getattr(self.local, "request", None)
+        if request is not None:
+            request.tokens += tokens
+        if not seconds or seconds <= 0:
+            return
+        rate = tokens / seconds
+        self.histogram(f"{METRIC_PREFIX}_tokens_per_second", "Velocidad de generación").observe(rate)
+        self.gauge(f"{METRIC_PREFIX}_last_tokens_per_second", "Velocidad de la última generación").set(rate)
+        if request is not None:
+            request.tokens_per_second = rate
+
+    def record_cache(self, hit: bool):
+        """Cuenta un acierto o fallo de la caché de respuestas"""
+        if not self.enabled:
+            return
+        self.counter(f"{METRIC_PREFIX}_cache_lookups_total", "Búsquedas en la caché de respuestas",
+                     result="hit" if hit else "miss").inc()
+
+    @contextmanager
+    def _timed_request(self, kind: str):
+        previous = getattr(self.local, "request", None)
+        request = RequestBreakdown(kind)
+        self.local.request = request
+        try:
+            yield request
+        finally:
+            self.local.request = previous
+            self.histogram(f"{METRIC_PREFIX}_request_seconds", "Duración total de cada petición",
+                           kind=kind).observe(request.elapsed())
+            self.counter(f"{METRIC_PREFIX}_requests_total", "Peticiones atendidas", kind=kind).inc()
+            if self.log_breakdown:
+                logger.info(f"⏱️ {request.summary()}")
+
+    def request(self, kind: str):
+        """Context manager que agrupa las etapas de una petición y registra su desglose"""
+        if not self.enabled:
+            return nullcontext()
+        return self._timed_request(kind)
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Copia de todas las métricas como diccionario serializable"""
+        with self.lock:
+            families = {name: (kind, help_text, dict(series))
+                        for name, (kind, help_text, series) in self.families.items()}
+
+        result = {}
+        for name, (kind, help_text, series) in sorted(families.items()):
+            result[name] = {
+                "type": kind,
+                "help": help_text,
+                "series": [dict(metric.snapshot(), labels=dict(key)) for key, metric in series.items()]
+            }
+        return result
+
+    def to_json(self) -> str:
+        return json.dumps({"timestamp": time.time(), "metrics": self.snapshot()}, indent=2, ensure_ascii=False)
+
+    def to_prometheus(self) -> str:
+        """Métricas en el formato de texto de Prometheus (para node_exporter textfile o similar)"""
+        lines = []
+        for name, family in self.snapshot().items():
+            if family["help"]:
+                lines.append(f"# HELP {name} {family['help']}")
+            lines.append(f"# TYPE {name} {family['type']}")
+            for series in family["series"]:
+                labels = series["labels"]
+                if family["type"] == "summary":
+                    for q in QUANTILES:
+                        value = series[f"p{round(q * 100)}"]
+                        if value is not None:
+                            lines.append(f"{name}{_format_labels(labels, quantile=q)} {_format_value(value)}")
+                    lines.append(f"{name}_sum{_format_labels(labels)} {_format_value(series['sum'])}")
+                    lines.append(f"{name}_count{_format_labels(labels)} {series['count']}")
+                else:
+                    lines.append(f"{name}{_format_labels(labels)} {_format_value(series['value'])}")
+        return "\n".join(lines) + "\n"
+
+    def export(self, path: str) -> Optional[Path]:
+        """
+        Escribe las métricas en path (JSON si termina en .json, texto de Prometheus si no)
+
+        El archivo se reemplaza de forma atómica, así un lector nunca ve una escritura a medias.
+        """
+        if not self.enabled:
+            return None
+
+        try:
+            path = Path(path)
+            content = self.to_json() if path.suffix == ".json" else self.to_prometheus()
+            path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = path.with_suffix(path.suffix + ".tmp")
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                f.write(content)
+            os.replace(tmp_path, path)
+
+            logger.info(f"Métricas exportadas en {path}")
+            return path
+
+        except Exception as e:
+            logger.error(f"Error exportando métricas: {e}")
+            return None
+
+
+def _format_labels(labels: Dict[str, str], **extra) -> str:
+    items = list(labels.items()) + [(k, str(v)) for k, v in extra.items()]
+    if not items:
+        return ""
+    escaped = (k + '="' + v.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") + '"'
+               for k, v in items)
+    return "{" + ",".join(escaped) + "}"
+
+
+def _format_value(value: float) -> str:
+    return repr(float(value))
+
+
+# Instancia global del registro de métricas
+_metrics = None
+
+
+def get_metrics(config_manager=None) -> MetricsRegistry:
+    """Obtiene el registro global de métricas"""
+    global _metrics
+    if _metrics is None:
+        if config_manager is not None:
+            _metrics = MetricsRegistry(
+                enabled=config_manager.get("metrics.enabled", True),
+                log_breakdown=config_manager.get("metrics.log_breakdown", True)
+            )
+        else:
+            _metrics = MetricsRegistry()
+    return _metrics
+
+
+def shutdown_metrics(config_manager=None):
+    """Exporta las métricas al archivo configurado y libera el registro global"""
+    global _metrics
+    if _metrics:
+        path = config_manager.get("metrics.export_path", "logs/metrics.prom") if config_manager else "logs/metrics.prom"
+        if path:
+            _metrics.export(path)
+        _metrics = None
@@ -0,0 +1,415 @@
+"""
+Descarga de modelos grandes por rangos HTTP en paralelo, reanudable y verificada.
+
+El archivo se descarga en <destino>.part con N conexiones (cabecera Range), cada
+una sobre su tramo. El avance de cada tramo se guarda en <destino>.part.json
+(como mucho una vez por segundo, después de fsync), así una descarga
+interrumpida continúa donde se quedó. El SHA-256 se calcula mientras llegan los
+datos, sobre el prefijo contiguo ya descargado, y al terminar el .part se
+renombra de forma atómica al destino: un archivo con el nombre final siempre
+está completo.
+
+Si el servidor no admite rangos, se descarga con una sola conexión desde el principio.
+
+Usa urllib, como inference_client: cada tramo es una petición con su propia
+conexión y no hace falta la sesión de requests.
+"""
+import os
+import json
+import time
+import hashlib
+import logging
+import threading
+import http.client
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, List, NamedTuple, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SEGMENTS = 4
+# Tramos más pequeños no compensan la conexión extra
+MIN_SEGMENT_BYTES = 8 * 1024 * 1024
+CHUNK_SIZE = 1024 * 1024
+# Como mucho un aviso de progreso cada PROGRESS_INTERVAL segundos (~10/s)
+PROGRESS_INTERVAL = 0.1
+# Frecuencia con la que se guarda el manifiesto de reanudación
+CHECKPOINT_INTERVAL = 1.0
+MANIFEST_VERSION = 1
+
+
+class DownloadError(Exception):
+    """La descarga no se pudo completar"""
+
+
+class DownloadCancelled(DownloadError):
+    """La descarga se canceló (el .part y su manifiesto se conservan para reanudarla)"""
+
+
+class DownloadProgress(NamedTuple):
+    downloaded: int
+    # 0 si el servidor no indica el tamaño
+    total: int
+    bytes_per_second: float
+    # True si esta sesión continúa una descarga anterior
+    resumed: bool
+
+    @property
+    def percent(self) -> float:
+        return 100.0 * self.downloaded / self.total if self.total else 0.0
+
+
+class DownloadResult(NamedTuple):
+    path: str
+    size: int
+    sha256: str
+
+
+class _Segment:
+    """Tramo [start, end) del archivo; position es el siguiente byte por descargar"""
+
+    __slots__ = ('start', 'end', 'position')
+
+    def __init__(self, start: int, end: Optional[int], position: int):
+        self.start = start
+        # None: tamaño desconocido, se descarga hasta que el servidor cierre
+        self.end = end
+        self.position = position
+
+    @property
+    def done(self) -> bool:
+        return self.end is not None and self.position >= self.end
+
+
+class ModelDownloader:
+    """
+    Descarga un archivo en paralelo por rangos, con reanudación y SHA-256
+
+    Uso:
+        downloader = ModelDownloader(url, "ia/modelo.gguf", on_progress=callback)
+        result = downloader.download()   # bloquea; cancel() desde otro hilo
+
+    on_progress se llama desde los hilos de descarga como mucho cada
+    PROGRESS_INTERVAL segundos (y una vez al terminar).
+    """
+
+    def __init__(self, url: str, destination: str, segments: int = DEFAULT_SEGMENTS,
+                 expected_sha256: Optional[str] = None,
+                 on_progress: Optional[Callable[[DownloadProgress], None]] = None,
+                 timeout: float = 30.0, retries: int = 3):
+        self.url = url
+        self.destination = destination
+        self.part_path = destination + ".part"
+        self.manifest_path = destination + ".part.json"
+        self.max_segments = max(1, segments)
+        self.expected_sha256 = expected_sha256.lower() if expected_sha256 else None
+        self.on_progress = on_progress
+        self.timeout = timeout
+        self.retries = retries
+
+        self.lock = threading.Condition()
+        self.manifest_lock = threading.Lock()
+        self.segments: List[_Segment] = []
+        self.total = 0
+        self.validator = None
+        self.ranges = False
+        self.resumed = False
+
+        self.cancelled = False
+        # Para a todos los hilos (cancelación o error en uno de ellos)
+        self.stop_event = threading.Event()
+        self.finished = False
+
+        self.session_start = 0.0
+        self.session_bytes = 0
+        self.last_progress = 0.0
+        self.last_checkpoint = 0.0
+
+    def cancel(self):
+        """Detiene la descarga; se puede reanudar creando otro ModelDownloader con el mismo destino"""
+        self.cancelled = True
+        self.stop_event.set()
+        with self.lock:
+            self.lock.notify_all()
+
+    # ------------------------------------------------------------------
+
+    def _open(self, headers: Optional[dict] = None):
+        request = urllib.request.Request(self.url, headers=dict(headers or {}, **{"User-Agent": "MathVTuber"}))
+        return urllib.request.urlopen(request, timeout=self.timeout)
+
+    def _probe(self) -> Tuple[int, bool, Optional[str]]:
+        """
+        Pide el primer byte para saber el tamaño y si el servidor admite rangos
+
+        Returns:
+            Tuple[int, bool, str]: (tamaño o 0, admite rangos, ETag/Last-Modified)
+        """
+        with self._open({"Range": "bytes=0-0"}) as response:
+            validator = response.headers.get("ETag") or response.headers.get("Last-Modified")
+            content_range = response.headers.get("Content-Range", "")
+            if response.status == 206 and "/" in content_range:
+                total = content_range.rsplit("/", 1)[1].strip()
+                if total.isdigit():
+                    return int(total), True, validator
+            # 200: el servidor ignora Range y envía el archivo entero
+            return int(response.headers.get("Content-Length") or 0), False, validator
+
+    def _plan(self, total: int, ranges: bool) -> List[_Segment]:
+        if not ranges or not total:
+            return [_Segment(0, total or None, 0)]
+        count = max(1, min(self.max_segments, total // MIN_SEGMENT_BYTES))
+        size = -(-total // count)
+        return [_Segment(start, min(start + size, total), start) for start in range(0, total, size)]
+
+    def _load_manifest(self, total: int, validator: Optional[str]) -> Optional[List[_Segment]]:
+        """Tramos guardados de una descarga anterior del mismo archivo, None si no sirven"""
+        try:
+            if not (os.path.exists(self.manifest_path) and os.path.exists(self.part_path)):
+                return None
+            with open(self.manifest_path, 'r', encoding='utf-8') as f:
+                manifest = json.load(f)
+            if (manifest.get("version") != MANIFEST_VERSION or manifest.get("url") != self.url
+                    or manifest.get("total") != total or manifest.get("validator") != validator
+                    or os.path.getsize(self.part_path) != total):
+                logger.info("El archivo remoto cambió o el manifiesto no coincide: la descarga empieza de nuevo")
+                return None
+            return [_Segment(start, end, position) for start, end, position in manifest["segments"]]
+        except Exception as e:
+            logger.error(f"Error leyendo manifiesto de descarga: {e}")
+            return None
+
+    def _save_manifest(self):
+        with self.lock:
+            manifest = {
+                "version": MANIFEST_VERSION,
+                "url": self.url,
+                "total": self.total,
+                "validator": self.validator,
+                "segments": [[s.start, s.end, s.position] for s in self.segments],
+            }
+        tmp_path = self.manifest_path + ".tmp"
+        with self.manifest_lock:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(manifest, f)
+            os.replace(tmp_path, self.manifest_path)
+
+    def _checkpoint(self, f, force: bool = False):
+        """fsync de los datos y después el manifiesto: nunca apunta más allá de lo escrito en disco"""
+        if not self.ranges:
+            return
+        now = time.monotonic()
+        with self.lock:
+            if not force and now - self.last_checkpoint < CHECKPOINT_INTERVAL:
+                return
+            self.last_checkpoint = now
+        os.fsync(f.fileno())
+        self._save_manifest()
+
+    def _emit_progress(self, force: bool = False):
+        if self.on_progress is None:
+            return
+        now = time.monotonic()
+        with self.lock:
+            if not force and now - self.last_progress < PROGRESS_INTERVAL:
+                return
+            self.last_progress = now
+            downloaded = sum(s.position - s.start for s in self.segments)
+            elapsed = max(now - self.session_start, 1e-6)
+            progress = DownloadProgress(downloaded, self.total, self.session_bytes / elapsed, self.resumed)
+        try:
+            self.on_progress(progress)
+        except Exception as e:
+            logger.error(f"Error en aviso de progreso de descarga: {e}")
+
+    # ------------------------------------------------------------------
+
+    def _run_segment(self, segment: _Segment):
+        """Descarga un tramo, reintentando desde donde se quedó si la conexión falla"""
+        attempt = 0
+        while not segment.done:
+            if self.stop_event.is_set():
+                raise DownloadCancelled("Descarga cancelada")
+            try:
+                headers = {"Range": f"bytes={segment.position}-{segment.end - 1}"} if self.ranges else {}
+                with self._open(headers) as response:
+                    if self.ranges and response.status != 206:
+                        raise DownloadError(f"El servidor no respetó el rango (HTTP {response.status})")
+                    # Sin buffer: lo que se anuncia en position ya está en el archivo para el hilo del hash
+                    with open(self.part_path, 'r+b', buffering=0) as f:
+                        f.seek(segment.position)
+                        self._copy(response, f, segment)
+                        self._checkpoint(f, force=True)
+
+                if segment.end is None:
+                    # Tamaño desconocido: la respuesta completa es el archivo
+                    with self.lock:
+                        segment.end = segment.position
+                    return
+                if not segment.done:
+                    raise DownloadError("La conexión se cerró antes de terminar el tramo")
+
+            except DownloadCancelled:
+                raise
+            except (OSError, http.client.HTTPException, DownloadError) as e:
+                if isinstance(e, urllib.error.HTTPError) and e.code in (403, 404, 410):
+                    raise DownloadError(f"El servidor rechazó la descarga: HTTP {e.code}")
+                attempt += 1
+                if attempt > self.retries:
+                    raise DownloadError(f"Error descargando tramo {segment.start}: {e}")
+                # Sin rangos no se puede continuar: se vuelve a empezar (el hash sigue siendo válido,
+                # los bytes que se reescriben son los mismos)
+                if not self.ranges:
+                    with self.lock:
+                        self.session_bytes -= segment.position
+                        segment.position = 0
+                delay = min(2 ** attempt, 10)
+                logger.warning(f"Reintentando tramo {segment.start} en {delay}s ({attempt}/{self.retries}): {e}")
+                if self.stop_event.wait(delay):
+                    raise DownloadCancelled("Descarga cancelada")
+
+    def _copy(self, response, f, segment: _Segment):
+        while True:
+            if self.stop_event.is_set():
+                raise DownloadCancelled("Descarga cancelada")
+            size = CHUNK_SIZE if segment.end is None else min(CHUNK_SIZE, segment.end - segment.position)
+            if size <= 0:
+                return
+            chunk = response.read(size)
+            if not chunk:
+                return
+            view = memoryview(chunk)
+            while view:
+                written = f.write(view)
+                view = view[written:]
+
+            with self.lock:
+                segment.position += len(chunk)
+                self.session_bytes += len(chunk)
+                self.lock.notify_all()
+            self._checkpoint(f)
+            self._emit_progress()
+
+    def _contiguous_end(self) -> int:
+        """Fin del prefijo del archivo ya descargado sin huecos (llamar con el lock tomado)"""
+        end = 0
+        for segment in self.segments:
+            if segment.start > end:
+                break
+            end = segment.position
+            if not segment.done:
+                break
+        return end
+
+    def _hash_stream(self) -> Optional[str]:
+        """
+        SHA-256 del archivo a medida que el prefijo contiguo crece
+
+        Lee lo recién escrito del propio .part (normalmente desde la caché de
+        páginas). Al reanudar, primero recorre lo que ya había en disco.
+        """
+        hasher = hashlib.sha256()
+        hashed = 0
+        # Sin buffer: un buffer de lectura anticipada guardaría ceros de zonas aún sin escribir
+        with open(self.part_path, 'rb', buffering=0) as f:
+            while True:
+                with self.lock:
+                    while True:
+                        available = self._contiguous_end()
+                        if available > hashed or self.stop_event.is_set() or self.finished:
+                            break
+                        self.lock.wait(0.5)
+                    if self.stop_event.is_set():
+                        return None
+                    if available == hashed and self.finished:
+                        return hasher.hexdigest()
+
+                f.seek(hashed)
+                while hashed < available:
+                    data = f.read(min(CHUNK_SIZE, available - hashed))
+                    if not data:
+                        raise DownloadError("El archivo parcial es más corto de lo esperado")
+                    hasher.update(data)
+                    hashed += len(data)
+
+    # ------------------------------------------------------------------
+
+    def download(self) -> DownloadResult:
+        """
+        Descarga (o continúa) el archivo y lo deja en destination
+
+        Raises:
+            DownloadCancelled: Si se llamó a cancel() (se puede reanudar)
+            DownloadError: Si falla la red, el servidor o la verificación SHA-256
+        """
+        try:
+            self.total, self.ranges, self.validator = self._probe()
+        except (OSError, http.client.HTTPException) as e:
+            raise DownloadError(f"No se pudo conectar con {self.url}: {e}")
+
+        segments = self._load_manifest(self.total, self.validator) if self.ranges else None
+        self.resumed = segments is not None
+        if segments is None:
+            segments = self._plan(self.total, self.ranges)
+            os.makedirs(os.path.dirname(os.path.abspath(self.destination)), exist_ok=True)
+            with open(self.part_path, 'wb') as f:
+                # Reservar el tamaño final: cada tramo escribe en su posición
+                f.truncate(self.total if self.ranges else 0)
+        self.segments = segments
+        if self.ranges:
+            self._save_manifest()
+
+        already = sum(s.position - s.start for s in segments)
+        if self.resumed:
+            logger.info(f"Reanudando descarga: {already / 2**20:.0f} de {self.total / 2**20:.0f} MB ya descargados")
+        logger.info(f"Descargando {self.url} con {len(segments)} conexión(es)")
+
+        self.session_start = time.monotonic()
+        pending = [s for s in segments if not s.done]
+        with ThreadPoolExecutor(max_workers=len(pending) + 1, thread_name_prefix="download") as executor:
+            hash_future = executor.submit(self._hash_stream)
+            futures = [executor.submit(self._run_segment, segment) for segment in pending]
+            try:
+                for future in futures:
+                    future.result()
+            except BaseException:
+                self.stop_event.set()
+                with self.lock:
+                    self.lock.notify_all()
+                raise
+            finally:
+                if self.ranges and not self.finished:
+                    try:
+                        self._save_manifest()
+                    except OSError as e:
+                        logger.error(f"Error guardando manifiesto de descarga: {e}")
+
+            with self.lock:
+                self.finished = True
+                self.lock.notify_all()
+            digest = hash_future.result()
+
+        self._emit_progress(force=True)
+        size = os.path.getsize(self.part_path)
+
+        if self.expected_sha256 and digest != self.expected_sha256:
+            self._discard()
+            raise DownloadError(f"SHA-256 no coincide: se esperaba {self.expected_sha256}, se obtuvo {digest}")
+
+        with open(self.part_path, 'rb+') as f:
+            os.fsync(f.fileno())
+        os.replace(self.part_path, self.destination)
+        if os.path.exists(self.manifest_path):
+            os.remove(self.manifest_path)
+
+        logger.info(f"Descarga completada: {self.destination} ({size / 2**20:.0f} MB, SHA-256 {digest[:16]}...)")
+        return DownloadResult(self.destination, size, digest)
+
+    def _discard(self):
+        for path in (self.part_path, self.manifest_path):
+            try:
+                if os.path.exists(path):
+                    os.remove(path)
+            except OSError as e:
+                logger.error(f"Error borrando {path}: {e}")
@@ -0,0 +1,172 @@
+import gc
+import os
+import time
+import logging
+import threading
+from typing import Any, Callable, NamedTuple, Optional
+
+from model_registry import available_memory
+
+logger = logging.getLogger(__name__)
+
+PAGE_IN_CHUNK = 8 * 1024 * 1024
+# Como mucho un aviso de progreso cada PROGRESS_INTERVAL segundos
+PROGRESS_INTERVAL = 0.5
+
+PHASE_READING = "reading"
+PHASE_INITIALIZING = "initializing"
+PHASE_DONE = "done"
+
+
+class LoadCancelled(Exception):
+    """La carga se canceló (por timeout o porque otra carga la sustituyó)"""
+
+
+class LoadProgress(NamedTuple):
+    phase: str
+    loaded_bytes: int
+    total_bytes: int
+    elapsed: float
+
+    @property
+    def percent(self) -> float:
+        return 100.0 * self.loaded_bytes / self.total_bytes if self.total_bytes else 0.0
+
+
+def release_model(instance: Any):
+    """Libera un modelo ya creado (unload() si lo tiene) y devuelve la memoria"""
+    try:
+        unload = getattr(instance, "unload", None)
+        if callable(unload):
+            unload()
+    except Exception as e:
+        logger.error(f"Error liberando modelo: {e}")
+    gc.collect()
+
+
+class ModelLoader:
+    """
+    Carga un modelo en segundo plano con progreso real y cancelación cooperativa
+
+    La carga tiene dos fases:
+    - reading: lee el archivo por bloques para traerlo a la caché de páginas del
+      sistema. Informa bytes leídos y se cancela entre bloques. Como los
+      cargadores usan mmap, después solo mapean páginas que ya están en memoria.
+    - initializing: llama a factory() (crear MathVTuber). No se puede
+      interrumpir; si se cancela mientras tanto, el resultado se libera con
+      release_model() en cuanto termina, en lugar de quedarse ocupando memoria.
+
+    La lectura previa se omite si el archivo no cabe en la memoria disponible
+    (solo desalojaría sus propias páginas).
+    """
+
+    def __init__(self, model_path: str, factory: Callable[[], Any],
+                 on_progress: Optional[Callable[[LoadProgress], None]] = None,
+                 page_in: bool = True):
+        self.model_path = model_path
+        self.factory = factory
+        self.on_progress = on_progress
+        self.page_in = page_in
+        self.total_bytes = os.path.getsize(model_path)
+
+        self.cancel_event = threading.Event()
+        self.done_event = threading.Event()
+        self.result = None
+        self.error: Optional[BaseException] = None
+        self.start_time = 0.0
+        self.last_progress = 0.0
+        self.thread = None
+
+    def start(self) -> "ModelLoader":
+        self.start_time = time.monotonic()
+        self.thread = threading.Thread(target=self._run, name="model-loader", daemon=True)
+        self.thread.start()
+        return self
+
+    def cancel(self):
+        """Pide detener la carga; la memoria se libera al terminar la fase en curso"""
+        if not self.done_event.is_set():
+            logger.info(f"Cancelando carga del modelo: {self.model_path}")
+        self.cancel_event.set()
+
+    @property
+    def cancelled(self) -> bool:
+        return self.cancel_event.is_set()
+
+    def wait(self, timeout: Optional[float] = None) -> Any:
+        """
+        Espera el modelo cargado
+
+        Raises:
+            TimeoutError: Si no terminó en timeout segundos (la carga sigue; usar cancel())
+            LoadCancelled: Si la carga se canceló
+        """
+        if not self.done_event.wait(timeout):
+            raise TimeoutError(f"La carga del modelo no terminó en {timeout} segundos")
+        if self.error is not None:
+            raise self.error
+        return self.result
+
+    def _emit(self, phase: str, loaded_bytes: int, force: bool = False):
+        if self.on_progress is None:
+            return
+        now = time.monotonic()
+        if not force and now - self.last_progress < PROGRESS_INTERVAL:
+            return
+        self.last_progress = now
+        try:
+            self.on_progress(LoadProgress(phase, loaded_bytes, self.total_bytes, now - self.start_time))
+        except Exception as e:
+            logger.error(f"Error en aviso de progreso de carga: {e}")
+
+    def _should_page_in(self) -> bool:
+        if not self.page_in:
+            return False
+        memory = available_memory()
+        if memory is not None and self.total_bytes > memory:
+            logger.info(f"Lectura previa omitida: el modelo ({self.total_bytes / 2**20:.0f} MB) "
+                        f"no cabe en la memoria disponible ({memory / 2**20:.0f} MB)")
+            return False
+        return True
+
+    def _read_into_page_cache(self):
+        buffer = bytearray(PAGE_IN_CHUNK)
+        loaded = 0
+        with open(self.model_path, 'rb', buffering=0) as f:
+            if hasattr(os, "posix_fadvise"):
+                os.posix_fadvise(f.fileno(), 0, 0, os.POSIX_FADV_SEQUENTIAL)
+            while True:
+                if self.cancel_event.is_set():
+                    raise LoadCancelled("Carga del modelo cancelada")
+                read = f.readinto(buffer)
+                if not read:
+                    break
+                loaded += read
+                self._emit(PHASE_READING, loaded)
+        self._emit(PHASE_READING, loaded, force=True)
+        logger.info(f"Modelo leído a memoria en {time.monotonic() - self.start_time:.1f}s "
+                    f"({loaded / 2**20:.0f} MB)")
+
+    def _run(self):
+        try:
+            if self._should_page_in():
+                self._read_into_page_cache()
+            if self.cancel_event.is_set():
+                raise LoadCancelled("Carga del modelo cancelada")
+
+            self._emit(PHASE_INITIALIZING, self.total_bytes, force=True)
+            instance = self.factory()
+            if self.cancel_event.is_set():
+                release_model(instance)
+                logger.info("Carga cancelada: modelo liberado al terminar la inicialización")
+                raise LoadCancelled("Carga del modelo cancelada")
+
+            self.result = instance
+            self._emit(PHASE_DONE, self.total_bytes, force=True)
+
+        except BaseException as e:
+            self.error = e
+            if not isinstance(e, LoadCancelled):
+                logger.error(f"Error en carga del modelo: {e}")
+        finally:
+            self.done_event.set()
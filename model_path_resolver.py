@@ -0,0 +1,161 @@
+import os
+import re
+import logging
+import tempfile
+import threading
+from typing import Dict, Iterable, Optional
+
+from file_hashing import file_fingerprint
+
+logger = logging.getLogger(__name__)
+
+# Caracteres que todos los cargadores aceptan en una ruta (ctransformers rechaza espacios);
+# '~' aparece en los nombres cortos 8.3 de Windows (PROGRA~1)
+_SAFE_PATH_RE = re.compile(r'^[A-Za-z0-9_\-./:~]+$')
+
+# Descriptores abiertos para las rutas /proc/self/fd/N (deben vivir lo que el proceso)
+_open_descriptors: Dict[str, int] = {}
+_descriptors_lock = threading.Lock()
+
+
+def is_safe_path(path: str) -> bool:
+    """True si la ruta solo tiene letras, números, '_', '-', '.', ':', '~' y '/'"""
+    return bool(_SAFE_PATH_RE.match(path))
+
+
+def _safe_filename(filename: str) -> str:
+    return ''.join(c if (c.isalnum() and c.isascii()) or c in '-_.' else '_' for c in filename)
+
+
+def _same_content(alias: str, source: str) -> bool:
+    """El alias apunta al mismo archivo o es una copia idéntica (tamaño + huella de inicio y final)"""
+    try:
+        if os.path.samefile(alias, source):
+            return True
+        return (os.path.getsize(alias) == os.path.getsize(source)
+                and file_fingerprint(alias) == file_fingerprint(source))
+    except OSError:
+        return False
+
+
+def _windows_short_path(path: str) -> Optional[str]:
+    """Nombre corto 8.3 de Windows (sin espacios), None si el volumen no los genera"""
+    try:
+        import ctypes
+        buffer = ctypes.create_unicode_buffer(1024)
+        if ctypes.windll.kernel32.GetShortPathNameW(path, buffer, len(buffer)):
+            return buffer.value.replace('\\', '/')
+    except Exception as e:
+        logger.debug(f"GetShortPathNameW no disponible: {e}")
+    return None
+
+
+def _link(source: str, alias: str) -> Optional[str]:
+    """Enlace duro (mismo volumen) o simbólico en alias; devuelve el tipo creado"""
+    try:
+        os.link(source, alias)
+        return "enlace duro"
+    except OSError:
+        pass
+    try:
+        # En Windows requiere modo desarrollador o permisos de administrador
+        os.symlink(source, alias)
+        return "enlace simbólico"
+    except (OSError, NotImplementedError):
+        return None
+
+
+def _replace_copy_with_link(source: str, alias: str):
+    """Sustituye una copia idéntica (de versiones anteriores) por un enlace para liberar el espacio"""
+    tmp_alias = alias + ".link"
+    try:
+        if os.path.lexists(tmp_alias):
+            os.remove(tmp_alias)
+        kind = _link(source, tmp_alias)
+        if kind:
+            size_mb = os.path.getsize(alias) / (1024 * 1024)
+            os.replace(tmp_alias, alias)
+            logger.info(f"Copia del modelo sustituida por {kind} ({size_mb:.0f} MB liberados): {alias}")
+    except OSError as e:
+        logger.warning(f"No se pudo sustituir la copia del modelo por un enlace: {e}")
+
+
+def _descriptor_path(source: str) -> Optional[str]:
+    """Ruta /proc/self/fd/N de un descriptor abierto sobre el archivo (solo Linux)"""
+    if not os.path.isdir("/proc/self/fd"):
+        return None
+    with _descriptors_lock:
+        fd = _open_descriptors.get(source)
+        if fd is None:
+            try:
+                fd = os.open(source, os.O_RDONLY)
+            except OSError:
+                return None
+            _open_descriptors[source] = fd
+    return f"/proc/self/fd/{fd}"
+
+
+def _default_link_dirs() -> Iterable[str]:
+    yield os.path.join(os.path.dirname(os.path.abspath(__file__)), "temp_models")
+    yield os.path.join(tempfile.gettempdir(), "mathvtuber_models")
+
+
+def resolve_model_path(path: str, link_dirs: Optional[Iterable[str]] = None) -> str:
+    """
+    Ruta sin espacios ni caracteres especiales para el mismo modelo, sin copiarlo
+
+    Por orden: la propia ruta si ya es segura (con '/' como separador), el nombre
+    corto 8.3 en Windows, un alias en temp_models/ (enlace duro o simbólico) y
+    /proc/self/fd/N en Linux. Un alias que ya exista solo se reutiliza si es el
+    mismo archivo o tiene el mismo tamaño y huella (ver file_fingerprint); si no,
+    se sustituye. Si nada funciona se devuelve la ruta original.
+
+    Args:
+        path: Ruta del modelo (puede tener espacios, tildes o barras invertidas)
+        link_dirs: Carpetas donde crear el alias (por defecto, temp_models/ y la temporal del sistema)
+    """
+    source = os.path.abspath(path)
+    normalized = source.replace('\\', '/')
+    if is_safe_path(normalized):
+        return normalized
+
+    if os.name == 'nt':
+        short_path = _windows_short_path(source)
+        if short_path and is_safe_path(short_path):
+            logger.info(f"Usando nombre corto del modelo: {short_path}")
+            return short_path
+
+    alias_name = _safe_filename(os.path.basename(source))
+    for link_dir in (link_dirs if link_dirs is not None else _default_link_dirs()):
+        link_dir = os.path.abspath(link_dir)
+        alias = os.path.join(link_dir, alias_name)
+        if not is_safe_path(alias.replace('\\', '/')):
+            continue
+
+        try:
+            if os.path.lexists(alias):
+                if _same_content(alias, source):
+                    if not os.path.samefile(alias, source):
+                        _replace_copy_with_link(source, alias)
+                    logger.info(f"Usando alias existente del modelo: {alias}")
+                    return alias.replace('\\', '/')
+                # Copia o enlace de otro modelo (o de una versión anterior): nunca se reutiliza
+                logger.info(f"Alias obsoleto, se reemplaza: {alias}")
+                os.remove(alias)
+
+            os.makedirs(link_dir, exist_ok=True)
+            kind = _link(source, alias)
+            if kind:
+                logger.info(f"Modelo accesible sin copiarlo ({kind}): {alias}")
+                return alias.replace('\\', '/')
+
+        except OSError as e:
+            logger.warning(f"No se pudo crear alias del modelo en {link_dir}: {e}")
+
+    descriptor_path = _descriptor_path(source)
+    if descriptor_path:
+        logger.info(f"Modelo abierto por descriptor: {descriptor_path}")
+        return descriptor_path
+
+    logger.warning(f"No se pudo obtener una ruta sin caracteres especiales para {source}")
+    return path
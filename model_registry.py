@@ -0,0 +1,423 @@
+import os
+import json
+import struct
+import logging
+import threading
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, NamedTuple, Optional
+
+logger = logging.getLogger(__name__)
+
+GGUF_MAGIC = b"GGUF"
+# Alineación por defecto de los datos de tensores (general.alignment la puede cambiar)
+GGUF_DEFAULT_ALIGNMENT = 32
+# Cambiar cuando cambie lo que se guarda de cada modelo: invalida el índice
+INDEX_VERSION = 1
+
+# Carpetas donde se buscan modelos si la configuración no indica ninguna
+DEFAULT_MODEL_DIRS = ("models", "ia", os.path.join("assets", "models"))
+
+# Tipos de valor de los metadatos GGUF con tamaño fijo: formato de struct
+_SCALAR_FORMATS = {
+    0: "<B", 1: "<b", 2: "<H", 3: "<h", 4: "<I", 5: "<i",
+    6: "<f", 7: "<?", 10: "<Q", 11: "<q", 12: "<d",
+}
+_TYPE_STRING = 8
+_TYPE_ARRAY = 9
+
+# Tipos de tensor de ggml: nombre, elementos por bloque, bytes por bloque
+GGML_TYPES = {
+    0: ("F32", 1, 4), 1: ("F16", 1, 2), 2: ("Q4_0", 32, 18), 3: ("Q4_1", 32, 20),
+    6: ("Q5_0", 32, 22), 7: ("Q5_1", 32, 24), 8: ("Q8_0", 32, 34), 9: ("Q8_1", 32, 36),
+    10: ("Q2_K", 256, 84), 11: ("Q3_K", 256, 110), 12: ("Q4_K", 256, 144), 13: ("Q5_K", 256, 176),
+    14: ("Q6_K", 256, 210), 15: ("Q8_K", 256, 292), 16: ("IQ2_XXS", 256, 66), 17: ("IQ2_XS", 256, 74),
+    18: ("IQ3_XXS", 256, 98), 19: ("IQ1_S", 256, 50), 20: ("IQ4_NL", 32, 18), 21: ("IQ3_S", 256, 110),
+    22: ("IQ2_S", 256, 82), 23: ("IQ4_XS", 256, 136), 24: ("I8", 1, 1), 25: ("I16", 1, 2),
+    26: ("I32", 1, 4), 27: ("I64", 1, 8), 28: ("F64", 1, 8), 29: ("IQ1_M", 256, 56), 30: ("BF16", 1, 2),
+}
+
+# general.file_type (tipo de cuantización declarado por el conversor)
+FILE_TYPES = {
+    0: "F32", 1: "F16", 2: "Q4_0", 3: "Q4_1", 7: "Q8_0", 8: "Q5_0", 9: "Q5_1",
+    10: "Q2_K", 11: "Q3_K_S", 12: "Q3_K_M", 13: "Q3_K_L", 14: "Q4_K_S", 15: "Q4_K_M",
+    16: "Q5_K_S", 17: "Q5_K_M", 18: "Q6_K", 19: "IQ2_XXS", 20: "IQ2_XS", 21: "Q2_K_S",
+    22: "IQ3_XS", 23: "IQ3_XXS", 24: "IQ1_S", 25: "IQ4_NL", 26: "IQ3_S", 27: "IQ3_M",
+    28: "IQ2_S", 29: "IQ2_M", 30: "IQ4_XS", 31: "IQ1_M", 32: "BF16",
+}
+
+# Memoria de trabajo de llama.cpp además de pesos y caché KV (buffers de cómputo, contexto)
+RUNTIME_OVERHEAD_BYTES = 512 * 1024 * 1024
+
+
+class GGUFError(Exception):
+    """El archivo no es un GGUF válido o está truncado"""
+
+
+class ModelInfo(NamedTuple):
+    """Metadatos de un modelo GGUF leídos de su cabecera"""
+    path: str
+    size: int
+    architecture: str
+    name: str
+    quantization: str
+    context_length: int
+    block_count: int
+    embedding_length: int
+    head_count: int
+    head_count_kv: int
+    parameters: int
+    tensor_bytes: int
+    # False si el archivo es más corto de lo que indican sus tensores (descarga a medias)
+    complete: bool
+
+    def memory_required(self, context_size: int) -> int:
+        """Memoria aproximada para cargarlo: pesos + caché KV en f16 para context_size tokens + margen"""
+        kv_bytes = 0
+        if self.block_count and self.embedding_length and self.head_count:
+            kv_width = self.embedding_length * (self.head_count_kv or self.head_count) // self.head_count
+            kv_bytes = 2 * 2 * context_size * self.block_count * kv_width
+        return self.tensor_bytes + kv_bytes + RUNTIME_OVERHEAD_BYTES
+
+
+class _Reader:
+    """Lectura secuencial de los campos de la cabecera GGUF (little endian)"""
+
+    def __init__(self, f, version: int):
+        self.f = f
+        # GGUF v1 usaba enteros de 32 bits para longitudes y contadores
+        self.count_format = "<I" if version == 1 else "<Q"
+
+    def unpack(self, fmt: str):
+        size = struct.calcsize(fmt)
+        data = self.f.read(size)
+        if len(data) != size:
+            raise GGUFError("Cabecera GGUF truncada")
+        return struct.unpack(fmt, data)[0]
+
+    def count(self) -> int:
+        return self.unpack(self.count_format)
+
+    def string(self) -> str:
+        length = self.count()
+        data = self.f.read(length)
+        if len(data) != length:
+            raise GGUFError("Cabecera GGUF truncada")
+        return data.decode('utf-8', errors='replace')
+
+    def skip_string(self):
+        self.f.seek(self.count(), os.SEEK_CUR)
+
+    def value(self, value_type: int, keep: bool = True) -> Any:
+        """Lee un valor; con keep=False los arrays se saltan sin decodificarlos"""
+        if value_type in _SCALAR_FORMATS:
+            return self.unpack(_SCALAR_FORMATS[value_type])
+        if value_type == _TYPE_STRING:
+            return self.string()
+        if value_type == _TYPE_ARRAY:
+            item_type = self.unpack("<I")
+            length = self.count()
+            if item_type in _SCALAR_FORMATS:
+                # Arrays numéricos (puntuaciones del tokenizador...): se saltan de una vez
+                self.f.seek(length * struct.calcsize(_SCALAR_FORMATS[item_type]), os.SEEK_CUR)
+            elif item_type == _TYPE_STRING:
+                # El vocabulario (decenas de miles de cadenas) no hace falta para elegir modelo
+                for _ in range(length):
+                    self.skip_string()
+            else:
+                for _ in range(length):
+                    self.value(item_type, keep=False)
+            return None
+        raise GGUFError(f"Tipo de metadato GGUF desconocido: {value_type}")
+
+
+def read_gguf_info(path: str) -> ModelInfo:
+    """
+    Lee los metadatos de un modelo GGUF sin cargar los pesos
+
+    Recorre la cabecera (metadatos y descripción de tensores) y calcula el tamaño
+    de los tensores a partir de sus dimensiones y tipos. Solo lee unos pocos MB
+    aunque el modelo ocupe varios GB.
+
+    Raises:
+        GGUFError: Si el archivo no es GGUF o la cabecera está incompleta
+    """
+    size = os.path.getsize(path)
+    with open(path, 'rb', buffering=1024 * 1024) as f:
+        if f.read(4) != GGUF_MAGIC:
+            raise GGUFError("No es un archivo GGUF")
+        version = struct.unpack("<I", f.read(4))[0]
+        if version not in (1, 2, 3):
+            raise GGUFError(f"Versión GGUF no soportada: {version}")
+
+        reader = _Reader(f, version)
+        tensor_count = reader.count()
+        kv_count = reader.count()
+
+        metadata: Dict[str, Any] = {}
+        for _ in range(kv_count):
+            key = reader.string()
+            value = reader.value(reader.unpack("<I"))
+            if value is not None:
+                metadata[key] = value
+
+        parameters = 0
+        tensor_bytes = 0
+        data_end = 0
+        type_elements: Dict[int, int] = {}
+        known_types = True
+        for _ in range(tensor_count):
+            reader.skip_string()
+            n_dims = reader.unpack("<I")
+            elements = 1
+            for _ in range(n_dims):
+                elements *= reader.count()
+            tensor_type = reader.unpack("<I")
+            offset = reader.unpack("<Q")
+
+            parameters += elements
+            type_elements[tensor_type] = type_elements.get(tensor_type, 0) + elements
+            if tensor_type in GGML_TYPES:
+                _name, block_size, type_size = GGML_TYPES[tensor_type]
+                nbytes = elements // block_size * type_size
+                tensor_bytes += nbytes
+                data_end = max(data_end, offset + nbytes)
+            else:
+                known_types = False
+
+        alignment = metadata.get("general.alignment", GGUF_DEFAULT_ALIGNMENT) or GGUF_DEFAULT_ALIGNMENT
+        data_start = -(-f.tell() // alignment) * alignment
+
+    if not known_types:
+        # Tipo de tensor nuevo: se asume que los datos ocupan el resto del archivo
+        tensor_bytes = max(0, size - data_start)
+        data_end = tensor_bytes
+
+    architecture = str(metadata.get("general.architecture", "desconocida"))
+    file_type = metadata.get("general.file_type")
+    if file_type in FILE_TYPES:
+        quantization = FILE_TYPES[file_type]
+    elif type_elements:
+        # Sin file_type: el tipo con más parámetros
+        dominant = max(type_elements, key=type_elements.get)
+        quantization = GGML_TYPES.get(dominant, (f"tipo {dominant}",))[0]
+    else:
+        quantization = "desconocida"
+
+    def arch_value(key: str) -> int:
+        value = metadata.get(f"{architecture}.{key}", 0)
+        return int(value) if isinstance(value, (int, float)) else 0
+
+    return ModelInfo(
+        path=os.path.abspath(path),
+        size=size,
+        architecture=architecture,
+        name=str(metadata.get("general.name", Path(path).stem)),
+        quantization=quantization,
+        context_length=arch_value("context_length"),
+        block_count=arch_value("block_count"),
+        embedding_length=arch_value("embedding_length"),
+        head_count=arch_value("attention.head_count"),
+        head_count_kv=arch_value("attention.head_count_kv"),
+        parameters=parameters,
+        tensor_bytes=tensor_bytes,
+        complete=size >= data_start + data_end
+    )
+
+
+def available_memory() -> Optional[int]:
+    """Memoria física disponible en bytes (None si no se puede saber)"""
+    try:
+        if os.name == 'nt':
+            import ctypes
+
+            class MemoryStatus(ctypes.Structure):
+                _fields_ = [("dwLength", ctypes.c_ulong), ("dwMemoryLoad", ctypes.c_ulong),
+                            ("ullTotalPhys", ctypes.c_ulonglong), ("ullAvailPhys", ctypes.c_ulonglong),
+                            ("ullTotalPageFile", ctypes.c_ulonglong), ("ullAvailPageFile", ctypes.c_ulonglong),
+                            ("ullTotalVirtual", ctypes.c_ulonglong), ("ullAvailVirtual", ctypes.c_ulonglong),
+                            ("ullAvailExtendedVirtual", ctypes.c_ulonglong)]
+
+            status = MemoryStatus()
+            status.dwLength = ctypes.sizeof(MemoryStatus)
+            if ctypes.windll.kernel32.GlobalMemoryStatusEx(ctypes.byref(status)):
+                return int(status.ullAvailPhys)
+            return None
+
+        if os.path.exists("/proc/meminfo"):
+            with open("/proc/meminfo", 'r') as f:
+                for line in f:
+                    if line.startswith("MemAvailable:"):
+                        return int(line.split()[1]) * 1024
+
+        # macOS y otros Unix: memoria total como aproximación
+        return os.sysconf('SC_PAGE_SIZE') * os.sysconf('SC_PHYS_PAGES')
+
+    except Exception as e:
+        logger.error(f"Error consultando memoria disponible: {e}")
+        return None
+
+
+def _format_parameters(parameters: int) -> str:
+    return f"{parameters / 1e9:.1f}B" if parameters >= 1e9 else f"{parameters / 1e6:.0f}M"
+
+
+class ModelRegistry:
+    """
+    Registro de modelos GGUF con sus metadatos en un índice persistente.
+
+    Las cabeceras solo se leen la primera vez que se ve un archivo: el índice
+    (JSON) guarda los metadatos por ruta junto con tamaño y mtime, y mientras
+    coincidan se reutilizan. Elegir modelo al arrancar cuesta un listado de
+    carpetas y un stat por archivo.
+    """
+
+    def __init__(self, index_path: str = "cache/model_index.json", context_size: int = 512):
+        self.index_path = Path(index_path)
+        self.context_size = context_size
+        self.lock = threading.Lock()
+        self.entries: Dict[str, Dict[str, Any]] = self._load_index()
+        self.dirty = False
+
+    def _load_index(self) -> Dict[str, Dict[str, Any]]:
+        try:
+            if self.index_path.exists():
+                with open(self.index_path, 'r', encoding='utf-8') as f:
+                    data = json.load(f)
+                if data.get("version") == INDEX_VERSION:
+                    return data.get("models", {})
+        except Exception as e:
+            logger.error(f"Error cargando índice de modelos: {e}")
+        return {}
+
+    def save(self):
+        """Guarda el índice si ha cambiado"""
+        with self.lock:
+            if not self.dirty:
+                return
+            data = {"version": INDEX_VERSION, "models": dict(self.entries)}
+            self.dirty = False
+        try:
+            self.index_path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = self.index_path.with_suffix(".tmp")
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(data, f, indent=2, ensure_ascii=False)
+            os.replace(tmp_path, self.index_path)
+        except Exception as e:
+            logger.error(f"Error guardando índice de modelos: {e}")
+
+    def info(self, path: str) -> Optional[ModelInfo]:
+        """Metadatos de un modelo (del índice si el archivo no ha cambiado), None si no es GGUF válido"""
+        path = os.path.abspath(path)
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return None
+
+        with self.lock:
+            entry = self.entries.get(path)
+        if entry and entry.get("size") == stat.st_size and entry.get("mtime_ns") == stat.st_mtime_ns:
+            return ModelInfo(**entry["info"]) if entry.get("info") else None
+
+        try:
+            info = read_gguf_info(path)
+            logger.info(f"Modelo indexado: {info.name} ({info.architecture}, {info.quantization}, "
+                        f"{_format_parameters(info.parameters)} parámetros)")
+        except (GGUFError, OSError, UnicodeDecodeError) as e:
+            logger.warning(f"No se pudo leer la cabecera de {os.path.basename(path)}: {e}")
+            info = None
+
+        with self.lock:
+            # Los archivos no válidos también se recuerdan para no volver a leerlos
+            self.entries[path] = {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns,
+                                  "info": info._asdict() if info else None}
+            self.dirty = True
+        return info
+
+    def scan(self, directories: Iterable[str]) -> List[ModelInfo]:
+        """Modelos GGUF válidos y completos en las carpetas indicadas (sin subcarpetas)"""
+        models = []
+        seen = set()
+        for directory in directories:
+            try:
+                names = os.listdir(directory)
+            except OSError:
+                continue
+            for name in names:
+                if not name.lower().endswith(".gguf"):
+                    continue
+                path = os.path.abspath(os.path.join(directory, name))
+                if path in seen:
+                    continue
+                seen.add(path)
+                info = self.info(path)
+                if info is None:
+                    continue
+                if not info.complete:
+                    logger.warning(f"Modelo incompleto (¿descarga a medias?): {name}")
+                    continue
+                models.append(info)
+        self.save()
+        return models
+
+    def best_model(self, directories: Iterable[str], memory_budget: Optional[int] = None) -> Optional[ModelInfo]:
+        """
+        Elige el modelo más capaz que cabe en memoria
+
+        Entre los que caben (pesos + caché KV para context_size + margen), el de más
+        parámetros y, a igualdad, el de cuantización más fina (más bytes). Si no cabe
+        ninguno, el que menos memoria necesita.
+        """
+        models = self.scan(directories)
+        if not models:
+            return None
+
+        budget = memory_budget if memory_budget is not None else available_memory()
+        fitting = [m for m in models if budget is None or m.memory_required(self.context_size) <= budget]
+        if fitting:
+            return max(fitting, key=lambda m: (m.parameters, m.tensor_bytes))
+
+        smallest = min(models, key=lambda m: m.memory_required(self.context_size))
+        logger.warning(f"Ningún modelo cabe en la memoria disponible ({budget / 2**30:.1f} GB); "
+                       f"se usa el más pequeño: {os.path.basename(smallest.path)}")
+        return smallest
+
+    def select(self, configured: str = "", directories: Iterable[str] = DEFAULT_MODEL_DIRS) -> str:
+        """
+        Ruta del modelo a cargar
+
+        Args:
+            configured: Archivo o carpeta de la configuración (paths.mistral_model)
+            directories: Carpetas donde buscar si no hay nada configurado
+
+        Returns:
+            str: Ruta del modelo o "" si no hay ninguno
+        """
+        if configured and os.path.isfile(configured):
+            return configured
+        if configured and os.path.isdir(configured):
+            directories = [configured]
+
+        best = self.best_model(directories)
+        if best is None:
+            return ""
+        logger.info(f"Modelo elegido: {os.path.basename(best.path)} ({best.quantization}, "
+                    f"~{best.memory_required(self.context_size) / 2**30:.1f} GB)")
+        return best.path
+
+
+# Instancia global del registro de modelos
+_model_registry = None
+
+
+def get_model_registry(config_manager=None) -> ModelRegistry:
+    """Obtiene el registro global de modelos"""
+    global _model_registry
+    if _model_registry is None:
+        if config_manager is not None:
+            _model_registry = ModelRegistry(
+                index_path=config_manager.get("paths.model_index", "cache/model_index.json"),
+                context_size=config_manager.get("ai.context_size", 512)
+            )
+        else:
+            _model_registry = ModelRegistry()
+    return _model_registry
@@ -3,28 +3,24 @@ import numpy as np
 import io
 import base64
 import logging
+from safe_expr import compile_expression
+from adaptive_sampling import sample_function
 
 logger = logging.getLogger(__name__)
 
-def create_plot(func_str, x_range=(-10, 10), num_points=1000):
+def create_plot(func_str, x_range=(-10, 10)):
     """Crea una gráfica de una función matemática"""
     try:
-        # Crear puntos x
-        x = np.linspace(x_range[0], x_range[1], num_points)
-        
-        # Evaluar la función
-        # Reemplazar funciones matemáticas comunes
-        func_str = func_str.replace('^', '**')
-        for func in ['sin', 'cos', 'tan', 'exp', 'log']:
-            func_str = func_str.replace(func, f'np.{func}')
-        
-        # Evaluar y
-        y = eval(func_str.replace('x', '(x)'))
+        # Evaluar la función (sin, cos, exp... se resuelven a ufuncs de numpy) con muestreo adaptativo
+        compiled = compile_expression(func_str, variables=('x',))
+        curve = sample_function(compiled.evaluate_on, x_range[0], x_range[1])
+        x, y = curve.x, curve.y
         
         # Crear figura
         plt.figure(figsize=(10, 6))
         plt.style.use('dark_background')
         plt.plot(x, y, color='#00a896', linewidth=2)
+        plt.ylim(*curve.y_limits)
         plt.grid(True, alpha=0.3)
         plt.title(f'y = {func_str}', color='white')
         plt.xlabel('x', color='white')
@@ -0,0 +1,45 @@
+import numpy as np
+from matplotlib.collections import EllipseCollection, LineCollection
+
+# Por encima de este número de elementos no se numera cada círculo (serían miles de textos)
+MAX_ELEMENT_LABELS = 20
+
+
+def add_circles(ax, centers, radius: float, colors, alpha: float = 0.7):
+    """
+    Dibuja todos los círculos con una sola EllipseCollection en lugar de un patch por círculo
+
+    Args:
+        centers: Array (n, 2) con los centros en coordenadas de datos
+        radius: Radio en unidades de datos
+        colors: Un color o un array de colores (uno por círculo)
+    """
+    centers = np.asarray(centers, dtype=float).reshape(-1, 2)
+    if len(centers) == 0:
+        return None
+
+    diameters = np.full(len(centers), 2 * radius)
+    collection = EllipseCollection(diameters, diameters, np.zeros(len(centers)), units='xy',
+                                   offsets=centers, offset_transform=ax.transData,
+                                   facecolors=colors, edgecolors='none', alpha=alpha)
+    ax.add_collection(collection)
+    return collection
+
+
+def add_crosses(ax, centers, size: float, color: str = 'red', linewidth: float = 3):
+    """Tacha cada centro con una X, todas en una sola LineCollection"""
+    centers = np.asarray(centers, dtype=float).reshape(-1, 2)
+    if len(centers) == 0:
+        return None
+
+    offsets = np.array([[[-size, -size], [size, size]],
+                        [[-size, size], [size, -size]]])
+    segments = (centers[:, None, None, :] + offsets[None, :, :, :]).reshape(-1, 2, 2)
+    collection = LineCollection(segments, colors=color, linewidths=linewidth)
+    ax.add_collection(collection)
+    return collection
+
+
+def label_step(count: int, max_labels: int = MAX_ELEMENT_LABELS) -> int:
+    """Cada cuántos elementos poner etiqueta para no superar max_labels"""
+    return max(1, int(np.ceil(count / max_labels)))
@@ -0,0 +1,141 @@
+import os
+import pickle
+import logging
+import threading
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from file_hashing import file_fingerprint, text_hash
+
+logger = logging.getLogger(__name__)
+
+
+class PromptPrefixCache:
+    """
+    Caché del estado KV de llama-cpp para el prefijo fijo del prompt (prompt del sistema).
+
+    El prefijo se evalúa una sola vez por idioma, se guarda con save_state() y se
+    restaura con load_state() antes de cada pregunta. Las instantáneas también se
+    escriben en disco, indexadas por huella del modelo + hash del prefijo, para que
+    un arranque en caliente no tenga que volver a evaluar el prompt del sistema.
+    """
+
+    def __init__(self, llama, model_path: str, cache_dir: str = "cache/prompt_states"):
+        self.llama = llama
+        self.cache_dir = Path(cache_dir)
+        self.lock = threading.Lock()
+
+        # hash del prefijo -> (tokens, estado)
+        self.states: Dict[str, Any] = {}
+
+        try:
+            self.model_key = file_fingerprint(model_path)[:16]
+        except OSError as e:
+            logger.warning(f"No se pudo calcular la huella del modelo: {e}")
+            self.model_key = None
+
+    def prepare(self, prefix: str) -> bool:
+        """
+        Deja el contexto del modelo con el prefijo ya evaluado.
+
+        Returns:
+            bool: True si se reutilizó un estado existente (memoria, contexto o disco)
+        """
+        with self.lock:
+            try:
+                tokens = self._tokenize(prefix)
+                prefix_hash = text_hash(prefix)
+
+                # El contexto actual ya empieza por el prefijo: llama-cpp reutiliza esos tokens
+                if self._context_has_prefix(tokens):
+                    return True
+
+                state = self.states.get(prefix_hash)
+                if state is None:
+                    state = self._load_from_disk(prefix_hash, tokens)
+
+                if state is not None:
+                    self.llama.load_state(state)
+                    self.states[prefix_hash] = state
+                    logger.debug("Estado del prompt del sistema restaurado")
+                    return True
+
+                # Evaluar el prefijo una vez y guardar la instantánea
+                self.llama.reset()
+                self.llama.eval(tokens)
+                state = self.llama.save_state()
+                self.states[prefix_hash] = state
+                self._save_to_disk(prefix_hash, tokens, state)
+                logger.info(f"Prompt del sistema evaluado y guardado ({len(tokens)} tokens)")
+                return False
+
+            except Exception as e:
+                logger.error(f"Error preparando caché del prompt del sistema: {e}")
+                return False
+
+    def clear(self):
+        """Descarta las instantáneas en memoria (las de disco se conservan)"""
+        with self.lock:
+            self.states.clear()
+
+    def _tokenize(self, prefix: str) -> List[int]:
+        """Tokeniza el prefijo igual que lo hace create_completion con el prompt completo"""
+        data = prefix.encode('utf-8')
+        try:
+            return self.llama.tokenize(data, add_bos=True, special=True)
+        except TypeError:
+            # Versiones antiguas de llama-cpp-python sin el parámetro special
+            return self.llama.tokenize(data)
+
+    def _context_has_prefix(self, tokens: List[int]) -> bool:
+        """Comprueba si los tokens evaluados en el contexto empiezan por el prefijo"""
+        n_tokens = getattr(self.llama, 'n_tokens', 0)
+        if n_tokens < len(tokens):
+            return False
+
+        evaluated = self.llama.input_ids[:len(tokens)]
+        return list(evaluated) == list(tokens)
+
+    def _state_path(self, prefix_hash: str) -> Optional[Path]:
+        """Ruta del archivo de estado para el modelo y prefijo actuales"""
+        if not self.model_key:
+            return None
+        n_ctx = self.llama.n_ctx() if callable(getattr(self.llama, 'n_ctx', None)) else 0
+        return self.cache_dir / f"{self.model_key}_{prefix_hash[:16]}_ctx{n_ctx}.state"
+
+    def _load_from_disk(self, prefix_hash: str, tokens: List[int]):
+        """Carga una instantánea de disco si corresponde exactamente a los tokens del prefijo"""
+        path = self._state_path(prefix_hash)
+        if path is None or not path.exists():
+            return None
+
+        try:
+            with open(path, 'rb') as f:
+                saved = pickle.load(f)
+
+            if list(saved.get("tokens", [])) != list(tokens):
+                logger.warning("Instantánea del prompt obsoleta, se regenerará")
+                return None
+
+            logger.info(f"Estado del prompt del sistema cargado desde disco: {path.name}")
+            return saved["state"]
+
+        except Exception as e:
+            logger.error(f"Error cargando estado del prompt desde disco: {e}")
+            return None
+
+    def _save_to_disk(self, prefix_hash: str, tokens: List[int], state):
+        """Guarda la instantánea en disco de forma atómica"""
+        path = self._state_path(prefix_hash)
+        if path is None:
+            return
+
+        try:
+            self.cache_dir.mkdir(parents=True, exist_ok=True)
+            tmp_path = path.with_suffix(".tmp")
+            with open(tmp_path, 'wb') as f:
+                pickle.dump({"tokens": list(tokens), "state": state}, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, path)
+
+        except Exception as e:
+            logger.error(f"Error guardando estado del prompt en disco: {e}")
@@ -0,0 +1,164 @@
+import re
+import math
+import logging
+import unicodedata
+from collections import Counter
+from typing import Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Operadores que se escriben de varias formas
+OPERATOR_REPLACEMENTS = [
+    ('×', '*'), ('·', '*'), ('÷', '/'), ('−', '-'), ('–', '-'), ('^', '**'),
+]
+
+# Frases de relleno que no cambian la pregunta cuando lo que sigue es una expresión
+FILLER_PHRASES = [
+    "cuanto es", "cuanto da", "cuanto vale", "cual es el resultado de", "resultado de",
+    "calcula", "calcular", "calculame", "resuelve", "resolver", "evalua", "dime",
+    "what is", "what's", "how much is", "calculate", "compute", "evaluate", "solve",
+]
+
+# Las frases largas primero y con \b: "calcula" no debe comerse el inicio de "calculame"
+_FILLER_RE = re.compile(r'^(?:(?:' + '|'.join(re.escape(p) for p in sorted(FILLER_PHRASES, key=len, reverse=True))
+                        + r')\b\s*)+')
+_MATH_ONLY_RE = re.compile(r'^[\d\s+\-*/().x]+$')
+_TRAILING_PUNCT_RE = re.compile(r'[\s?¿!¡.,;:]+$')
+_LEADING_PUNCT_RE = re.compile(r'^[\s?¿!¡]+')
+_NUMBERS_AND_OPERATORS_RE = re.compile(r'\d+(?:[.,]\d+)?|[+\-*/=<>]')
+
+
+def strip_accents(text: str) -> str:
+    """Elimina tildes y diacríticos (cuánto -> cuanto)"""
+    decomposed = unicodedata.normalize('NFKD', text)
+    return ''.join(c for c in decomposed if not unicodedata.combining(c))
+
+
+def normalize_text(text: str) -> str:
+    """Normaliza mayúsculas, tildes, espacios, puntuación final y operadores"""
+    text = strip_accents(text).lower()
+    for old, new in OPERATOR_REPLACEMENTS:
+        text = text.replace(old, new)
+    text = _LEADING_PUNCT_RE.sub('', text)
+    text = _TRAILING_PUNCT_RE.sub('', text)
+    return re.sub(r'\s+', ' ', text).strip()
+
+
+def canonical_math(expression: str) -> Optional[str]:
+    """
+    Forma canónica de una expresión con sympy (srepr sin evaluar), de modo que
+    "7*6", "7 * 6" y "(7)*6" compartan clave pero "7*6" y "42" no.
+    """
+    try:
+        from sympy import srepr
+        from sympy.parsing.sympy_parser import parse_expr
+
+        return srepr(parse_expr(expression, evaluate=False))
+    except Exception:
+        return None
+
+
+def numbers_and_operators(text: str) -> Tuple[str, ...]:
+    """Números y operadores de un texto, en orden ("radio 5" y "radio 8" difieren)"""
+    return tuple(_NUMBERS_AND_OPERATORS_RE.findall(text))
+
+
+def normalize_cache_key(user_input: str) -> str:
+    """
+    Clave de caché para una pregunta.
+
+    Si, quitando las frases de relleno, la pregunta es solo una expresión matemática,
+    la clave es su forma canónica ("math:..."); si no, el texto normalizado ("text:...").
+    """
+    text = normalize_text(user_input)
+    remainder = _FILLER_RE.sub('', text).strip()
+
+    if remainder and _MATH_ONLY_RE.match(remainder) and re.search(r'\d', remainder):
+        canonical = canonical_math(remainder)
+        if canonical:
+            return f"math:{canonical}"
+
+    return f"text:{text}"
+
+
+class NgramIndex:
+    """
+    Índice de vecinos más cercanos por TF-IDF de n-gramas de caracteres.
+
+    Solo debe usarse con claves de texto: dos expresiones como "7*6" y "7*8" se
+    parecen mucho carácter a carácter pero tienen respuestas distintas. Por lo
+    mismo, query() solo acepta claves con los mismos números y operadores.
+    """
+
+    def __init__(self, n: int = 3, threshold: float = 0.85):
+        self.n = n
+        self.threshold = threshold
+        self.documents: Dict[str, Counter] = {}
+        self.document_frequency: Counter = Counter()
+        self.postings: Dict[str, set] = {}
+
+    def _ngrams(self, text: str) -> Counter:
+        padded = f" {text} "
+        if len(padded) < self.n:
+            return Counter([padded])
+        return Counter(padded[i:i + self.n] for i in range(len(padded) - self.n + 1))
+
+    def _idf(self, gram: str) -> float:
+        total = len(self.documents)
+        return math.log((total + 1) / (self.document_frequency.get(gram, 0) + 1)) + 1.0
+
+    def _weights(self, grams: Counter) -> Dict[str, float]:
+        weights = {gram: count * self._idf(gram) for gram, count in grams.items()}
+        norm = math.sqrt(sum(w * w for w in weights.values())) or 1.0
+        return {gram: w / norm for gram, w in weights.items()}
+
+    def add(self, key: str):
+        """Añade una clave al índice"""
+        if key in self.documents:
+            return
+        grams = self._ngrams(key)
+        self.documents[key] = grams
+        for gram in grams:
+            self.document_frequency[gram] += 1
+            self.postings.setdefault(gram, set()).add(key)
+
+    def remove(self, key: str):
+        """Quita una clave del índice"""
+        grams = self.documents.pop(key, None)
+        if not grams:
+            return
+        for gram in grams:
+            self.document_frequency[gram] -= 1
+            if self.document_frequency[gram] <= 0:
+                del self.document_frequency[gram]
+            keys = self.postings.get(gram)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self.postings[gram]
+
+    def query(self, key: str) -> Optional[Tuple[str, float]]:
+        """Devuelve (clave más parecida, similitud) si supera el umbral"""
+        if not self.documents:
+            return None
+
+        query_weights = self._weights(self._ngrams(key))
+
+        candidates = set()
+        for gram in query_weights:
+            candidates.update(self.postings.get(gram, ()))
+
+        # "circulo de radio 8" se parece a "circulo de radio 5" pero su respuesta es otra
+        signature = numbers_and_operators(key)
+        best_key, best_score = None, 0.0
+        for candidate in candidates:
+            if numbers_and_operators(candidate) != signature:
+                continue
+            candidate_weights = self._weights(self.documents[candidate])
+            score = sum(w * candidate_weights.get(gram, 0.0) for gram, w in query_weights.items())
+            if score > best_score:
+                best_key, best_score = candidate, score
+
+        if best_key is not None and best_score >= self.threshold:
+            return best_key, best_score
+        return None
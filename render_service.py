@@ -0,0 +1,180 @@
+import logging
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeoutError
+from typing import Any, Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Visualizador propio de cada proceso trabajador (creado en _init_worker)
+_worker_visualizer = None
+
+
+class _WorkerConfig:
+    """Configuración mínima en memoria para el visualizador de los procesos trabajadores"""
+
+    def __init__(self, values: Dict[str, Any]):
+        self.values = values
+
+    def get(self, key: str, default=None):
+        return self.values.get(key, default)
+
+    def set(self, key: str, value):
+        self.values[key] = value
+
+    def get_ui_colors(self):
+        return {}
+
+
+def _init_worker(settings: Dict[str, Any]):
+    """Inicializa un proceso trabajador: importa matplotlib (Agg) y crea su visualizador"""
+    global _worker_visualizer
+
+    import matplotlib
+    matplotlib.use('Agg')
+
+    from math_visualizer import MathVisualizer
+
+    _worker_visualizer = MathVisualizer(_WorkerConfig(settings))
+    logger.debug("Proceso de renderizado listo")
+
+
+def _warmup() -> bool:
+    """Tarea vacía para forzar el arranque (y la inicialización) de los trabajadores"""
+    return _worker_visualizer is not None
+
+
+def _render(spec: Dict[str, Any]):
+    """Renderiza una especificación en el proceso trabajador y devuelve la RenderedImage"""
+    if _worker_visualizer is None:
+        raise RuntimeError("Proceso de renderizado sin inicializar")
+    return _worker_visualizer.render_spec(spec)
+
+
+class RenderService:
+    """
+    Servicio de renderizado de visualizaciones en procesos separados.
+
+    Cada proceso tiene matplotlib ya importado y su propio MathVisualizer, así que los
+    renders no compiten por el GIL con el hilo del modelo ni con el bucle de Tk, y dos
+    peticiones simultáneas no comparten estado de matplotlib. Solo viajan la
+    especificación (tipo de problema, texto, colores, tamaño) y el buffer de la imagen.
+    """
+
+    def __init__(self, processes: int = 1, timeout: float = 30.0, settings: Optional[Dict[str, Any]] = None):
+        self.processes = max(1, int(processes))
+        self.timeout = timeout
+        self.settings = dict(settings or {})
+
+        self.lock = threading.Lock()
+        self.executor: Optional[ProcessPoolExecutor] = None
+        self.failed = False
+
+    def start(self):
+        """Arranca los procesos y los calienta en segundo plano"""
+        with self.lock:
+            if self.executor is not None or self.failed:
+                return
+            try:
+                # spawn también en Linux: un fork con hilos activos (Tk, modelo, matplotlib)
+                # puede heredar locks tomados y bloquear al trabajador
+                self.executor = ProcessPoolExecutor(
+                    max_workers=self.processes,
+                    mp_context=multiprocessing.get_context('spawn'),
+                    initializer=_init_worker,
+                    initargs=(self.settings,)
+                )
+                for _ in range(self.processes):
+                    self.executor.submit(_warmup)
+                logger.info(f"Servicio de renderizado iniciado con {self.processes} proceso(s)")
+
+            except Exception as e:
+                logger.error(f"Error iniciando servicio de renderizado: {e}")
+                self.executor = None
+                self.failed = True
+
+    def render(self, spec: Dict[str, Any]) -> Tuple[bool, Any]:
+        """
+        Renderiza una especificación en un proceso trabajador
+
+        Returns:
+            Tuple[bool, RenderedImage]: (atendida, imagen). Si atendida es False el
+            servicio no está disponible o falló y el llamador debe dibujar por su cuenta;
+            la imagen puede ser None cuando no había nada que dibujar.
+        """
+        self.start()
+        if self.executor is None:
+            return False, None
+
+        try:
+            future = self.executor.submit(_render, spec)
+            return True, future.result(timeout=self.timeout)
+
+        except FutureTimeoutError:
+            # Un trabajador colgado haría esperar a todas las peticiones siguientes
+            logger.warning(f"Renderizado en proceso superó {self.timeout}s, se desactiva el servicio")
+            self.shutdown(terminate=True)
+            self.failed = True
+            return False, None
+
+        except Exception as e:
+            # BrokenProcessPool u otro fallo del trabajador: no volver a intentarlo
+            logger.error(f"Error en servicio de renderizado: {e}")
+            self.shutdown()
+            self.failed = True
+            return False, None
+
+    def shutdown(self, terminate: bool = False):
+        """
+        Detiene los procesos trabajadores
+
+        Args:
+            terminate: Matar también los procesos que sigan ocupados
+        """
+        with self.lock:
+            if self.executor is not None:
+                try:
+                    if terminate:
+                        # ProcessPoolExecutor no ofrece forma pública de matar un trabajador
+                        for process in list(getattr(self.executor, '_processes', {}).values()):
+                            process.terminate()
+                    self.executor.shutdown(wait=False, cancel_futures=True)
+                except Exception as e:
+                    logger.error(f"Error cerrando servicio de renderizado: {e}")
+                self.executor = None
+
+
+# Instancia global del servicio de renderizado
+_render_service = None
+
+
+def get_render_service(config_manager=None) -> Optional[RenderService]:
+    """
+    Obtiene el servicio global de renderizado, o None si está desactivado
+    (visualization.render_processes = 0)
+    """
+    global _render_service
+    if _render_service is None and config_manager is not None:
+        processes = config_manager.get("visualization.render_processes", 1)
+        if not processes:
+            return None
+
+        _render_service = RenderService(
+            processes=processes,
+            timeout=config_manager.get("visualization.render_timeout", 30.0),
+            settings={
+                "visualization.figure_size": config_manager.get("visualization.figure_size", [10, 8]),
+                "ui.language": config_manager.get("ui.language", "es"),
+                # Los trabajadores dibujan en su propio proceso, nunca delegan
+                "visualization.render_processes": 0,
+            }
+        )
+    return _render_service
+
+
+def shutdown_render_service():
+    """Cierra el servicio global de renderizado"""
+    global _render_service
+    if _render_service:
+        _render_service.shutdown()
+        _render_service = None
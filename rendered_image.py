@@ -0,0 +1,116 @@
+import io
+import re
+import base64
+import logging
+from typing import Optional, Tuple
+
+from PIL import Image
+
+from metrics import get_metrics, STAGE_PNG_ENCODE
+
+logger = logging.getLogger(__name__)
+
+# Prefijo de las imágenes incrustadas como data URI ("data:image/png;base64,")
+_DATA_URI_RE = re.compile(r'^data:[\w/+.-]+;base64,')
+
+# Por debajo de este DPI el texto deja de ser legible
+MIN_TARGET_DPI = 20
+
+
+class RenderTarget:
+    """
+    Tamaño en píxeles de la superficie donde se mostrará una visualización.
+
+    El tamaño de la figura en pulgadas no cambia (de él dependen letras, grosores y
+    márgenes); lo que se ajusta es el DPI, para que Agg rasterice directamente a los
+    píxeles que se van a mostrar en lugar de dibujar a 100 DPI y reducir después.
+    """
+
+    __slots__ = ('width', 'height')
+
+    def __init__(self, width: int, height: Optional[int] = None):
+        self.width = int(width)
+        self.height = int(height) if height else None
+
+    def dpi_for(self, fig_size) -> float:
+        """DPI con el que una figura de fig_size pulgadas cabe en el objetivo"""
+        dpi = self.width / fig_size[0]
+        if self.height:
+            dpi = min(dpi, self.height / fig_size[1])
+        return max(MIN_TARGET_DPI, round(dpi, 2))
+
+
+class RenderedImage:
+    """
+    Imagen renderizada que viaja del visualizador al canvas sin pasar por base64.
+
+    Lleva el buffer RGBA de Agg (tal cual sale de canvas.buffer_rgba()) o bytes PNG.
+    La codificación PNG/base64 solo se hace cuando hace falta: al guardar en caché,
+    exportar o devolver la imagen fuera de la aplicación.
+    """
+
+    __slots__ = ('png', 'rgba', 'size', 'spec')
+
+    def __init__(self, png: Optional[bytes] = None, rgba: Optional[bytes] = None,
+                 size: Optional[Tuple[int, int]] = None, spec: Optional[dict] = None):
+        self.png = png
+        self.rgba = rgba
+        self.size = size
+        # Especificación con la que se dibujó (permite volver a renderizar a otro DPI)
+        self.spec = spec
+
+    @classmethod
+    def from_figure(cls, fig) -> "RenderedImage":
+        """Dibuja una figura de matplotlib y copia su buffer RGBA (la figura puede reutilizarse después)"""
+        canvas = fig.canvas
+        canvas.draw()
+        buffer = canvas.buffer_rgba()
+        height, width = buffer.shape[:2]
+        return cls(rgba=bytes(buffer), size=(int(width), int(height)))
+
+    @classmethod
+    def from_base64(cls, data: str) -> Optional["RenderedImage"]:
+        """Crea la imagen a partir de base64 (con o sin prefijo data URI)"""
+        if not data:
+            return None
+        try:
+            png = base64.b64decode(_DATA_URI_RE.sub('', data))
+            return cls(png=png)
+        except Exception as e:
+            logger.error(f"Error decodificando imagen base64: {e}")
+            return None
+
+    @classmethod
+    def coerce(cls, data) -> Optional["RenderedImage"]:
+        """Acepta una RenderedImage, bytes PNG o una cadena base64"""
+        if isinstance(data, cls):
+            return data if data else None
+        if isinstance(data, (bytes, bytearray)):
+            return cls(png=bytes(data)) if data else None
+        if isinstance(data, str):
+            return cls.from_base64(data)
+        return None
+
+    def __bool__(self) -> bool:
+        return bool(self.rgba or self.png)
+
+    def to_pil(self) -> Image.Image:
+        """Devuelve la imagen como PIL.Image (sin copiar el buffer RGBA)"""
+        if self.rgba is not None:
+            return Image.frombuffer('RGBA', self.size, self.rgba, 'raw', 'RGBA', 0, 1)
+        image = Image.open(io.BytesIO(self.png))
+        self.size = image.size
+        return image
+
+    def to_png(self) -> bytes:
+        """Devuelve los bytes PNG, codificándolos una sola vez si hace falta"""
+        if self.png is None:
+            with get_metrics().stage(STAGE_PNG_ENCODE):
+                buffer = io.BytesIO()
+                self.to_pil().save(buffer, format='PNG')
+                self.png = buffer.getvalue()
+        return self.png
+
+    def to_base64(self) -> str:
+        """Devuelve la imagen PNG en base64 (para caché o exportación)"""
+        return base64.b64encode(self.to_png()).decode('ascii')
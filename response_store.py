@@ -0,0 +1,282 @@
+import os
+import re
+import json
+import time
+import base64
+import sqlite3
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Prefijo de las imágenes incrustadas como data URI ("data:image/png;base64,")
+_DATA_URI_RE = re.compile(r'^(data:[\w/+.-]+;base64,)')
+
+
+class ResponseStore:
+    """
+    Almacén persistente de respuestas generadas.
+
+    Las respuestas viven en una tabla SQLite (una fila por entrada, guardar cuesta O(entrada))
+    y las imágenes se guardan aparte como blobs direccionados por su SHA-256, de modo que
+    una misma pizarra compartida por varias preguntas se escribe una sola vez.
+    En memoria solo se mantiene un índice clave -> (creación, hash de imagen) en orden LRU,
+    que se construye la primera vez que se consulta el almacén.
+    """
+
+    def __init__(self, db_path: str = "cache/responses.db", blob_dir: str = "cache/blobs",
+                 max_entries: int = 500, ttl_seconds: Optional[float] = 30 * 24 * 3600,
+                 legacy_json: Optional[str] = "math_cache.json"):
+        self.db_path = Path(db_path)
+        self.blob_dir = Path(blob_dir)
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.legacy_json = legacy_json
+
+        self.lock = threading.RLock()
+        self._conn: Optional[sqlite3.Connection] = None
+        self._index: "OrderedDict[str, Tuple[float, str]]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    # ------------------------------------------------------------------ #
+    # API pública
+    # ------------------------------------------------------------------ #
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """Obtiene una respuesta guardada ({"text", "formula", "image"}) o None"""
+        with self.lock:
+            try:
+                self._ensure_loaded()
+
+                meta = self._index.get(key)
+                if meta is None:
+                    self.misses += 1
+                    return None
+
+                created, _image_hash = meta
+                if self._is_expired(created):
+                    self._delete(key)
+                    self._conn.commit()
+                    self.misses += 1
+                    return None
+
+                row = self._conn.execute(
+                    "SELECT text, formula, image_hash, image_prefix FROM responses WHERE key = ?",
+                    (key,)
+                ).fetchone()
+                if row is None:
+                    self._index.pop(key, None)
+                    self.misses += 1
+                    return None
+
+                text, formula, image_hash, image_prefix = row
+                self._index.move_to_end(key)
+                self._conn.execute("UPDATE responses SET last_access = ? WHERE key = ?", (time.time(), key))
+                self._conn.commit()
+
+                self.hits += 1
+                return {
+                    "text": text,
+                    "formula": formula,
+                    "image": self._read_image(image_hash, image_prefix)
+                }
+
+            except Exception as e:
+                logger.error(f"Error leyendo del almacén de respuestas: {e}")
+                return None
+
+    def put(self, key: str, entry: Dict[str, Any]):
+        """Guarda (o reemplaza) una respuesta"""
+        with self.lock:
+            try:
+                self._ensure_loaded()
+
+                image_hash, image_prefix = self._write_image(entry.get("image", ""))
+                now = time.time()
+
+                previous = self._index.get(key)
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO responses "
+                    "(key, text, formula, image_hash, image_prefix, created, last_access) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    (key, entry.get("text", ""), entry.get("formula", ""),
+                     image_hash, image_prefix, now, now)
+                )
+                self._index[key] = (now, image_hash)
+                self._index.move_to_end(key)
+
+                if previous and previous[1] and previous[1] != image_hash:
+                    self._release_blob(previous[1])
+
+                self._evict()
+                self._conn.commit()
+
+            except Exception as e:
+                logger.error(f"Error guardando en el almacén de respuestas: {e}")
+
+    def __contains__(self, key: str) -> bool:
+        with self.lock:
+            self._ensure_loaded()
+            return key in self._index
+
+    def __len__(self) -> int:
+        with self.lock:
+            self._ensure_loaded()
+            return len(self._index)
+
+    def keys(self):
+        """Claves guardadas, de la menos a la más recientemente usada"""
+        with self.lock:
+            self._ensure_loaded()
+            return list(self._index.keys())
+
+    def flush(self):
+        """Confirma cualquier escritura pendiente en disco"""
+        with self.lock:
+            if self._conn is not None:
+                try:
+                    self._conn.commit()
+                except Exception as e:
+                    logger.error(f"Error confirmando el almacén de respuestas: {e}")
+
+    def close(self):
+        """Cierra la conexión con la base de datos"""
+        with self.lock:
+            if self._conn is not None:
+                self.flush()
+                self._conn.close()
+                self._conn = None
+                self._index.clear()
+
+    # ------------------------------------------------------------------ #
+    # Carga perezosa e índice
+    # ------------------------------------------------------------------ #
+
+    def _ensure_loaded(self):
+        """Abre la base de datos y construye el índice en memoria la primera vez"""
+        if self._conn is not None:
+            return
+
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self.blob_dir.mkdir(parents=True, exist_ok=True)
+
+        self._conn = sqlite3.connect(str(self.db_path), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            "key TEXT PRIMARY KEY, text TEXT, formula TEXT, "
+            "image_hash TEXT, image_prefix TEXT, created REAL, last_access REAL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_responses_image ON responses(image_hash)")
+        self._conn.commit()
+
+        rows = self._conn.execute(
+            "SELECT key, created, image_hash FROM responses ORDER BY last_access"
+        ).fetchall()
+        self._index = OrderedDict((key, (created, image_hash)) for key, created, image_hash in rows)
+
+        self._migrate_legacy_json()
+        self._purge_expired()
+        self._evict()
+        self._conn.commit()
+
+        logger.info(f"Almacén de respuestas cargado con {len(self._index)} entradas")
+
+    def _migrate_legacy_json(self):
+        """Importa una sola vez el antiguo math_cache.json y lo renombra"""
+        if not self.legacy_json or not os.path.exists(self.legacy_json):
+            return
+
+        try:
+            with open(self.legacy_json, "r", encoding="utf-8") as f:
+                legacy = json.load(f)
+
+            for key, entry in legacy.items():
+                if key not in self._index and isinstance(entry, dict):
+                    self.put(key, entry)
+
+            os.replace(self.legacy_json, self.legacy_json + ".migrated")
+            logger.info(f"Caché antiguo migrado: {len(legacy)} entradas desde {self.legacy_json}")
+
+        except Exception as e:
+            logger.error(f"Error migrando caché antiguo: {e}")
+
+    def _is_expired(self, created: float) -> bool:
+        return bool(self.ttl_seconds) and (time.time() - created) > self.ttl_seconds
+
+    def _purge_expired(self):
+        """Elimina todas las entradas caducadas"""
+        if not self.ttl_seconds:
+            return
+        expired = [key for key, (created, _) in self._index.items() if self._is_expired(created)]
+        for key in expired:
+            self._delete(key)
+
+    def _evict(self):
+        """Elimina las entradas menos usadas recientemente por encima del límite"""
+        while self.max_entries and len(self._index) > self.max_entries:
+            oldest_key = next(iter(self._index))
+            self._delete(oldest_key)
+
+    def _delete(self, key: str):
+        """Elimina una entrada y su imagen si ya nadie la referencia"""
+        meta = self._index.pop(key, None)
+        self._conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+        if meta and meta[1]:
+            self._release_blob(meta[1])
+
+    # ------------------------------------------------------------------ #
+    # Blobs de imagen
+    # ------------------------------------------------------------------ #
+
+    def _blob_path(self, image_hash: str) -> Path:
+        return self.blob_dir / image_hash[:2] / f"{image_hash}.bin"
+
+    def _write_image(self, image: str) -> Tuple[str, str]:
+        """Guarda la imagen como blob y devuelve (hash, prefijo data URI)"""
+        if not image:
+            return "", ""
+
+        match = _DATA_URI_RE.match(image)
+        prefix = match.group(1) if match else ""
+        data = base64.b64decode(image[len(prefix):])
+
+        image_hash = hashlib.sha256(data).hexdigest()
+        path = self._blob_path(image_hash)
+        if not path.exists():
+            path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = path.with_suffix(".tmp")
+            with open(tmp_path, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+
+        return image_hash, prefix
+
+    def _read_image(self, image_hash: str, prefix: str) -> str:
+        """Lee un blob y lo devuelve en el mismo formato en que se guardó"""
+        if not image_hash:
+            return ""
+        try:
+            with open(self._blob_path(image_hash), "rb") as f:
+                return (prefix or "") + base64.b64encode(f.read()).decode("ascii")
+        except OSError as e:
+            logger.warning(f"Imagen de caché no encontrada ({image_hash[:12]}): {e}")
+            return ""
+
+    def _release_blob(self, image_hash: str):
+        """Borra el blob si ninguna entrada lo usa"""
+        still_used = self._conn.execute(
+            "SELECT 1 FROM responses WHERE image_hash = ? LIMIT 1", (image_hash,)
+        ).fetchone()
+        if still_used:
+            return
+        try:
+            self._blob_path(image_hash).unlink()
+        except OSError:
+            pass
@@ -0,0 +1,251 @@
+import ast
+import math
+import operator
+import logging
+from functools import lru_cache
+from typing import Any, Callable, Dict, FrozenSet, Optional, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Operadores que se escriben de varias formas
+_REPLACEMENTS = [('×', '*'), ('·', '*'), ('÷', '/'), ('−', '-'), ('^', '**')]
+
+# Límite de bits del resultado de una potencia entera (evita 9**9**9)
+MAX_POWER_BITS = 100_000
+
+BINARY_OPERATORS = {
+    ast.Add: operator.add,
+    ast.Sub: operator.sub,
+    ast.Mult: operator.mul,
+    ast.Div: operator.truediv,
+    ast.FloorDiv: operator.floordiv,
+    ast.Mod: operator.mod,
+}
+
+UNARY_OPERATORS = {
+    ast.UAdd: operator.pos,
+    ast.USub: operator.neg,
+}
+
+# Funciones permitidas: ufuncs de numpy, válidas tanto para escalares como para arrays
+FUNCTIONS: Dict[str, Callable] = {
+    'sin': np.sin, 'cos': np.cos, 'tan': np.tan,
+    'asin': np.arcsin, 'acos': np.arccos, 'atan': np.arctan,
+    'sinh': np.sinh, 'cosh': np.cosh, 'tanh': np.tanh,
+    'exp': np.exp, 'log': np.log, 'ln': np.log, 'log10': np.log10, 'log2': np.log2,
+    'sqrt': np.sqrt, 'abs': np.abs,
+}
+
+CONSTANTS: Dict[str, float] = {'pi': math.pi, 'e': math.e}
+
+
+class ExpressionError(ValueError):
+    """La expresión no es válida o usa construcciones no permitidas"""
+
+
+def normalize_expression(text: str) -> str:
+    """Unifica operadores (×, ÷, ^) y quita espacios sobrantes"""
+    text = text.strip()
+    for old, new in _REPLACEMENTS:
+        text = text.replace(old, new)
+    return ' '.join(text.split())
+
+
+def to_python(value):
+    """Convierte escalares de numpy (resultado de las ufuncs) en int/float de Python"""
+    return value.item() if isinstance(value, np.generic) else value
+
+
+def safe_pow(base, exponent):
+    """Potencia que rechaza resultados enteros desproporcionados"""
+    if isinstance(base, int) and isinstance(exponent, int) and exponent > 0:
+        if max(abs(base), 2).bit_length() * exponent > MAX_POWER_BITS:
+            raise ExpressionError(f"Potencia demasiado grande: {base}**{exponent}")
+    return operator.pow(base, exponent)
+
+
+class CompiledExpression:
+    """
+    Expresión analizada una sola vez y compilada a una función de Python.
+
+    El mismo objeto sirve para validar, evaluar, explicar paso a paso (a partir de
+    tree) y graficar, ya que las funciones son ufuncs de numpy y aceptan arrays.
+    """
+
+    __slots__ = ('source', 'tree', 'variables', '_func', 'value')
+
+    def __init__(self, source: str, tree: ast.Expression, variables: FrozenSet[str],
+                 func: Callable[[Dict[str, Any]], Any]):
+        self.source = source
+        self.tree = tree
+        self.variables = variables
+        self._func = func
+        # Las expresiones sin variables se evalúan al compilar
+        self.value = to_python(func({})) if not variables else None
+
+    @property
+    def is_constant(self) -> bool:
+        return not self.variables
+
+    def evaluate(self, **variables):
+        """Evalúa la expresión con los valores dados para sus variables"""
+        if self.value is not None:
+            return self.value
+        missing = self.variables - variables.keys()
+        if missing:
+            raise ExpressionError(f"Faltan valores para: {', '.join(sorted(missing))}")
+        return self._func(variables)
+
+    def evaluate_on(self, x: np.ndarray, name: str = 'x') -> np.ndarray:
+        """Evalúa sobre un array (para graficar); las constantes se extienden a su forma"""
+        with np.errstate(all='ignore'):
+            result = self.evaluate(**{name: x}) if self.variables else self.value
+        return np.broadcast_to(np.asarray(result, dtype=float), np.shape(x))
+
+
+class _Compiler:
+    """
+    Convierte un AST de la lista blanca en closures anidados.
+
+    Recorre el árbol sin recursión y pliega al compilar las partes sin variables,
+    así que una cadena de miles de términos constantes no anida miles de closures.
+    """
+
+    def __init__(self, allowed_variables: FrozenSet[str]):
+        self.allowed_variables = allowed_variables
+        self.variables = set()
+
+    def build(self, tree: ast.Expression) -> Callable[[Dict[str, Any]], Any]:
+        built = {}
+        stack = [(tree.body, False)]
+
+        while stack:
+            node, expanded = stack.pop()
+            operands = self._operands(node)
+            if not expanded:
+                stack.append((node, True))
+                stack.extend((operand, False) for operand in operands)
+                continue
+            built[id(node)] = self._build_node(node, [built.pop(id(operand)) for operand in operands])
+
+        func, _value, _constant = built[id(tree.body)]
+        return func
+
+    def _operands(self, node) -> list:
+        """Subexpresiones de un nodo; rechaza cualquier construcción fuera de la lista blanca"""
+        if isinstance(node, ast.BinOp):
+            if not isinstance(node.op, ast.Pow) and type(node.op) not in BINARY_OPERATORS:
+                raise ExpressionError(f"Operador no permitido: {type(node.op).__name__}")
+            return [node.left, node.right]
+
+        if isinstance(node, ast.UnaryOp):
+            if type(node.op) not in UNARY_OPERATORS:
+                raise ExpressionError(f"Operador no permitido: {type(node.op).__name__}")
+            return [node.operand]
+
+        if isinstance(node, ast.Call):
+            if not isinstance(node.func, ast.Name) or node.func.id not in FUNCTIONS or node.keywords:
+                raise ExpressionError("Llamada a función no permitida")
+            if len(node.args) != 1:
+                raise ExpressionError(f"{node.func.id} espera un argumento")
+            return [node.args[0]]
+
+        if isinstance(node, (ast.Constant, ast.Name)):
+            return []
+
+        raise ExpressionError(f"Construcción no permitida: {type(node).__name__}")
+
+    @staticmethod
+    def _constant(value):
+        return (lambda env: value), value, True
+
+    def _build_node(self, node, operands):
+        """Devuelve (función, valor, es_constante) para un nodo cuyos operandos ya están compilados"""
+        if isinstance(node, ast.Constant):
+            if isinstance(node.value, bool) or not isinstance(node.value, (int, float)):
+                raise ExpressionError(f"Constante no permitida: {node.value!r}")
+            return self._constant(node.value)
+
+        if isinstance(node, ast.Name):
+            name = node.id
+            if name in self.allowed_variables:
+                self.variables.add(name)
+                return (lambda env: env[name]), None, False
+            if name in CONSTANTS:
+                return self._constant(CONSTANTS[name])
+            raise ExpressionError(f"Nombre no permitido: {name}")
+
+        if isinstance(node, ast.BinOp):
+            op = safe_pow if isinstance(node.op, ast.Pow) else BINARY_OPERATORS[type(node.op)]
+            (left, left_value, left_constant), (right, right_value, right_constant) = operands
+            if left_constant and right_constant:
+                return self._constant(op(left_value, right_value))
+            return (lambda env: op(left(env), right(env))), None, False
+
+        if isinstance(node, ast.UnaryOp):
+            op = UNARY_OPERATORS[type(node.op)]
+        else:
+            op = FUNCTIONS[node.func.id]
+
+        operand, value, constant = operands[0]
+        if constant:
+            return self._constant(op(value))
+        return (lambda env: op(operand(env))), None, False
+
+
+@lru_cache(maxsize=512)
+def _compile_normalized(expression: str, allowed_variables: FrozenSet[str]) -> CompiledExpression:
+    try:
+        tree = ast.parse(expression, mode='eval')
+    except SyntaxError as e:
+        raise ExpressionError(f"Expresión mal formada: {expression}") from e
+    except RecursionError as e:
+        # El analizador de Python tiene un límite de anidamiento (unos miles de términos)
+        raise ExpressionError("Expresión demasiado larga") from e
+
+    compiler = _Compiler(allowed_variables)
+    func = compiler.build(tree)
+    return CompiledExpression(expression, tree, frozenset(compiler.variables), func)
+
+
+def compile_expression(text: str, variables: Tuple[str, ...] = ()) -> CompiledExpression:
+    """
+    Analiza y compila una expresión matemática (resultado en caché por forma normalizada)
+
+    Args:
+        text: Expresión, admite ×, ÷ y ^
+        variables: Nombres de variable permitidos (por ejemplo ('x',) para graficar)
+
+    Raises:
+        ExpressionError: Si la expresión no es válida o no está permitida
+        ZeroDivisionError: Si una parte constante divide entre cero
+    """
+    expression = normalize_expression(text)
+    if not expression:
+        raise ExpressionError("Expresión vacía")
+    return _compile_normalized(expression, frozenset(variables))
+
+
+def safe_eval(text: str):
+    """Evalúa una expresión numérica sin variables (sustituto seguro de eval)"""
+    return compile_expression(text).value
+
+
+def is_valid_expression(text: str) -> bool:
+    """Indica si la expresión es numérica, válida y evaluable"""
+    try:
+        value = safe_eval(text)
+        return isinstance(value, (int, float))
+    except Exception:
+        return False
+
+
+def try_compile(text: str, variables: Tuple[str, ...] = ()) -> Optional[CompiledExpression]:
+    """Como compile_expression, pero devuelve None en lugar de lanzar excepción"""
+    try:
+        return compile_expression(text, variables)
+    except Exception as e:
+        logger.debug(f"Expresión no compilable '{text}': {e}")
+        return None
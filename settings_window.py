@@ -1,3 +1,4 @@
+import os
 import tkinter as tk
 from tkinter import ttk, messagebox, filedialog, colorchooser
 import pyttsx3
@@ -342,7 +343,7 @@ Assets VTuber:
         
         # Número de hilos
         ttk.Label(frame, text="Hilos de procesamiento:", font=('Arial', 10, 'bold')).grid(row=1, column=0, sticky='w', padx=5, pady=5)
-        threads_scale = tk.Scale(frame, from_=1, to=8, orient=tk.HORIZONTAL, variable=self.var_num_threads)
+        threads_scale = tk.Scale(frame, from_=1, to=max(8, os.cpu_count() or 8), orient=tk.HORIZONTAL, variable=self.var_num_threads)
         threads_scale.grid(row=1, column=1, sticky='ew', padx=5, pady=5)
         
         # Timeout
@@ -2,21 +2,18 @@ import os
 import sys
 import logging
 import time
-from typing import Optional, Tuple, Any
-import numpy as np
-import matplotlib.pyplot as plt
-import matplotlib
-matplotlib.use('Agg')  # Backend sin GUI
-from io import BytesIO
-import base64
-from PIL import Image, ImageDraw, ImageFont
-import sympy as sp
-from sympy import symbols, solve, diff, integrate, limit, series, simplify
-from sympy.plotting import plot
+import threading
+from typing import Optional, Tuple, Any, Callable
 import re
 from config_manager import ConfigManager
 from language_manager import get_language_manager, _
-from math_visualizer import MathVisualizer
+from lazy_imports import lazy_import
+from metrics import (get_metrics, STAGE_PROMPT_BUILD, STAGE_PREFIX_RESTORE, STAGE_PROMPT_EVAL,
+                     STAGE_TOKEN_GENERATION, STAGE_GENERATION, STAGE_FORMULA_EXTRACTION)
+
+# numpy (vía safe_expr) y matplotlib (vía math_visualizer) se cargan al crear
+# MathVTuber en su hilo, no al importar este módulo desde la ventana principal
+safe_expr = lazy_import('safe_expr')
 
 # Configurar logging
 logger = logging.getLogger(__name__)
@@ -30,8 +27,12 @@ class MathVTuber:
         self.mistral_model_path = mistral_model_path
         self.mistral_model = None
         self.model_type = "unknown"
+        self.prefix_cache = None
         
-        # Inicializar visualizador
+        # Inicializar visualizador (primera importación de matplotlib)
+        import matplotlib
+        matplotlib.use('Agg')  # Backend sin GUI
+        from math_visualizer import MathVisualizer
         self.visualizer = MathVisualizer(config_manager)
         
         # Configuración del modelo
@@ -75,12 +76,15 @@ class MathVTuber:
             
             from llama_cpp import Llama
             
+            # Hilos y tamaño de lote (medidos para este modelo y CPU con ai.auto_tune)
+            params = self._inference_params()
+            self.num_threads = params.n_threads
+            
             # Configuración optimizada para llama-cpp-python
             self.mistral_model = Llama(
                 model_path=self.mistral_model_path,
                 n_ctx=self.context_size,
-                n_threads=self.num_threads,
-                n_batch=512,
+                **params.llama_kwargs(),
                 verbose=False,
                 use_mmap=True,
                 use_mlock=False,
@@ -89,6 +93,14 @@ class MathVTuber:
             
             self.model_type = "llama_cpp"
             logger.info("Modelo cargado exitosamente con llama-cpp-python")
+            
+            # Evaluar (o restaurar de disco) el prompt del sistema una sola vez
+            if self.config_manager.get("performance.prompt_prefix_cache", True):
+                from prompt_cache import PromptPrefixCache
+                cache_dir = self.config_manager.get("performance.prompt_cache_dir", "cache/prompt_states")
+                self.prefix_cache = PromptPrefixCache(self.mistral_model, self.mistral_model_path, cache_dir)
+                self._prepare_prompt_prefix()
+            
             return True
             
         except ImportError:
@@ -98,16 +110,26 @@ class MathVTuber:
             logger.error(f"Error cargando con llama-cpp-python: {e}")
             return False
     
+    def _inference_params(self):
+        """Parámetros de inferencia: calibrados (ai.auto_tune) o los de la configuración"""
+        from inference_tuner import get_inference_tuner, InferenceParams
+        
+        if self.ai_config.get("auto_tune", False):
+            return get_inference_tuner(self.config_manager).params_for(self.mistral_model_path)
+        # Sin calibrar, los hilos de lote los elige llama-cpp-python (todas las CPUs)
+        return InferenceParams(self.num_threads, None, self.ai_config.get("n_batch", 512))
+    
     def _load_with_ctransformers(self) -> bool:
         """Intenta cargar el modelo con ctransformers"""
         try:
             logger.info("Intentando cargar con ctransformers...")
             
             from ctransformers import AutoModelForCausalLM
+            from model_path_resolver import resolve_model_path
             
-            # Configuración para ctransformers
+            # ctransformers toma las rutas con espacios por nombres de repositorio: alias sin copia
             self.mistral_model = AutoModelForCausalLM.from_pretrained(
-                self.mistral_model_path,
+                resolve_model_path(self.mistral_model_path),
                 model_type="mistral",
                 context_length=self.context_size,
                 threads=self.num_threads,
@@ -125,12 +147,28 @@ class MathVTuber:
             logger.error(f"Error cargando con ctransformers: {e}")
             return False
     
-    def generate_response(self, user_input: str) -> Tuple[str, str, str]:
+    def unload(self):
+        """Libera el modelo cargado; la instancia sigue funcionando en modo básico"""
+        model = self.mistral_model
+        self.mistral_model = None
+        self.prefix_cache = None
+        self.model_type = "basic"
+        
+        # llama-cpp-python >= 0.2.x libera el contexto y el mmap con close()
+        close = getattr(model, "close", None)
+        if callable(close):
+            try:
+                close()
+            except Exception as e:
+                logger.error(f"Error cerrando modelo: {e}")
+        logger.info("Modelo liberado")
+    
+    def generate_response(self, user_input: str) -> Tuple[str, str, Any]:
         """
         Genera una respuesta para la entrada del usuario con visualización automática
         
         Returns:
-            Tuple[str, str, str]: (respuesta, fórmula, imagen_data)
+            Tuple[str, str, RenderedImage]: (respuesta, fórmula, imagen o "")
         """
         try:
             # Limpiar entrada
@@ -139,16 +177,11 @@ class MathVTuber:
             if not user_input:
                 return _("messages.empty_question", "Por favor, escribe una pregunta."), "", ""
             
-            # Generar respuesta según el tipo de modelo
-            if self.model_type == "llama_cpp":
-                response, formula, _ = self._generate_with_llama_cpp(user_input)
-            elif self.model_type == "ctransformers":
-                response, formula, _ = self._generate_with_ctransformers(user_input)
-            else:
-                response, formula, _ = self._generate_basic_response(user_input)
-            
-            # Generar visualización automática
-            visualization = self.visualizer.generate_visualization(user_input, response, formula)
+            with get_metrics().request("chat"):
+                response, formula = self.generate_text(user_input)
+                
+                # Generar visualización automática
+                visualization = self.visualizer.render_image(user_input, response, formula)
             
             return response, formula, visualization or ""
                 
@@ -156,21 +189,84 @@ class MathVTuber:
             logger.error(f"Error generando respuesta: {e}")
             return _("errors.response_generation", "Error al generar respuesta") + f": {str(e)}", "", ""
     
+    def generate_text(self, user_input: str) -> Tuple[str, str]:
+        """
+        Genera solo el texto y la fórmula, sin visualización
+        
+        Es la parte que usa el modelo (no admite llamadas concurrentes); el
+        modo por lotes la serializa y dibuja las visualizaciones en paralelo.
+        
+        Returns:
+            Tuple[str, str]: (respuesta, fórmula)
+        """
+        # Generar respuesta según el tipo de modelo
+        if self.model_type == "llama_cpp":
+            response, formula, _image = self._generate_with_llama_cpp(user_input)
+        elif self.model_type == "ctransformers":
+            response, formula, _image = self._generate_with_ctransformers(user_input)
+        else:
+            response, formula, _image = self._generate_basic_response(user_input)
+        return response, formula
+    
+    def generate_response_stream(self, user_input: str, on_token: Callable[[str], None],
+                                 cancel_event: Optional[threading.Event] = None) -> Tuple[str, str, Any]:
+        """
+        Genera una respuesta enviando el texto parcial a on_token a medida que el modelo lo produce.
+        La visualización se genera solo cuando el stream termina.
+        
+        Returns:
+            Tuple[str, str, RenderedImage]: (respuesta, fórmula, imagen o "")
+        """
+        try:
+            user_input = user_input.strip()
+            
+            if not user_input:
+                return _("messages.empty_question", "Por favor, escribe una pregunta."), "", ""
+            
+            with get_metrics().request("chat_stream"):
+                if self.model_type == "llama_cpp":
+                    response, formula, _image = self._stream_with_llama_cpp(user_input, on_token, cancel_event)
+                elif self.model_type == "ctransformers":
+                    response, formula, _image = self._stream_with_ctransformers(user_input, on_token, cancel_event)
+                else:
+                    # El modo básico responde de inmediato: se envía completo como un único fragmento
+                    response, formula, _image = self._generate_basic_response(user_input)
+                    on_token(response)
+                
+                if cancel_event is not None and cancel_event.is_set():
+                    return response, formula, ""
+                
+                # Generar visualización automática una vez terminado el stream
+                visualization = self.visualizer.render_image(user_input, response, formula)
+            
+            return response, formula, visualization or ""
+            
+        except Exception as e:
+            logger.error(f"Error generando respuesta en streaming: {e}")
+            return _("errors.response_generation", "Error al generar respuesta") + f": {str(e)}", "", ""
+    
     def _generate_with_llama_cpp(self, user_input: str) -> Tuple[str, str, str]:
         """Genera respuesta usando llama-cpp-python"""
         try:
-            # Crear prompt para matemáticas en el idioma actual
-            prompt = self._create_math_prompt(user_input)
+            metrics = get_metrics()
             
-            # Generar respuesta
-            response = self.mistral_model(
-                prompt,
-                max_tokens=512,
-                temperature=self.temperature,
-                top_p=0.9,
-                repeat_penalty=1.1,
-                stop=["</s>", "Usuario:", "User:", "Human:", "Pregunta:"]
-            )
+            # Crear prompt para matemáticas en el idioma actual
+            with metrics.stage(STAGE_PROMPT_BUILD):
+                prompt = self._create_math_prompt(user_input)
+            with metrics.stage(STAGE_PREFIX_RESTORE):
+                self._prepare_prompt_prefix()
+            
+            # Generar respuesta (sin streaming, evaluación y generación no se pueden separar)
+            with metrics.stage(STAGE_GENERATION):
+                response = self.mistral_model(
+                    prompt,
+                    max_tokens=512,
+                    temperature=self.temperature,
+                    top_p=0.9,
+                    repeat_penalty=1.1,
+                    stop=["</s>", "Usuario:", "User:", "Human:", "Pregunta:"]
+                )
+            metrics.record_tokens(response.get('usage', {}).get('completion_tokens', 0))
             
             # Extraer texto de respuesta
             response_text = response['choices'][0]['text'].strip()
@@ -185,41 +281,152 @@ class MathVTuber:
     def _generate_with_ctransformers(self, user_input: str) -> Tuple[str, str, str]:
         """Genera respuesta usando ctransformers"""
         try:
+            metrics = get_metrics()
+            
             # Crear prompt para matemáticas en el idioma actual
-            prompt = self._create_math_prompt(user_input)
+            with metrics.stage(STAGE_PROMPT_BUILD):
+                prompt = self._create_math_prompt(user_input)
             
             # Generar respuesta
-            response_text = self.mistral_model(
+            with metrics.stage(STAGE_GENERATION):
+                response_text = self.mistral_model(
+                    prompt,
+                    max_new_tokens=512,
+                    temperature=self.temperature,
+                    top_p=0.9,
+                    repetition_penalty=1.1,
+                    stop=["</s>", "Usuario:", "User:", "Human:", "Pregunta:"]
+                )
+            
+            # Procesar respuesta
+            return self._process_response(response_text, user_input)
+            
+        except Exception as e:
+            logger.error(f"Error con ctransformers: {e}")
+            return self._generate_basic_response(user_input)
+    
+    def _stream_with_llama_cpp(self, user_input: str, on_token: Callable[[str], None],
+                               cancel_event: Optional[threading.Event] = None) -> Tuple[str, str, str]:
+        """Genera respuesta con llama-cpp-python enviando los tokens a medida que llegan"""
+        pieces = []
+        metrics = get_metrics()
+        try:
+            with metrics.stage(STAGE_PROMPT_BUILD):
+                prompt = self._create_math_prompt(user_input)
+            
+            with metrics.stage(STAGE_PREFIX_RESTORE):
+                self._prepare_prompt_prefix()
+            
+            # Evaluación del prompt: desde la llamada al modelo hasta el primer token
+            start = time.perf_counter()
+            first_token = None
+            stream = self.mistral_model(
+                prompt,
+                max_tokens=512,
+                temperature=self.temperature,
+                top_p=0.9,
+                repeat_penalty=1.1,
+                stop=["</s>", "Usuario:", "User:", "Human:", "Pregunta:"],
+                stream=True
+            )
+            
+            for chunk in stream:
+                if first_token is None:
+                    first_token = time.perf_counter()
+                    metrics.observe_stage(STAGE_PROMPT_EVAL, first_token - start)
+                if cancel_event is not None and cancel_event.is_set():
+                    logger.info("Generación cancelada por el usuario")
+                    break
+                
+                text = chunk['choices'][0]['text']
+                if text:
+                    pieces.append(text)
+                    on_token(text)
+            
+            # llama-cpp envía un fragmento por token
+            self._record_generation(metrics, first_token, len(pieces))
+            return self._process_response(''.join(pieces), user_input)
+            
+        except Exception as e:
+            logger.error(f"Error con llama-cpp-python (streaming): {e}")
+            if pieces:
+                return self._process_response(''.join(pieces), user_input)
+            return self._generate_basic_response(user_input)
+    
+    def _stream_with_ctransformers(self, user_input: str, on_token: Callable[[str], None],
+                                   cancel_event: Optional[threading.Event] = None) -> Tuple[str, str, str]:
+        """Genera respuesta con ctransformers enviando los tokens a medida que llegan"""
+        pieces = []
+        metrics = get_metrics()
+        try:
+            with metrics.stage(STAGE_PROMPT_BUILD):
+                prompt = self._create_math_prompt(user_input)
+            
+            start = time.perf_counter()
+            first_token = None
+            stream = self.mistral_model(
                 prompt,
                 max_new_tokens=512,
                 temperature=self.temperature,
                 top_p=0.9,
                 repetition_penalty=1.1,
-                stop=["</s>", "Usuario:", "User:", "Human:", "Pregunta:"]
+                stop=["</s>", "Usuario:", "User:", "Human:", "Pregunta:"],
+                stream=True
             )
             
-            # Procesar respuesta
-            return self._process_response(response_text, user_input)
+            for text in stream:
+                if first_token is None:
+                    first_token = time.perf_counter()
+                    metrics.observe_stage(STAGE_PROMPT_EVAL, first_token - start)
+                if cancel_event is not None and cancel_event.is_set():
+                    logger.info("Generación cancelada por el usuario")
+                    break
+                
+                if text:
+                    pieces.append(text)
+                    on_token(text)
+            
+            # ctransformers también produce un texto por token
+            self._record_generation(metrics, first_token, len(pieces))
+            return self._process_response(''.join(pieces), user_input)
             
         except Exception as e:
-            logger.error(f"Error con ctransformers: {e}")
+            logger.error(f"Error con ctransformers (streaming): {e}")
+            if pieces:
+                return self._process_response(''.join(pieces), user_input)
             return self._generate_basic_response(user_input)
     
+    def _record_generation(self, metrics, first_token: Optional[float], tokens: int):
+        """Registra la generación de tokens de un stream (desde el primer token hasta ahora)"""
+        if first_token is None:
+            return
+        elapsed = time.perf_counter() - first_token
+        metrics.observe_stage(STAGE_TOKEN_GENERATION, elapsed)
+        metrics.record_tokens(tokens, elapsed)
+    
+    def _create_prompt_prefix(self) -> str:
+        """Crea la parte fija del prompt (prompt del sistema en el idioma actual)"""
+        system_prompt = self.language_manager.get_ai_system_prompt()
+        return f"<s>[INST] {system_prompt}\n"
+    
+    def _prepare_prompt_prefix(self):
+        """Restaura el estado del modelo con el prompt del sistema ya evaluado"""
+        if self.prefix_cache is not None:
+            self.prefix_cache.prepare(self._create_prompt_prefix())
+    
     def _create_math_prompt(self, user_input: str) -> str:
         """Crea un prompt optimizado para matemáticas en el idioma actual"""
-        # Obtener prompt del sistema en el idioma actual
-        system_prompt = self.language_manager.get_ai_system_prompt()
-        
         # Detectar tipo de problema matemático
         problem_type = self._detect_math_type(user_input)
         
         if problem_type:
-            context = f"\n{_('ai_prompts.math_context', 'Problema matemático detectado')}: {problem_type}\n"
+            context = f"{_('ai_prompts.math_context', 'Problema matemático detectado')}: {problem_type}\n"
         else:
-            context = "\n"
+            context = ""
         
-        # Crear prompt en el formato correcto
-        prompt = f"""<s>[INST] {system_prompt}{context}Pregunta: {user_input}
+        # Crear prompt en el formato correcto; el prefijo es idéntico en todas las preguntas
+        # para que su estado KV pueda reutilizarse
+        prompt = f"""{self._create_prompt_prefix()}{context}Pregunta: {user_input}
 Por favor, proporciona una respuesta clara y educativa con explicación paso a paso. [/INST]
 Respuesta: """
         
@@ -266,7 +473,8 @@ Respuesta: """
             response_text = response_text.strip()
             
             # Extraer fórmula si existe
-            formula = self._extract_formula(response_text, user_input)
+            with get_metrics().stage(STAGE_FORMULA_EXTRACTION):
+                formula = self._extract_formula(response_text, user_input)
             
             # Mejorar formato de respuesta
             formatted_response = self._format_response(response_text)
@@ -298,7 +506,7 @@ Respuesta: """
                         # Limpiar expresión
                         clean_expr = expr.replace('×', '*').replace('÷', '/')
                         if all(c in '0123456789+-*/(). ' for c in clean_expr):
-                            result = eval(clean_expr)
+                            result = safe_expr.safe_eval(clean_expr)
                             return f"{expr} = {result}"
                     except:
                         pass
@@ -413,7 +621,7 @@ Respuesta: """
                 # Verificar que solo contiene caracteres seguros
                 if all(c in '0123456789+-*/(). ' for c in clean_expr):
                     try:
-                        result = eval(clean_expr)
+                        result = safe_expr.safe_eval(clean_expr)
                         formula = f"{expr} = {result}"
                         
                         response = f"""**{_("messages.solving", "Resolviendo")}:** {expr}
@@ -0,0 +1,241 @@
+import logging
+import threading
+import multiprocessing
+from concurrent.futures import CancelledError, ProcessPoolExecutor, TimeoutError as FutureTimeoutError
+from concurrent.futures.process import BrokenProcessPool
+from typing import List, NamedTuple, Optional
+
+from lazy_imports import lazy_import
+
+# sympy y numpy se cargan con la primera ecuación, no al abrir la ventana
+np = lazy_import('numpy')
+sp = lazy_import('sympy')
+
+logger = logging.getLogger(__name__)
+
+# Intervalo y resolución de la búsqueda numérica de raíces
+NUMERIC_INTERVAL = (-10.0, 10.0)
+NUMERIC_SAMPLES = 400
+
+
+class SolveResult(NamedTuple):
+    solutions: List["sp.Expr"]
+    # True si sympy no terminó a tiempo y las soluciones son aproximaciones numéricas
+    approximate: bool
+
+
+def _init_worker():
+    """Importa sympy en el proceso trabajador antes de la primera ecuación"""
+    import sympy  # noqa: F401
+    logger.debug("Proceso de resolución listo")
+
+
+def _warmup() -> bool:
+    return True
+
+
+def _solve(expr: "sp.Expr", symbol: "sp.Symbol") -> List["sp.Expr"]:
+    """Resuelve expr = 0 en el proceso trabajador"""
+    return sp.solve(expr, symbol)
+
+
+def _polynomial_roots(expr: "sp.Expr", symbol: "sp.Symbol") -> Optional[List["sp.Expr"]]:
+    """Raíces con numpy si expr es un polinomio de coeficientes numéricos, None si no lo es"""
+    try:
+        coefficients = [complex(c) for c in sp.Poly(expr, symbol).all_coeffs()]
+    except (sp.PolynomialError, TypeError):
+        return None
+
+    roots = []
+    for root in np.roots(coefficients):
+        if abs(root.imag) < 1e-9:
+            roots.append(sp.Float(root.real))
+        else:
+            roots.append(sp.Float(root.real) + sp.Float(root.imag) * sp.I)
+    return roots
+
+
+def numeric_roots(expr: "sp.Expr", symbol: Optional["sp.Symbol"] = None) -> List["sp.Expr"]:
+    """
+    Aproxima las soluciones de expr = 0 sin resolver simbólicamente.
+
+    Los polinomios se resuelven con numpy.roots; el resto se muestrea en
+    NUMERIC_INTERVAL y cada cambio de signo se refina con nsolve.
+    """
+    symbol = symbol if symbol is not None else sp.Symbol('x')
+    try:
+        roots = _polynomial_roots(expr, symbol)
+        if roots is not None:
+            return roots
+
+        func = sp.lambdify(symbol, expr, 'numpy')
+        xs = np.linspace(*NUMERIC_INTERVAL, NUMERIC_SAMPLES)
+        with np.errstate(all='ignore'):
+            ys = np.broadcast_to(np.asarray(func(xs), dtype=float), xs.shape)
+
+        signs = np.sign(ys)
+        brackets = np.nonzero(np.isfinite(ys[:-1]) & np.isfinite(ys[1:]) & (signs[:-1] * signs[1:] <= 0))[0]
+
+        roots = []
+        seen = set()
+        for i in brackets:
+            try:
+                root = sp.nsolve(expr, symbol, (xs[i], xs[i + 1]), solver='bisect')
+            except Exception:
+                continue
+            # Descarta los cambios de signo en una asíntota (tan(x), 1/x...)
+            if abs(complex(expr.subs(symbol, root))) > 1e-6:
+                continue
+            key = round(float(root), 9)
+            if key not in seen:
+                seen.add(key)
+                roots.append(sp.Float(root))
+        return roots
+
+    except Exception as e:
+        logger.error(f"Error buscando raíces numéricas: {e}")
+        return []
+
+
+class SolverService:
+    """
+    Resolución simbólica de ecuaciones en un proceso aparte con límite de tiempo.
+
+    sp.solve no se puede interrumpir dentro del propio proceso, así que se ejecuta en
+    un trabajador con sympy ya importado. Si no termina en timeout segundos, o si llega
+    una ecuación nueva mientras tanto, el trabajador se mata (se vuelve a crear con la
+    siguiente petición) y, en el primer caso, se devuelven raíces numéricas.
+    """
+
+    def __init__(self, timeout: float = 10.0, use_process: bool = True):
+        self.timeout = timeout
+        # Sin proceso aparte todo se resuelve en el hilo que llama, sin límite de tiempo
+        self.use_process = use_process
+
+        self.lock = threading.Lock()
+        self.executor: Optional[ProcessPoolExecutor] = None
+        self.failed = False
+
+        # Cada petición nueva deja obsoletas las anteriores
+        self.generation = 0
+        self._pending = None
+
+    def start(self):
+        """Arranca el proceso trabajador y lo calienta en segundo plano"""
+        with self.lock:
+            if self.executor is not None or self.failed or not self.use_process:
+                return
+            try:
+                # spawn por lo mismo que en render_service: fork con hilos activos puede bloquearse
+                self.executor = ProcessPoolExecutor(
+                    max_workers=1,
+                    mp_context=multiprocessing.get_context('spawn'),
+                    initializer=_init_worker
+                )
+                self.executor.submit(_warmup)
+                logger.info("Servicio de resolución simbólica iniciado")
+
+            except Exception as e:
+                logger.error(f"Error iniciando servicio de resolución: {e}")
+                self.executor = None
+                self.failed = True
+
+    def solve(self, expr: "sp.Expr", symbol: Optional["sp.Symbol"] = None) -> Optional[SolveResult]:
+        """
+        Resuelve expr = 0 respecto a symbol (bloquea; llamar desde un hilo secundario)
+
+        Returns:
+            SolveResult, o None si mientras tanto se pidió otra ecuación
+        """
+        symbol = symbol if symbol is not None else sp.Symbol('x')
+        with self.lock:
+            self.generation += 1
+            generation = self.generation
+            previous, self._pending = self._pending, None
+
+        if previous is not None and not previous.done() and not previous.cancel():
+            # El trabajador sigue con la ecuación anterior: matarlo es la única forma de cancelarla
+            self.shutdown(terminate=True)
+
+        self.start()
+        executor = self.executor
+        if executor is None:
+            # Servicio desactivado o roto: resolver aquí, sin límite de tiempo
+            return self._solve_locally(expr, symbol)
+
+        try:
+            future = executor.submit(_solve, expr, symbol)
+            with self.lock:
+                self._pending = future
+            return SolveResult(future.result(timeout=self.timeout), False)
+
+        except FutureTimeoutError:
+            if generation != self.generation:
+                return None
+            logger.warning(f"sympy no resolvió en {self.timeout}s, se usan raíces numéricas")
+            self.shutdown(terminate=True)
+            return SolveResult(numeric_roots(expr, symbol), True)
+
+        except (CancelledError, BrokenProcessPool) as e:
+            if generation != self.generation:
+                return None
+            logger.error(f"Error en servicio de resolución: {e}")
+            self.shutdown()
+            self.failed = True
+            return self._solve_locally(expr, symbol)
+
+        except Exception as e:
+            # sympy no sabe resolverla (NotImplementedError...): el trabajador sigue sano
+            logger.warning(f"sympy no pudo resolver la ecuación: {e}")
+            return SolveResult(numeric_roots(expr, symbol), True)
+
+    def _solve_locally(self, expr: "sp.Expr", symbol: "sp.Symbol") -> SolveResult:
+        try:
+            return SolveResult(sp.solve(expr, symbol), False)
+        except Exception as e:
+            logger.warning(f"sympy no pudo resolver la ecuación: {e}")
+            return SolveResult(numeric_roots(expr, symbol), True)
+
+    def shutdown(self, terminate: bool = False):
+        """
+        Detiene el proceso trabajador
+
+        Args:
+            terminate: Matarlo aunque siga ocupado
+        """
+        with self.lock:
+            if self.executor is not None:
+                try:
+                    if terminate:
+                        for process in list(getattr(self.executor, '_processes', {}).values()):
+                            process.terminate()
+                    self.executor.shutdown(wait=False, cancel_futures=True)
+                except Exception as e:
+                    logger.error(f"Error cerrando servicio de resolución: {e}")
+                self.executor = None
+
+
+# Instancia global del servicio de resolución
+_solver_service = None
+
+
+def get_solver_service(config_manager=None) -> SolverService:
+    """Obtiene el servicio global de resolución simbólica"""
+    global _solver_service
+    if _solver_service is None:
+        if config_manager is not None:
+            _solver_service = SolverService(
+                timeout=config_manager.get("performance.solver_timeout", 10.0),
+                use_process=config_manager.get("performance.solver_process", True)
+            )
+        else:
+            _solver_service = SolverService()
+    return _solver_service
+
+
+def shutdown_solver_service():
+    """Cierra el servicio global de resolución"""
+    global _solver_service
+    if _solver_service:
+        _solver_service.shutdown()
+        _solver_service = None
@@ -0,0 +1,140 @@
+import os
+import json
+import time
+import logging
+import threading
+from contextlib import contextmanager, nullcontext
+from datetime import datetime
+from functools import wraps
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Variable de entorno que activa la traza de arranque (MATHVTUBER_TRACE_STARTUP=1)
+TRACE_ENV_VAR = "MATHVTUBER_TRACE_STARTUP"
+
+
+class StartupTracer:
+    """
+    Registro de intervalos con nombre durante el arranque.
+
+    Cada intervalo guarda el instante de inicio (reloj monotónico, relativo a la
+    creación del tracer), la duración y el hilo. write() los vuelca en el formato
+    de Chrome Trace (chrome://tracing, Perfetto, speedscope), así que se puede
+    ver el arranque como línea de tiempo por hilo y comparar versiones.
+    """
+
+    def __init__(self, enabled: bool, log_dir: str = "logs"):
+        self.enabled = enabled
+        self.log_dir = Path(log_dir)
+        self.origin = time.perf_counter()
+        self.pid = os.getpid()
+        self.lock = threading.Lock()
+        self.events: List[Dict[str, Any]] = []
+        self.thread_names: Dict[int, str] = {}
+        self.path: Optional[Path] = None
+
+    def _now_us(self) -> float:
+        return (time.perf_counter() - self.origin) * 1e6
+
+    def _record(self, event: Dict[str, Any]):
+        thread = threading.current_thread()
+        event.update(pid=self.pid, tid=thread.ident)
+        with self.lock:
+            # Python reutiliza los identificadores de hilos terminados: vale el nombre más reciente
+            self.thread_names[thread.ident] = thread.name
+            self.events.append(event)
+
+    @contextmanager
+    def _span(self, name: str, args: Dict[str, Any]):
+        start = self._now_us()
+        try:
+            yield
+        finally:
+            event = {"name": name, "ph": "X", "ts": round(start, 1), "dur": round(self._now_us() - start, 1)}
+            if args:
+                event["args"] = args
+            self._record(event)
+
+    def span(self, name: str, **args):
+        """Context manager que registra un intervalo (no hace nada si la traza está desactivada)"""
+        if not self.enabled:
+            return nullcontext()
+        return self._span(name, args)
+
+    def mark(self, name: str, **args):
+        """Registra un instante (por ejemplo, 'ventana visible')"""
+        if not self.enabled:
+            return
+        event = {"name": name, "ph": "i", "s": "g", "ts": round(self._now_us(), 1)}
+        if args:
+            event["args"] = args
+        self._record(event)
+
+    def write(self) -> Optional[Path]:
+        """
+        Escribe (o reescribe) la traza en logs/ en formato Chrome Trace
+
+        Se puede llamar varias veces: la primera elige el archivo y las siguientes
+        lo reemplazan con todos los eventos registrados hasta ese momento.
+        """
+        if not self.enabled:
+            return None
+
+        try:
+            with self.lock:
+                events = list(self.events)
+                thread_names = dict(self.thread_names)
+                if self.path is None:
+                    stamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+                    self.path = self.log_dir / f"startup_trace_{stamp}_{self.pid}.json"
+                path = self.path
+
+            metadata = [
+                {"name": "thread_name", "ph": "M", "pid": self.pid, "tid": tid, "args": {"name": name}}
+                for tid, name in thread_names.items()
+            ]
+            self.log_dir.mkdir(parents=True, exist_ok=True)
+            tmp_path = path.with_suffix(".tmp")
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump({"traceEvents": metadata + events, "displayTimeUnit": "ms"}, f)
+            os.replace(tmp_path, path)
+
+            logger.info(f"Traza de arranque escrita en {path} ({len(events)} eventos)")
+            return path
+
+        except Exception as e:
+            logger.error(f"Error escribiendo traza de arranque: {e}")
+            return None
+
+
+# Instancia global del tracer de arranque
+_startup_tracer = None
+
+
+def get_startup_tracer() -> StartupTracer:
+    """Obtiene el tracer global (activo si MATHVTUBER_TRACE_STARTUP tiene un valor distinto de 0)"""
+    global _startup_tracer
+    if _startup_tracer is None:
+        value = os.environ.get(TRACE_ENV_VAR, "").strip().lower()
+        _startup_tracer = StartupTracer(enabled=value not in ("", "0", "false", "no"))
+    return _startup_tracer
+
+
+def trace_span(name: str, **args):
+    """Atajo para get_startup_tracer().span(name)"""
+    return get_startup_tracer().span(name, **args)
+
+
+def traced(name: Optional[str] = None):
+    """Decorador que registra cada llamada a la función como un intervalo"""
+    def decorator(func):
+        span_name = name or func.__qualname__
+
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            with get_startup_tracer().span(span_name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
@@ -0,0 +1,300 @@
+import ast
+import heapq
+import logging
+from typing import List, NamedTuple, Optional
+
+from safe_expr import (BINARY_OPERATORS, CONSTANTS, FUNCTIONS, UNARY_OPERATORS,
+                       ExpressionError, compile_expression, safe_pow, to_python)
+
+logger = logging.getLogger(__name__)
+
+# Pasos que se muestran como máximo; el resto se calcula pero no se escribe
+MAX_SHOWN_STEPS = 30
+
+# Precedencia de cada operación (mayor = se resuelve antes)
+_PRECEDENCE = {
+    ast.Add: 1, ast.Sub: 1,
+    ast.Mult: 2, ast.Div: 2, ast.FloorDiv: 2, ast.Mod: 2,
+    ast.Pow: 4,
+}
+_UNARY_PRECEDENCE = 3
+_CALL_PRECEDENCE = 5
+
+_SYMBOLS = {
+    ast.Add: '+', ast.Sub: '-', ast.Mult: '×', ast.Div: '÷', ast.FloorDiv: '//',
+    ast.Mod: 'mod', ast.Pow: '^', ast.UAdd: '+', ast.USub: '-',
+}
+
+# Operaciones en las que a op (b op c) no equivale a (a op b) op c
+_NON_ASSOCIATIVE = (ast.Sub, ast.Div, ast.FloorDiv, ast.Mod)
+
+_CONSTANT_LABELS = {'pi': 'π', 'e': 'e'}
+
+
+class ReductionStep(NamedTuple):
+    """Un paso de la resolución: la operación hecha y la expresión que queda"""
+    operation: str
+    expression: str
+
+
+class StepSolution(NamedTuple):
+    steps: List[ReductionStep]
+    result: object
+    hidden_steps: int
+
+
+def format_number(value) -> str:
+    """Escribe enteros sin decimales y el resto con precisión razonable"""
+    value = to_python(value)
+    if isinstance(value, float) and value.is_integer() and abs(value) < 1e15:
+        return str(int(value))
+    if isinstance(value, float):
+        return format(value, '.10g')
+    return str(value)
+
+
+class _Node:
+    """Nodo mutable del árbol de resolución; guarda su texto hasta que cambia algo debajo"""
+
+    __slots__ = ('kind', 'op', 'func', 'precedence', 'position', 'depth', 'children', 'parent',
+                 'value', 'label', 'text', 'dirty')
+
+    def __init__(self, kind: str, position: int = 0):
+        self.kind = kind
+        self.op = None
+        self.func = None
+        self.precedence = 0
+        self.position = position
+        # Paréntesis que lo rodean en la expresión original (los más internos se resuelven antes)
+        self.depth = 0
+        self.children: List["_Node"] = []
+        self.parent: Optional["_Node"] = None
+        self.value = None
+        self.label = None
+        self.text = ""
+        self.dirty = True
+
+    def is_ready(self) -> bool:
+        """Se puede resolver cuando todos sus operandos ya son números"""
+        return self.kind != 'num' and all(child.kind == 'num' for child in self.children)
+
+    def make_number(self, value):
+        self.kind = 'num'
+        self.value = value
+        self.label = None
+        self.children = []
+
+
+def _number(value, position: int, label: Optional[str] = None) -> _Node:
+    node = _Node('num', position)
+    node.value = value
+    node.label = label
+    return node
+
+
+def _build(tree: ast.Expression) -> _Node:
+    """Convierte el AST (ya validado por safe_expr) en nodos, sin recursión"""
+    built = {}
+    stack = [(tree.body, False)]
+
+    while stack:
+        node, expanded = stack.pop()
+        if not expanded:
+            stack.append((node, True))
+            # En una llamada solo se recorren los argumentos (el nombre de la función no es un valor)
+            children = node.args if isinstance(node, ast.Call) else ast.iter_child_nodes(node)
+            for child in children:
+                if isinstance(child, ast.expr):
+                    stack.append((child, False))
+            continue
+
+        position = getattr(node, 'col_offset', 0)
+
+        if isinstance(node, ast.Constant):
+            result = _number(node.value, position)
+
+        elif isinstance(node, ast.Name):
+            result = _number(CONSTANTS[node.id], position, _CONSTANT_LABELS.get(node.id, node.id))
+
+        elif isinstance(node, ast.UnaryOp):
+            operand = built.pop(id(node.operand))
+            if operand.kind == 'num' and operand.label is None:
+                # Un signo delante de un número forma parte del número (-3), no es un paso
+                result = _number(UNARY_OPERATORS[type(node.op)](operand.value), position)
+            else:
+                result = _Node('unary', position)
+                result.op = type(node.op)
+                result.precedence = _UNARY_PRECEDENCE
+                result.children = [operand]
+
+        elif isinstance(node, ast.BinOp):
+            result = _Node('bin', getattr(node.right, 'col_offset', position))
+            result.op = type(node.op)
+            result.precedence = _PRECEDENCE[result.op]
+            result.children = [built.pop(id(node.left)), built.pop(id(node.right))]
+
+        elif isinstance(node, ast.Call):
+            result = _Node('call', position)
+            result.func = node.func.id
+            result.precedence = _CALL_PRECEDENCE
+            result.children = [built.pop(id(node.args[0]))]
+
+        else:
+            raise ExpressionError(f"Construcción no permitida: {type(node).__name__}")
+
+        for child in result.children:
+            child.parent = result
+        built[id(node)] = result
+
+    return built[id(tree.body)]
+
+
+def _evaluate(node: _Node):
+    """Resuelve un nodo cuyos operandos ya son números"""
+    values = [child.value for child in node.children]
+    if node.kind == 'bin':
+        if node.op is ast.Pow:
+            return safe_pow(*values)
+        return BINARY_OPERATORS[node.op](*values)
+    if node.kind == 'unary':
+        return UNARY_OPERATORS[node.op](values[0])
+    return to_python(FUNCTIONS[node.func](values[0]))
+
+
+def _needs_parens(parent: _Node, child: _Node, is_right: bool) -> bool:
+    if child.kind == 'num':
+        negative = child.label is None and child.value < 0
+        return negative and parent.kind == 'bin' and (is_right or parent.op is ast.Pow)
+    if parent.kind == 'call':
+        return False
+    if child.precedence < parent.precedence:
+        return True
+    if child.precedence == parent.precedence and parent.kind == 'bin':
+        if parent.op is ast.Pow:
+            return not is_right
+        return is_right and parent.op in _NON_ASSOCIATIVE
+    return False
+
+
+def _assign_depths(root: _Node):
+    """Profundidad de paréntesis de cada nodo (los argumentos de una función también cuentan)"""
+    stack = [root]
+    while stack:
+        node = stack.pop()
+        for index, child in enumerate(node.children):
+            grouped = node.kind == 'call' or (child.kind != 'num' and _needs_parens(node, child, is_right=index == 1))
+            child.depth = node.depth + (1 if grouped else 0)
+            stack.append(child)
+
+
+def _ready_key(node: _Node):
+    """Orden del montículo: paréntesis más internos, después mayor precedencia, después más a la izquierda"""
+    return (-node.depth, -node.precedence, node.position, id(node), node)
+
+
+def _compose(node: _Node) -> str:
+    """Texto de un nodo a partir del texto (ya calculado) de sus hijos"""
+    if node.kind == 'num':
+        return node.label or format_number(node.value)
+
+    parts = []
+    for index, child in enumerate(node.children):
+        text = child.text
+        if _needs_parens(node, child, is_right=index == 1):
+            text = f"({text})"
+        parts.append(text)
+
+    if node.kind == 'bin':
+        if node.op is ast.Pow:
+            return f"{parts[0]}^{parts[1]}"
+        return f"{parts[0]} {_SYMBOLS[node.op]} {parts[1]}"
+    if node.kind == 'unary':
+        return f"{_SYMBOLS[node.op]}{parts[0]}"
+    return f"{node.func}({parts[0]})"
+
+
+def _render(root: _Node) -> str:
+    """Actualiza el texto solo de los nodos que cambiaron desde el último render"""
+    stack = [(root, False)]
+    while stack:
+        node, expanded = stack.pop()
+        if not node.dirty:
+            continue
+        if expanded or not node.children:
+            node.text = _compose(node)
+            node.dirty = False
+            continue
+        stack.append((node, True))
+        stack.extend((child, False) for child in node.children)
+    return root.text
+
+
+def _mark_dirty(node: _Node):
+    """Invalida el texto de un nodo y de sus ancestros (se detiene en el primero ya inválido)"""
+    node.dirty = True
+    parent = node.parent
+    while parent is not None and not parent.dirty:
+        parent.dirty = True
+        parent = parent.parent
+
+
+def _push_parent(ready: list, node: _Node):
+    """Añade al montículo el padre de un nodo recién resuelto si ya puede resolverse"""
+    parent = node.parent
+    if parent is not None and parent.is_ready():
+        heapq.heappush(ready, _ready_key(parent))
+
+
+def solve_steps(text: str, max_shown: int = MAX_SHOWN_STEPS) -> StepSolution:
+    """
+    Resuelve una expresión paso a paso respetando la jerarquía de operaciones.
+
+    En cada paso se resuelve, de entre las operaciones cuyos operandos ya son números,
+    la del paréntesis más interno; dentro de él, la de mayor precedencia y, a
+    igualdad, la que está más a la izquierda. Las
+    operaciones listas se guardan en un montículo, y el texto de cada subárbol se
+    memoriza hasta que cambia, así que una cadena de cientos de términos se resuelve
+    en tiempo casi lineal.
+
+    Raises:
+        ExpressionError: Si la expresión no es válida
+    """
+    compiled = compile_expression(text)
+    root = _build(compiled.tree)
+    _assign_depths(root)
+
+    ready = []
+    stack = [root]
+    while stack:
+        node = stack.pop()
+        stack.extend(node.children)
+        if node.is_ready():
+            heapq.heappush(ready, _ready_key(node))
+
+    steps: List[ReductionStep] = []
+    hidden = 0
+
+    while ready:
+        node = heapq.heappop(ready)[-1]
+        value = _evaluate(node)
+
+        if node.kind == 'unary' and node.children[0].label is None:
+            # -(5) cuando el paréntesis ya se resolvió: el signo pasa al número sin contar como paso
+            node.make_number(value)
+            _mark_dirty(node)
+            _push_parent(ready, node)
+            continue
+
+        if len(steps) < max_shown:
+            operation = f"{_render(node)} = {format_number(value)}"
+        node.make_number(value)
+        _mark_dirty(node)
+
+        if len(steps) < max_shown:
+            steps.append(ReductionStep(operation, _render(root)))
+        else:
+            hidden += 1
+
+        _push_parent(ready, node)
+
+    return StepSolution(steps, to_python(root.value), hidden)
@@ -0,0 +1,140 @@
+import logging
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict
+
+import sympy as sp
+
+logger = logging.getLogger(__name__)
+
+# Variable por defecto de las ecuaciones y funciones
+X = sp.Symbol('x')
+
+
+class _SymbolicEntry:
+    """Resultados simbólicos de una expresión; cada uno se calcula la primera vez que se pide"""
+
+    __slots__ = ('expr', 'solutions', 'derivatives', 'functions')
+
+    def __init__(self, expr: sp.Expr):
+        self.expr = expr
+        # Lo que devolvió el servicio de resolución (SolveResult)
+        self.solutions: Dict[sp.Symbol, Any] = {}
+        self.derivatives: Dict[sp.Symbol, sp.Expr] = {}
+        self.functions: Dict[sp.Symbol, Callable] = {}
+
+
+class SymbolicCache:
+    """
+    Caché LRU de cálculos de sympy (soluciones, derivada y función lambdify).
+
+    Las entradas se indexan por el srepr de la expresión ya analizada, de modo que
+    "2*x + 1" y "1 + 2*x" comparten resultados. Volver a graficar o cambiar el tema
+    reutiliza todo el trabajo simbólico en lugar de llamar otra vez a solve/diff/lambdify.
+    """
+
+    def __init__(self, max_entries: int = 128):
+        self.max_entries = max(1, int(max_entries))
+        self.lock = threading.RLock()
+        self._entries: "OrderedDict[str, _SymbolicEntry]" = OrderedDict()
+        # Texto ya analizado -> expresión (sympify también es caro)
+        self._parsed: "OrderedDict[str, sp.Expr]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def parse(self, text: str) -> sp.Expr:
+        """Analiza el texto con sympify, reutilizando el resultado si ya se analizó"""
+        text = text.strip()
+        with self.lock:
+            expr = self._parsed.get(text)
+            if expr is not None:
+                self._parsed.move_to_end(text)
+                return expr
+
+        expr = sp.sympify(text)
+        with self.lock:
+            self._parsed[text] = expr
+            if len(self._parsed) > self.max_entries:
+                self._parsed.popitem(last=False)
+        return expr
+
+    def cached_solutions(self, expr: sp.Expr, symbol: sp.Symbol = X):
+        """Soluciones ya calculadas de expr = 0, o None (no las calcula)"""
+        with self.lock:
+            results = self._entry(expr).solutions
+            if symbol in results:
+                self.hits += 1
+                return results[symbol]
+            self.misses += 1
+            return None
+
+    def store_solutions(self, expr: sp.Expr, solutions, symbol: sp.Symbol = X):
+        """Guarda soluciones calculadas fuera de la caché (por ejemplo en el servicio de resolución)"""
+        with self.lock:
+            self._entry(expr).solutions[symbol] = solutions
+
+    def derivative(self, expr: sp.Expr, symbol: sp.Symbol = X) -> sp.Expr:
+        """Derivada de expr respecto a symbol"""
+        return self._lookup(expr, 'derivatives', symbol, lambda: sp.diff(expr, symbol))
+
+    def function(self, expr: sp.Expr, symbol: sp.Symbol = X) -> Callable:
+        """Función de numpy equivalente a expr (para evaluar sobre arrays)"""
+        return self._lookup(expr, 'functions', symbol, lambda: sp.lambdify(symbol, expr, 'numpy'))
+
+    def stats(self) -> Dict[str, Any]:
+        """Estadísticas de uso de la caché"""
+        with self.lock:
+            total = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / total if total else 0.0,
+            }
+
+    def clear(self):
+        """Vacía la caché"""
+        with self.lock:
+            self._entries.clear()
+            self._parsed.clear()
+
+    def _entry(self, expr: sp.Expr) -> _SymbolicEntry:
+        key = sp.srepr(expr)
+        entry = self._entries.get(key)
+        if entry is None:
+            entry = _SymbolicEntry(expr)
+            self._entries[key] = entry
+            if len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        else:
+            self._entries.move_to_end(key)
+        return entry
+
+    def _lookup(self, expr: sp.Expr, field: str, symbol: sp.Symbol, compute: Callable):
+        with self.lock:
+            results = getattr(self._entry(expr), field)
+            if symbol in results:
+                self.hits += 1
+                return results[symbol]
+            self.misses += 1
+
+        # Se calcula fuera del lock: solve puede tardar segundos y no debe bloquear otras consultas
+        value = compute()
+        with self.lock:
+            results[symbol] = value
+        return value
+
+
+# Instancia global de la caché simbólica
+_symbolic_cache = None
+
+
+def get_symbolic_cache(config_manager=None) -> SymbolicCache:
+    """Obtiene la caché simbólica global"""
+    global _symbolic_cache
+    if _symbolic_cache is None:
+        max_entries = 128
+        if config_manager is not None:
+            max_entries = config_manager.get("performance.symbolic_cache_size", 128)
+        _symbolic_cache = SymbolicCache(max_entries)
+    return _symbolic_cache
@@ -0,0 +1,13 @@
+from step_solver import solve_steps
+
+
+def _operations(expression):
+    return [step.operation for step in solve_steps(expression).steps]
+
+
+def test_parentheses_before_higher_precedence_outside():
+    assert _operations("2*(3+4)+5*6") == ["3 + 4 = 7", "2 × 7 = 14", "5 × 6 = 30", "14 + 30 = 44"]
+
+
+def test_parentheses_before_power():
+    assert _operations("(1+2)*3^2") == ["1 + 2 = 3", "3^2 = 9", "3 × 9 = 27"]
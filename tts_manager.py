@@ -4,6 +4,7 @@ import queue
 import logging
 import time
 from config_manager import ConfigManager
+from metrics import get_metrics, STAGE_TTS
 from typing import Optional
 
 logger = logging.getLogger(__name__)
@@ -82,8 +83,9 @@ class TTSManager:
                     clean_text = self._clean_text_for_tts(text)
                     
                     if clean_text:
-                        self.engine.say(clean_text)
-                        self.engine.runAndWait()
+                        with get_metrics().stage(STAGE_TTS):
+                            self.engine.say(clean_text)
+                            self.engine.runAndWait()
                     
                 except Exception as e:
                     logger.error(f"Error en TTS: {e}")
@@ -241,8 +243,9 @@ class TTSManager:
             clean_message = self._clean_text_for_tts(message)
             
             # Reproducir mensaje
-            self.engine.say(clean_message)
-            self.engine.runAndWait()
+            with get_metrics().stage(STAGE_TTS):
+                self.engine.say(clean_message)
+                self.engine.runAndWait()
             
         except Exception as e:
             logger.error(f"Error reproduciendo mensaje TTS: {e}")